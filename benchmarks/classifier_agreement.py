@@ -0,0 +1,145 @@
+# benchmarks/classifier_agreement.py
+"""
+Offline benchmark for the local pre-classifier.
+
+Measures how often service.classifier agrees with the gpt-4o classification
+used by ReasoningAgent, and how many queries it would answer on its own at a
+given confidence threshold.
+
+Usage:
+    python -m benchmarks.classifier_agreement
+    python -m benchmarks.classifier_agreement --corpus my_queries.jsonl --threshold 0.8
+
+The corpus is JSONL with a "query" field. LLM labels are stored in a sidecar
+file (--labels) so repeated runs don't call the API again. Queries whose LLM
+call fails are reported and left out rather than scored against a fallback.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from service.classifier import LOCAL_CLASSIFIER_THRESHOLD, classify_locally
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "data", "classifier_queries.jsonl")
+
+# Fields compared between the local and the LLM classification
+COMPARED_FIELDS = ["domain", "is_mathematical", "is_coding", "is_verbal_reasoning", "requires_research"]
+
+
+def _load_jsonl(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _route(problem_type):
+    """Which pipeline ReasoningAgent would run: research or direct solve."""
+    research = (problem_type.get("requires_research") and not problem_type.get("is_mathematical")
+                and not problem_type.get("is_coding"))
+    return "research" if research else "direct"
+
+
+async def _label_with_llm(queries, labels_path, concurrency):
+    """
+    Fetch (and persist) LLM labels for queries that don't have one yet.
+    Only real LLM classifications are kept: a query whose call fails is left
+    unlabelled (and retried next run), and rows from older runs that hold a
+    local-classifier fallback are ignored. Returns (labels, failed queries).
+    """
+    from service.reasoning import ReasoningAgent
+
+    labels = {
+        row["query"]: row["label"]
+        for row in _load_jsonl(labels_path)
+        if row["label"].get("classified_by") != "local"
+    }
+    missing = [query for query in queries if query not in labels]
+    if not missing:
+        return labels, []
+
+    agent = ReasoningAgent()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _label(query):
+        async with semaphore:
+            try:
+                return query, await agent._classify_with_llm(query)
+            except Exception as e:
+                print(f"LLM classification failed for {query!r}: {e}", file=sys.stderr)
+                return query, None
+
+    failed = []
+    with open(labels_path, "a", encoding="utf-8") as f:
+        for query, label in await asyncio.gather(*(_label(query) for query in missing)):
+            if label is None:
+                failed.append(query)
+                continue
+            labels[query] = label
+            f.write(json.dumps({"query": query, "label": label}) + "\n")
+    return labels, failed
+
+
+def evaluate(queries, labels, threshold):
+    """
+    Agreement of local vs LLM labels, overall and on the locally-answered
+    subset. Queries without an LLM label are counted as unlabelled, not scored.
+    """
+    rows = []
+    local_time = 0.0
+    unlabelled = [query for query in queries if query not in labels]
+    for query in queries:
+        if query not in labels:
+            continue
+        start = time.perf_counter()
+        local_type, confidence = classify_locally(query)
+        local_time += time.perf_counter() - start
+        llm_type = labels[query]
+        rows.append({
+            "query": query,
+            "confidence": confidence,
+            "covered": confidence >= threshold,
+            "route": _route(local_type) == _route(llm_type),
+            **{field: local_type.get(field) == llm_type.get(field) for field in COMPARED_FIELDS},
+        })
+
+    def _agreement(subset, field):
+        return round(sum(row[field] for row in subset) / len(subset), 3) if subset else None
+
+    covered = [row for row in rows if row["covered"]]
+    return {
+        "queries": len(rows),
+        "unlabelled": len(unlabelled),
+        "threshold": threshold,
+        "coverage": round(len(covered) / len(rows), 3) if rows else 0.0,
+        "avg_local_latency_us": round(1e6 * local_time / len(rows), 1) if rows else 0.0,
+        "agreement_covered": {field: _agreement(covered, field) for field in ["route"] + COMPARED_FIELDS},
+        "agreement_all": {field: _agreement(rows, field) for field in ["route"] + COMPARED_FIELDS},
+        "disagreements": [
+            {"query": row["query"], "confidence": round(row["confidence"], 3)}
+            for row in covered if not (row["route"] and row["domain"])
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--labels", default=None, help="LLM label cache (default: <corpus>.labels.jsonl)")
+    parser.add_argument("--threshold", type=float, default=LOCAL_CLASSIFIER_THRESHOLD)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    queries = [row["query"] for row in _load_jsonl(args.corpus)]
+    labels_path = args.labels or os.path.splitext(args.corpus)[0] + ".labels.jsonl"
+    labels, failed = asyncio.run(_label_with_llm(queries, labels_path, args.concurrency))
+    if failed:
+        print(f"{len(failed)} queries have no LLM label and were left out", file=sys.stderr)
+    print(json.dumps(evaluate(queries, labels, args.threshold), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ from openai import OpenAI
 import os
 from dotenv import load_dotenv
 import time
+import html
 
 load_dotenv()
 openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
@@ -527,6 +528,34 @@ async def parse_query_with_ai(query, tools, resources):
     except Exception as e:
         return {"type": None, "name": "", "parameters": {}, "reasoning": f"Error in AI query parsing: {str(e)}"}
 
+# Progress messages starting with this announce a server-side stage (see service/progress.py)
+STAGE_PREFIX = "stage:"
+
+
+def render_tool_progress(status_container, done_steps, stages, streamed_text):
+    """Show the server's stage transitions and the answer streamed so far."""
+    steps = "".join(f'<div class="processing-step complete">✓ {step}</div>' for step in done_steps)
+    steps += "".join(
+        f'<div class="processing-step {"active" if i == len(stages) - 1 else "complete"}">'
+        f'{"→" if i == len(stages) - 1 else "✓"} {stage.capitalize()}</div>'
+        for i, stage in enumerate(stages)
+    )
+    answer = ""
+    if streamed_text:
+        answer = f"""
+        <div class="message">
+            <div class="message-avatar assistant-avatar">🤖</div>
+            <div class="message-content assistant-message">{html.escape(streamed_text)}</div>
+        </div>
+        """
+    status_container.markdown(f"""
+    <div class="processing-status">
+        {steps}
+    </div>
+    {answer}
+    """, unsafe_allow_html=True)
+
+
 async def handle_query_and_response(user_input, status_container):
     async with sse_client(url="http://localhost:8000/sse") as streams:
         async with ClientSession(*streams) as session:
@@ -538,7 +567,6 @@ async def handle_query_and_response(user_input, status_container):
                 <div class="processing-step active">→ Analyzing query...</div>
             </div>
             """, unsafe_allow_html=True)
-            await asyncio.sleep(0.5)
 
             tools_resp = await session.list_tools()
             res_resp = await session.list_resources()
@@ -581,7 +609,6 @@ async def handle_query_and_response(user_input, status_container):
                 <div class="processing-step">→ Reasoning: {reasoning}</div>
             </div>
             """, unsafe_allow_html=True)
-            await asyncio.sleep(0.5)
 
             # Step 3: Parameters
             status_container.markdown(f"""
@@ -592,7 +619,6 @@ async def handle_query_and_response(user_input, status_container):
                 <div class="processing-step active">→ Parameters: {json.dumps(params)}</div>
             </div>
             """, unsafe_allow_html=True)
-            await asyncio.sleep(0.5)
 
             # Step 4: Execute
             if typ == "tool":
@@ -607,7 +633,24 @@ async def handle_query_and_response(user_input, status_container):
                     </div>
                     """, unsafe_allow_html=True)
                     
-                    result = await session.call_tool(name, arguments=params)
+                    done_steps = [
+                        "Analyzing query...",
+                        f"AI decided to use '{name}' ({typ})",
+                        f"Reasoning: {reasoning}",
+                        f"Parameters: {json.dumps(params)}",
+                    ]
+                    stages, streamed = ["executing tool"], []
+
+                    async def on_progress(progress, total, message):
+                        if not message:
+                            return
+                        if message.startswith(STAGE_PREFIX):
+                            stages.append(message[len(STAGE_PREFIX):])
+                        else:
+                            streamed.append(message)
+                        render_tool_progress(status_container, done_steps, stages, "".join(streamed))
+
+                    result = await session.call_tool(name, arguments=params, progress_callback=on_progress)
                     
                     result_preview = result.content[0].text[:100] + "..." if len(result.content[0].text) > 100 else result.content[0].text
                     status_container.markdown(f"""
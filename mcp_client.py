@@ -12,6 +12,19 @@ load_dotenv()
 # Initialize OpenAI client
 openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
+# Progress messages starting with this announce a server-side stage (see service/progress.py)
+STAGE_PREFIX = "stage:"
+
+
+async def print_progress(progress, total, message):
+    """Print stage transitions on their own line and streamed answer text as it arrives."""
+    if not message:
+        return
+    if message.startswith(STAGE_PREFIX):
+        print(f"\n[{message[len(STAGE_PREFIX):]}]", flush=True)
+    else:
+        print(message, end="", flush=True)
+
 async def parse_query_with_ai(query, available_tools, available_resources):
     """Use OpenAI to determine which tool to use and extract parameters"""
     
@@ -135,8 +148,9 @@ async def mcpclient():
                     if item_type == "tool":
                         print(f"Parameters: {parameters}")
                         # Execute the tool
-                        result = await session.call_tool(item_name, arguments=parameters)
-                        print(f"\nResult: {result.content[0].text}\n")
+                        result = await session.call_tool(item_name, arguments=parameters,
+                                                         progress_callback=print_progress)
+                        print(f"\n\nResult: {result.content[0].text}\n")
                     
                     elif item_type == "resource":
                         # For resources, we need to construct the URI with parameters
@@ -1,15 +1,22 @@
 # server.py
 from typing import List,Dict, Any
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
 from openai import OpenAI
 import os
+import json
 from dotenv import load_dotenv
-from service.reasoning import reasoning_agent
-from service.places import chat_with_places_assistant
-from service.services import generate_summary, perform_general_query, realtime_web_search
-from service.gmail import format_search_results, gmail_draft_tool, gmail_get_tool, gmail_search_tool, gmail_send_tool
-from langchain_google_community.gmail.search import Resource
+from service.reasoning import framework_cache, reasoning_agent
+from service.places import PlaceMode, chat_with_places_assistant, check_place_mode, place_cache_stats
+from service.services import (
+    generate_summary_stream, perform_general_query, realtime_web_search_stream, response_cache_stats
+)
+from service.gmail import run_gmail_tool, search_gmail
+from service.gmail_bulk import send_bulk_email
 from service.schedular import scheduler
+from service.executor import coalesce, tool_executor
+from service.search import search_cache_stats
+from service.semantic_cache import semantic_cache_stats
+from service.progress import ProgressReporter
 # Load environment variables from .env file
 load_dotenv()
 
@@ -26,7 +33,8 @@ client = OpenAI(api_key=OPENAI_API_KEY)
 
 
 @mcp.tool()
-def Insight_scope(user_query: str) -> str:
+@coalesce
+async def Insight_scope(user_query: str, ctx: Context) -> str:
     """
     InsightScope: An intelligent real-time web analysis agent.
 
@@ -44,17 +52,24 @@ def Insight_scope(user_query: str) -> str:
     - user_query (str): A natural-language query or topic of interest.
 
     Output:
-    - A concise, informative summary with real-time findings and embedded links.
+    - A concise, informative summary with real-time findings, followed by its source links.
+      Results for the same query are reused for a few minutes (shared with Reasoning_agent).
+      The answer is streamed as progress notifications while it is written.
 
     Example Use Case:
     insight_scope("Latest updates on Apple's Vision Pro release")
     """
-    return realtime_web_search(user_query)
+    progress = ProgressReporter(ctx)
+    await progress.stage("search")
+    answer = await tool_executor.run_async("Insight_scope", realtime_web_search_stream, user_query, progress.token)
+    await progress.flush()
+    return answer
 
 
 
 @mcp.tool()
-def Quickclarity(user_query: str) -> str:
+@coalesce
+async def Quickclarity(user_query: str) -> str:
     """
     QuickClarity: A fast, general-purpose assistant for instant answers.
 
@@ -76,11 +91,12 @@ def Quickclarity(user_query: str) -> str:
     Example Use Case:
     quickclarity("What are the benefits of intermittent fasting?")
     """
-    return perform_general_query(user_query)
+    return await tool_executor.run("Quickclarity", perform_general_query, user_query)
 
 
 @mcp.tool()
-def Corebrief(long_text: str):
+@coalesce
+async def Corebrief(long_text: str, ctx: Context):
     """
     CoreBrief: A professional-grade summarization agent.
 
@@ -99,14 +115,24 @@ def Corebrief(long_text: str):
 
     Output:
     - A high-quality, human-readable summary that reflects the core message.
+      The summary is streamed as progress notifications while it is written.
+      Very long inputs are summarized section by section and then merged, with
+      each map/reduce level reported as a progress stage.
 
     Example Use Case:
     corebrief(open("weekly_report.txt").read())
     """
-    return generate_summary(long_text)
+    progress = ProgressReporter(ctx)
+    await progress.stage("summarize")
+    summary = await tool_executor.run_async(
+        "Corebrief", generate_summary_stream, long_text, progress.token, progress.stage
+    )
+    await progress.flush()
+    return summary
 
 @mcp.add_tool
-def Geo_whisper(user_query: str) -> str:
+@coalesce
+async def Geo_whisper(user_query: str, mode: PlaceMode = "guide") -> str:
     """
     GeoWhisper: A conversational location intelligence agent.
 
@@ -120,6 +146,9 @@ def Geo_whisper(user_query: str) -> str:
 
     Input:
     - user_query (str): A location-related question or keyword phrase (e.g., "24/7 pharmacy in Delhi").
+    - mode (str): "guide" (default) for a conversational, travel-guide style answer, or
+      "fast" for the structured place list returned directly without an LLM pass.
+      Any other value is rejected.
 
     Output:
     - A summarized, conversational result listing matching places with key details.
@@ -127,10 +156,12 @@ def Geo_whisper(user_query: str) -> str:
     Example Use Case:
     geo_whisper("Vegan restaurants near Juhu Beach")
     """
-    return chat_with_places_assistant(user_query,client)
+    check_place_mode(mode)
+    return await tool_executor.run("Geo_whisper", chat_with_places_assistant, user_query, client, mode)
 
 @mcp.add_tool
-async def Reasoning_agent(user_query: str) -> str:
+@coalesce
+async def Reasoning_agent(user_query: str, ctx: Context) -> str:
     """
     Reasoning Agent: An advanced, context-aware reasoning and research assistant.
 
@@ -158,11 +189,13 @@ async def Reasoning_agent(user_query: str) -> str:
     Output:
     - A well-rounded, evidence-backed response synthesizing insights from multiple data streams,
       including a clearly stated final answer and, if applicable, a supporting research summary.
+      Stage transitions (classify -> framework/research -> solve) and the answer tokens are
+      streamed as progress notifications.
 
     Example:
     reasoning_agent("What are the most promising applications of quantum computing in cybersecurity?")
     """
-    response = await reasoning_agent.process_request(query=user_query)
+    response = await reasoning_agent.process_request(query=user_query, progress=ProgressReporter(ctx))
     print("[DEBUG] Reasoning Agent Response:", response)
 
     if not response or "result" not in response:
@@ -184,7 +217,8 @@ async def Reasoning_agent(user_query: str) -> str:
 
 
 @mcp.add_tool
-def gmail_send(to: str, subject: str, message: str, cc: str = None, bcc: str = None) -> dict:
+async def gmail_send(to: str, subject: str, message: str, cc: str = None, bcc: str = None,
+                     llm_format: bool = False) -> dict:
     """
     Send an email using Gmail.
 
@@ -194,6 +228,7 @@ def gmail_send(to: str, subject: str, message: str, cc: str = None, bcc: str = N
         message (str): Email body content.
         cc (str, optional): CC recipients.
         bcc (str, optional): BCC recipients.
+        llm_format (bool, optional): Rewrite the confirmation conversationally with an LLM.
 
     Returns:
         dict: Status + Gmail API response
@@ -205,14 +240,39 @@ def gmail_send(to: str, subject: str, message: str, cc: str = None, bcc: str = N
         "cc": [cc] if cc else None,
         "bcc": [bcc] if bcc else None,
     }
-    result = gmail_send_tool.invoke(payload)
-    return format_search_results(str(result))
+    return await tool_executor.run("gmail_send", run_gmail_tool, "send", payload, llm_format)
 
 
 @mcp.add_tool
-def gmail_draft(to: str, subject: str, message: str, cc: str = None, bcc: str = None) -> dict:
+async def gmail_send_bulk(subject_template: str, body_template: str, recipients: List[str] = None,
+                          csv: str = None, cc: str = None, dry_run: bool = False) -> dict:
+    """
+    Send a templated email to many recipients in one call.
+
+    Args:
+        subject_template (str): Subject with {placeholders}, e.g. "Hi {name}".
+        body_template (str): Body with {placeholders}; {email} is always available.
+        recipients (list[str], optional): Recipient email addresses.
+        csv (str, optional): CSV text with an "email" column; other columns fill placeholders.
+        cc (str, optional): CC recipient added to every message.
+        dry_run (bool, optional): Render the messages without sending them.
+
+    Returns:
+        dict: Counts per status and a status entry for every recipient. "unknown"
+            means Gmail may have sent the message despite an error; check Sent before resending.
+    """
+    return await tool_executor.run(
+        "gmail_send_bulk", send_bulk_email, subject_template, body_template, recipients, csv, cc, dry_run
+    )
+
+
+@mcp.add_tool
+async def gmail_draft(to: str, subject: str, message: str, cc: str = None, bcc: str = None,
+                      llm_format: bool = False) -> dict:
     """
     Create a Gmail draft.
+
+    Set llm_format to rewrite the confirmation conversationally with an LLM.
     """
     payload = {
         "to": [to],
@@ -221,12 +281,12 @@ def gmail_draft(to: str, subject: str, message: str, cc: str = None, bcc: str =
         "cc": [cc] if cc else None,
         "bcc": [bcc] if bcc else None,
     }
-    result = gmail_draft_tool.invoke(payload)
-    return format_search_results(str(result))
+    return await tool_executor.run("gmail_draft", run_gmail_tool, "draft", payload, llm_format)
 
 
 @mcp.add_tool
-def gmail_search(query: str, max_results: int = 10, resource: str = "messages") -> dict:
+async def gmail_search(query: str, max_results: int = 10, resource: str = "messages",
+                       llm_format: bool = False, fields: str = None) -> dict:
     """
     Search Gmail messages or threads.
 
@@ -234,20 +294,29 @@ def gmail_search(query: str, max_results: int = 10, resource: str = "messages")
         query (str): Gmail search string.
         max_results (int): Max results (default 10).
         resource (str): 'messages' or 'threads'.
+        llm_format (bool): Rewrite the results conversationally with an LLM.
+        fields (str, optional): Gmail partial-response projection for each message
+            (messages only), e.g. "id,snippet,payload/headers".
 
     Returns:
         dict: Search results with metadata.
     """
+    if resource not in ("messages", "threads"):
+        raise ValueError("resource must be 'messages' or 'threads'")
+    if resource == "messages":
+        # Native path: one list call + one batched metadata fetch
+        return await tool_executor.run("gmail_search", search_gmail, query, max_results, fields, llm_format)
+
     payload = {
         "query": query,
         "max_results": max_results,
-        "resource": Resource.MESSAGES if resource == "messages" else Resource.THREADS
+        "resource": "threads"
     }
-    result = gmail_search_tool.invoke(payload)
-    return format_search_results(str(result))
+    return await tool_executor.run("gmail_search", run_gmail_tool, "search", payload, llm_format)
 
 @mcp.tool()
-def schedule_meeting(date: str, start_time: str, end_time: str, attendee_email: str) -> Dict[str, Any]:
+async def schedule_meeting(date: str, start_time: str, end_time: str, attendee_email: str,
+                           timezone: str = "Asia/Kolkata") -> Dict[str, Any]:
     """
     Schedule a meeting in Google Calendar.
 
@@ -256,12 +325,63 @@ def schedule_meeting(date: str, start_time: str, end_time: str, attendee_email:
     - start_time (str): The start time of the meeting (format: HH:MM).
     - end_time (str): The end time of the meeting (format: HH:MM).
     - attendee_email (str): The email address of the meeting attendee.
+    - timezone (str, optional): IANA timezone of the times (default Asia/Kolkata).
 
     """
-    response = scheduler.schedule_meeting(date, start_time, end_time, attendee_email)
+    response = await tool_executor.run("schedule_meeting", scheduler.schedule_meeting, date, start_time, end_time,
+                                       attendee_email, timezone)
     return response
 
 
+@mcp.tool()
+async def schedule_meetings(meetings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Schedule many meetings in one call.
+
+    Input
+    - meetings (list): One dict per meeting with date (YYYY-MM-DD), start_time and
+      end_time (HH:MM), attendee_email (comma-separated for several), and optionally
+      timezone (IANA name, default Asia/Kolkata) and summary.
+
+    Earlier meetings in the list win when two requests overlap. Returns one status
+    per meeting: scheduled, conflict, invalid or error.
+    """
+    return await tool_executor.run("schedule_meetings", scheduler.schedule_meetings, meetings)
+
+
+@mcp.tool()
+async def find_slots(attendee_emails: str, duration_minutes: int = 30, start_date: str = None,
+                     days: int = 5, max_results: int = 5) -> Dict[str, Any]:
+    """
+    Find free meeting slots for you and every attendee, within working hours.
+
+    Input
+    - attendee_emails (str): Comma-separated attendee email addresses.
+    - duration_minutes (int): Meeting length in minutes (default 30).
+    - start_date (str, optional): First day to search (YYYY-MM-DD, default today).
+    - days (int): Number of days to search (default 5).
+    - max_results (int): Number of slots to return (default 5).
+    """
+    return await tool_executor.run("find_slots", scheduler.find_slots, attendee_emails, duration_minutes,
+                                   start_date, days, max_results)
+
+
+@mcp.tool()
+async def schedule_best_slot(attendee_emails: str, duration_minutes: int = 30, start_date: str = None,
+                             days: int = 5) -> Dict[str, Any]:
+    """
+    Book the earliest slot in which you and every attendee are free.
+
+    Input
+    - attendee_emails (str): Comma-separated attendee email addresses.
+    - duration_minutes (int): Meeting length in minutes (default 30).
+    - start_date (str, optional): First day to search (YYYY-MM-DD, default today).
+    - days (int): Number of days to search (default 5).
+    """
+    return await tool_executor.run("schedule_best_slot", scheduler.schedule_best_slot, attendee_emails,
+                                   duration_minutes, start_date, days)
+
+
 # @mcp.tool()
 # def finish_meeting(event_id: str) -> Dict[str, Any]:
 #     """Finish (delete) a scheduled meeting by event ID."""
@@ -270,11 +390,79 @@ def schedule_meeting(date: str, start_time: str, end_time: str, attendee_email:
 
 
 @mcp.tool()
-def list_meetings() -> List[Dict[str, Any]]:
+async def list_meetings() -> List[Dict[str, Any]]:
     """List the next 10 upcoming meetings."""
-    response = scheduler.list_meetings()
+    response = await tool_executor.run("list_meetings", scheduler.list_meetings)
     return response
 
+@mcp.tool()
+async def list_meetings_page(time_min: str = None, time_max: str = None, page_size: int = 50,
+                             page_token: str = None, fields: str = None) -> Dict[str, Any]:
+    """
+    List meetings one page at a time.
+
+    Input
+    - time_min (str, optional): Start of the range (YYYY-MM-DD or ISO datetime, default now).
+    - time_max (str, optional): End of the range (YYYY-MM-DD or ISO datetime).
+    - page_size (int): Meetings per page (default 50).
+    - page_token (str, optional): next_page_token from the previous page.
+    - fields (str, optional): Event fields to return, e.g. "summary,start".
+
+    Returns {"meetings": [...], "next_page_token": ...}; pass the token back for the next page.
+    """
+    return await tool_executor.run("list_meetings", scheduler.list_meetings_page, time_min, time_max,
+                                   page_size, page_token, fields)
+
+
+@mcp.tool()
+async def stream_meetings(ctx: Context, time_min: str = None, time_max: str = None, page_size: int = 50,
+                          page_token: str = None, fields: str = None, max_pages: int = 10) -> Dict[str, Any]:
+    """
+    Page through meetings in a time range, streaming each page to the client as
+    it arrives (as a log message plus a progress notification).
+
+    Input
+    - time_min / time_max (str, optional): Range bounds (YYYY-MM-DD or ISO datetime).
+    - page_size (int): Meetings per page (default 50).
+    - page_token (str, optional): Resume from a previous next_page_token.
+    - fields (str, optional): Event fields to return, e.g. "summary,start".
+    - max_pages (int): Stop after this many pages (default 10).
+
+    Returns the meeting count and the next_page_token to resume from (None when done).
+    """
+    if max_pages < 1:
+        raise ValueError("max_pages must be at least 1")
+    count = 0
+    for page_number in range(1, max_pages + 1):
+        page = await tool_executor.run("list_meetings", scheduler.list_meetings_page, time_min, time_max,
+                                       page_size, page_token, fields)
+        count += len(page["meetings"])
+        page_token = page["next_page_token"]
+        await ctx.info(json.dumps({"page": page_number, "meetings": page["meetings"]}))
+        await ctx.report_progress(page_number, None if page_token else page_number,
+                                  f"Page {page_number}: {count} meetings so far")
+        if not page_token:
+            break
+    return {"meetings": count, "pages": page_number, "next_page_token": page_token}
+
+
+@mcp.resource("metrics://executor")
+def executor_metrics() -> str:
+    """Queue depth, running calls and throughput for every tool on the worker pool."""
+    return json.dumps({**tool_executor.stats(), "coalescing": coalesce.stats()}, indent=2)
+
+
+@mcp.resource("metrics://caches")
+def cache_metrics() -> str:
+    """Hit/miss counters for the response and lookup caches."""
+    return json.dumps({
+        "frameworks": framework_cache.stats(),
+        "places": place_cache_stats(),
+        "responses": response_cache_stats(),
+        "search": search_cache_stats(),
+        "semantic": semantic_cache_stats(),
+    }, indent=2)
+
 # Run the server for local development or testing
 if __name__ == "__main__":
     mcp.run(transport="sse")
@@ -0,0 +1,316 @@
+# service/cache.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Directory holding every on-disk cache file
+CACHE_DIR = os.getenv("SMART_MCP_CACHE_DIR", ".cache")
+
+
+class DiskCache:
+    """
+    A small SQLite-backed key/value store with per-entry TTL and
+    least-recently-used eviction by entry count and, optionally, by total
+    size of the stored values. Values must be JSON-serialisable.
+    Safe to share between threads.
+    """
+
+    def __init__(self, name: str, max_entries: int = 1000, ttl: Optional[float] = None,
+                 directory: str = CACHE_DIR, max_bytes: Optional[int] = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{name}.sqlite3")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL,"
+            " accessed_at REAL NOT NULL,"
+            " size INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(entries)")]
+        if "size" not in columns:
+            # Cache files created before size-based eviction; payloads are ASCII JSON, so
+            # LENGTH() matches the byte size set() records
+            self._conn.execute("ALTER TABLE entries ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute("UPDATE entries SET size = LENGTH(value)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+        self.hits = 0
+        self.misses = 0
+
+    def get_entry(self, key: str) -> Optional[Tuple[Any, Optional[float]]]:
+        """Return (value, expires_at) for a live entry, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[1] is not None and row[1] <= now:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0]), row[1]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the cached value, or default if missing or expired."""
+        entry = self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, expires_at: Optional[float] = None):
+        """Store a value. ttl overrides the cache default; expires_at overrides both."""
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        if expires_at is None and ttl is not None:
+            expires_at = now + ttl
+        payload = json.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at, accessed_at, size) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, expires_at, now, len(payload)),
+            )
+            self._evict()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        return row is not None and (row[0] is None or row[0] > time.time())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "bytes": self.size_bytes(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+    def _evict(self):
+        """Drop expired entries, then the least recently used ones over max_entries / max_bytes."""
+        self._conn.execute("DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        overflow = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
+        if self.max_bytes is not None:
+            excess = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0] - self.max_bytes
+            if excess > 0:
+                doomed = []
+                for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+                    if excess <= 0:
+                        break
+                    doomed.append((key,))
+                    excess -= size
+                self._conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+
+
+class MemoryLRU:
+    """
+    Thread-safe in-process LRU map with per-entry expiry, bounded by entry
+    count and optionally by the total (JSON-encoded) size of the values.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: Optional[float] = None, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self.size_bytes = 0
+
+    def get_entry(self, key: str) -> Optional[Tuple[Any, Optional[float]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] is not None and entry[1] <= time.time():
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, expires_at: Optional[float] = None,
+            size: Optional[int] = None):
+        ttl = self.ttl if ttl is None else ttl
+        if expires_at is None and ttl is not None:
+            expires_at = time.time() + ttl
+        if size is None and self.max_bytes is not None:
+            size = len(json.dumps(value))
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (value, expires_at)
+            self._sizes[key] = size or 0
+            self.size_bytes += size or 0
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or (self.max_bytes is not None and self.size_bytes > self.max_bytes)):
+                self._pop(next(iter(self._entries)))
+
+    def _pop(self, key: str):
+        if self._entries.pop(key, None) is not None:
+            self.size_bytes -= self._sizes.pop(key, 0)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.size_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class TieredCache:
+    """
+    In-memory LRU in front of a DiskCache. Reads try memory first, then disk
+    (promoting the entry into memory); writes go to both tiers with the same
+    expiry. Hit/miss counters are kept per tier.
+    """
+
+    def __init__(self, name: str, ttl: Optional[float] = None, max_entries: int = 1000,
+                 memory_entries: int = 256, directory: str = CACHE_DIR,
+                 max_bytes: Optional[int] = None, memory_bytes: Optional[int] = None):
+        self.name = name
+        self.ttl = ttl
+        self.memory = MemoryLRU(max_entries=memory_entries, ttl=ttl, max_bytes=memory_bytes)
+        self.disk = DiskCache(name, max_entries=max_entries, ttl=ttl, directory=directory, max_bytes=max_bytes)
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self.memory.get_entry(key)
+        if entry is not None:
+            self._count("memory_hits")
+            return entry[0]
+        entry = self.disk.get_entry(key)
+        if entry is not None:
+            self._count("disk_hits")
+            value, expires_at = entry
+            self.memory.set(key, value, expires_at=expires_at)
+            return value
+        self._count("misses")
+        return default
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        self.memory.set(key, value, expires_at=expires_at)
+        self.disk.set(key, value, expires_at=expires_at)
+
+    def delete(self, key: str):
+        self.memory.delete(key)
+        self.disk.delete(key)
+
+    def clear(self):
+        self.memory.clear()
+        self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_entries": len(self.memory),
+            "disk_entries": len(self.disk),
+            "memory_bytes": self.memory.size_bytes,
+            "disk_bytes": self.disk.size_bytes(),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+        }
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one: the first caller
+    runs the function, later callers block until it finishes and share its
+    result (or its exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, "_Flight"] = {}
+        self.coalesced = 0
+
+    def do(self, key: str, fn, *args, **kwargs) -> Any:
+        with self._lock:
+            flight = self._calls.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._calls[key] = _Flight()
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = fn(*args, **kwargs)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            flight.done.set()
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
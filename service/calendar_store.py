@@ -0,0 +1,201 @@
+# service/calendar_store.py
+import bisect
+import datetime
+import logging
+import os
+import threading
+import time
+
+import pytz
+from dotenv import load_dotenv
+
+from service.credentials import credential_manager
+load_dotenv()
+
+# Answer list_meetings and primary-calendar conflict checks from the local store
+CALENDAR_STORE_ENABLED = os.getenv("CALENDAR_STORE_ENABLED", "1").lower() in ("1", "true", "yes")
+# Seconds between background syncs
+CALENDAR_SYNC_INTERVAL = float(os.getenv("CALENDAR_SYNC_INTERVAL", 60))
+# The initial full sync starts this many days in the past
+CALENDAR_STORE_PAST_DAYS = int(os.getenv("CALENDAR_STORE_PAST_DAYS", 1))
+
+
+def _event_time(value, timezone):
+    """Start/end of an event as an aware datetime; all-day dates start at local midnight."""
+    if 'dateTime' in value:
+        return datetime.datetime.fromisoformat(value['dateTime'].replace('Z', '+00:00'))
+    day = datetime.date.fromisoformat(value['date'])
+    return pytz.timezone(value.get('timeZone') or timezone).localize(datetime.datetime.combine(day, datetime.time()))
+
+
+class CalendarEventStore:
+    """
+    An in-process copy of one calendar's events, kept current with Calendar
+    syncToken incremental sync (a 410 Gone token triggers a full resync).
+
+    Events are indexed by a list of (start, id) sorted with bisect. An overlap
+    query bisects to the first event that could still be running at the query
+    start (start - longest event duration) and scans forward until the query
+    end, so lookups don't touch the API and only walk nearby events.
+
+    Sync requests run on the background sync thread as well as on tool
+    threads, so each thread executes them over its own AuthorizedHttp rather
+    than the service's shared (not thread-safe) httplib2 connection.
+    """
+
+    def __init__(self, service_factory, calendar_id='primary', timezone='Asia/Kolkata',
+                 sync_interval=CALENDAR_SYNC_INTERVAL, past_days=CALENDAR_STORE_PAST_DAYS, http_factory=None):
+        self._service_factory = service_factory
+        self._http_factory = http_factory
+        self._local = threading.local()
+        self.calendar_id = calendar_id
+        self.timezone = timezone
+        self.sync_interval = sync_interval
+        self.past_days = past_days
+        self.sync_token = None
+        self.last_synced = None
+        self._events = {}
+        self._index = []
+        self._max_duration = datetime.timedelta(0)
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._syncer = None
+
+    def __len__(self):
+        return len(self._events)
+
+    # ----- index maintenance -----
+
+    def _remove(self, event_id):
+        entry = self._events.pop(event_id, None)
+        if entry is not None:
+            position = bisect.bisect_left(self._index, (entry['_start'], event_id))
+            if position < len(self._index) and self._index[position] == (entry['_start'], event_id):
+                del self._index[position]
+
+    def apply(self, event):
+        """Insert, update or (for cancelled events) remove one event."""
+        with self._lock:
+            self._remove(event['id'])
+            if event.get('status') == 'cancelled':
+                return
+            start = _event_time(event['start'], self.timezone)
+            end = _event_time(event['end'], self.timezone)
+            self._events[event['id']] = {**event, '_start': start, '_end': end}
+            bisect.insort(self._index, (start, event['id']))
+            self._max_duration = max(self._max_duration, end - start)
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+            self._index.clear()
+            self._max_duration = datetime.timedelta(0)
+            self.sync_token = None
+
+    # ----- queries -----
+
+    def overlapping(self, time_min, time_max, include_transparent=False):
+        """Events with start < time_max and end > time_min, ordered by start."""
+        self.ensure_synced()
+        with self._lock:
+            position = bisect.bisect_left(self._index, (time_min - self._max_duration, ''))
+            events = []
+            for start, event_id in self._index[position:]:
+                if start >= time_max:
+                    break
+                event = self._events[event_id]
+                if event['_end'] <= time_min:
+                    continue
+                if not include_transparent and event.get('transparency') == 'transparent':
+                    continue
+                events.append(event)
+            return events
+
+    def upcoming(self, now=None, limit=10):
+        """The next events still running at or after now, like events.list(timeMin=now)."""
+        now = now or datetime.datetime.now(pytz.utc)
+        return self.overlapping(now, datetime.datetime.max.replace(tzinfo=pytz.utc), include_transparent=True)[:limit]
+
+    # ----- sync -----
+
+    def _http(self):
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            if self._http_factory is not None:
+                http = self._http_factory()
+            else:
+                import google_auth_httplib2
+                import httplib2
+                http = google_auth_httplib2.AuthorizedHttp(credential_manager.get_credentials(), http=httplib2.Http())
+            self._local.http = http
+        return http
+
+    def _list_pages(self, **params):
+        service = self._service_factory()
+        page_token = None
+        while True:
+            response = service.events().list(
+                calendarId=self.calendar_id, singleEvents=True, pageToken=page_token, **params
+            ).execute(http=self._http())
+            yield from response.get('items', [])
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                self.sync_token = response.get('nextSyncToken', self.sync_token)
+                return
+
+    def full_sync(self):
+        time_min = datetime.datetime.now(pytz.utc) - datetime.timedelta(days=self.past_days)
+        events = list(self._list_pages(timeMin=time_min.isoformat()))
+        with self._lock:
+            sync_token = self.sync_token
+            self.clear()
+            self.sync_token = sync_token
+            for event in events:
+                self.apply(event)
+        logging.info(f"Calendar store loaded {len(self._events)} events")
+
+    def incremental_sync(self):
+        # The sync token stays valid until the whole page run succeeds
+        token, self.sync_token = self.sync_token, None
+        try:
+            events = list(self._list_pages(syncToken=token, showDeleted=True))
+        except BaseException:
+            self.sync_token = token
+            raise
+        for event in events:
+            self.apply(event)
+        return len(events)
+
+    def sync(self):
+        with self._sync_lock:
+            if self.sync_token is None:
+                self.full_sync()
+            else:
+                try:
+                    self.incremental_sync()
+                except Exception as e:
+                    if getattr(getattr(e, 'resp', None), 'status', None) != 410:
+                        raise
+                    logging.info("Calendar sync token expired; resyncing")
+                    self.sync_token = None
+                    self.full_sync()
+            self.last_synced = time.time()
+
+    def ensure_synced(self):
+        """Sync inline on first use, then keep syncing in the background."""
+        if self.last_synced is None:
+            self.sync()
+        if self._syncer is None and not self._stopped.is_set():
+            self._syncer = threading.Thread(target=self._sync_loop, name="calendar-sync", daemon=True)
+            self._syncer.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _sync_loop(self):
+        while not self._stopped.wait(self.sync_interval):
+            try:
+                self.sync()
+            except Exception as e:
+                logging.warning(f"Background calendar sync failed: {e}")
@@ -0,0 +1,191 @@
+# service/classifier.py
+import math
+import os
+import re
+from typing import Any, Dict, List, Tuple
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Queries classified locally with at least this confidence skip the LLM classifier
+LOCAL_CLASSIFIER_THRESHOLD = float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", 0.75))
+
+# Occurrences of a single feature beyond this don't add more evidence
+MAX_FEATURE_COUNT = 3
+
+# Feature name -> regex. All features are compiled into one alternation and
+# scanned in a single pass over the lower-cased query.
+FEATURE_PATTERNS = {
+    "arithmetic": r"\d+(?:\.\d+)?\s*(?:[-+*/^%×x]|plus|minus|times|divided by)\s*\d+",
+    "number": r"\d+(?:\.\d+)?",
+    "math": r"\b(?:calculate|compute|solve|evaluate|percentage|percent|profit|loss|interest|ratio|average|"
+            r"speed|distance|km/h|mixture|efficiency|probability|area|volume|perimeter|equation|integral|"
+            r"derivative|sum of|product of|how many|how much)\b",
+    "kinship": r"\b(?:father|mother|son|daughter|brother|sister|uncle|aunt|grandfather|grandmother|"
+               r"nephew|niece|husband|wife|cousin)s?\b",
+    "verbal": r"\b(?:relation|related|photograph|pointing|analogy|odd one out|letter series|coded as|"
+              r"code language|syllogism|statements?|conclusions?|assumptions?)\b",
+    "non_verbal": r"\b(?:clock|calendar|day of the week|facing|north|south|east|west|mirror image|"
+                  r"cube|dice|figure|pattern)\b",
+    "coding": r"\b(?:code|program|implement|algorithm|function|class|array|linked list|binary search|"
+              r"recursion|python|java|javascript|typescript|c\+\+|sql|api|bug|debug|exception|compile|"
+              r"regex|big-?o|data structure|stack trace)\b",
+    "factual": r"\b(?:what is|what are|who is|who was|define|explain|describe|tell me about|history of|"
+               r"when did|where is)\b",
+    "current": r"\b(?:latest|today|current|currently|news|recent|this week|this year|price of|stock|"
+               r"weather|20\d\d)\b",
+    "identity": r"\b(?:who (?:made|created|built|trained) you|are you|your name|what can you do)\b",
+    "greeting": r"^(?:hi|hello|hey|thanks|thank you|good (?:morning|afternoon|evening))\b",
+    "creative": r"\b(?:write an? (?:poem|story|essay|song)|compose|brainstorm|slogan|tagline)\b",
+}
+
+FEATURES = list(FEATURE_PATTERNS)
+_FEATURE_REGEX = re.compile(
+    "|".join(f"(?P<{name}>{pattern})" for name, pattern in FEATURE_PATTERNS.items()),
+    re.IGNORECASE,
+)
+
+# Domain -> (bias, {feature: weight}); a domain's score is bias + weights · counts
+DOMAIN_WEIGHTS = {
+    "mathematics": (-1.0, {"arithmetic": 4.0, "number": 0.6, "math": 1.5, "coding": -0.5, "kinship": -0.5}),
+    "verbal_reasoning": (-1.0, {"kinship": 1.8, "verbal": 1.5}),
+    "non_verbal_reasoning": (-1.0, {"non_verbal": 1.5, "number": 0.2}),
+    "programming": (-1.0, {"coding": 1.8}),
+    "factual": (-1.0, {"factual": 3.5, "current": 2.0, "identity": 4.0, "number": -0.2, "kinship": -1.0}),
+    "conversational": (-1.0, {"greeting": 4.0}),
+    "creative": (-1.0, {"creative": 4.0}),
+    "general": (1.5, {}),
+}
+
+DOMAINS = list(DOMAIN_WEIGHTS)
+# Dense weight matrix (domains x features) and bias vector
+_BIASES = [DOMAIN_WEIGHTS[domain][0] for domain in DOMAINS]
+_WEIGHTS = [[DOMAIN_WEIGHTS[domain][1].get(feature, 0.0) for feature in FEATURES] for domain in DOMAINS]
+
+# Checked in order: specific problem types come before "percentage", since
+# interest, profit/loss and mixture problems are usually stated with a %
+CALCULATION_KEYWORDS = [
+    ("simple_interest", ("simple interest",)),
+    ("compound_interest", ("interest",)),
+    ("profit_loss", ("profit", "loss")),
+    ("mixture", ("mixture",)),
+    ("speed_distance_time", ("speed", "distance", "km/h")),
+    ("work_time", ("work", "efficiency")),
+    ("probability", ("probability",)),
+    ("geometry", ("area", "volume", "perimeter")),
+    ("percentage", ("percentage", "percent", "%")),
+    ("basic_arithmetic", ("+", "-", "*", "/", "plus", "minus", "times", "divided by")),
+]
+
+REASONING_SUBTYPE_KEYWORDS = [
+    ("blood_relation", ("father", "mother", "son", "daughter", "relation", "related")),
+    ("analogy", ("analogy",)),
+    ("classification", ("odd one out",)),
+    ("coding_decoding", ("coded as", "code language")),
+    ("syllogism", ("syllogism",)),
+    ("statement_argument", ("statement", "argument", "assumption")),
+    ("letter_series", ("letter series",)),
+    ("calendar_clock", ("clock", "calendar", "day of the week")),
+    ("direction_distance", ("facing", "north", "south", "east", "west")),
+    ("mirror_images", ("mirror image",)),
+    ("cube_folding", ("cube", "dice")),
+    ("pattern_recognition", ("pattern", "figure")),
+]
+
+CODING_TYPE_KEYWORDS = [
+    ("debugging", ("bug", "debug", "exception", "stack trace", "error")),
+    ("data_structures", ("array", "linked list", "stack", "queue", "tree", "graph", "data structure")),
+    ("algorithms", ("algorithm", "binary search", "sort", "recursion", "big-o", "big o")),
+    ("database", ("sql", "database", "query")),
+    ("web_development", ("html", "css", "javascript", "react")),
+    ("api_development", ("api", "rest", "graphql")),
+]
+
+
+def _first_match(query_lower: str, table) -> Any:
+    for label, keywords in table:
+        if any(keyword in query_lower for keyword in keywords):
+            return label
+    return None
+
+
+def extract_features(query: str) -> List[int]:
+    """Count occurrences of every feature in a single regex pass."""
+    counts = dict.fromkeys(FEATURES, 0)
+    for match in _FEATURE_REGEX.finditer(query):
+        counts[match.lastgroup] += 1
+    return [min(counts[feature], MAX_FEATURE_COUNT) for feature in FEATURES]
+
+
+def score_domains(features: List[int]) -> Dict[str, float]:
+    """Softmax over the linear domain scores."""
+    scores = [
+        bias + sum(weight * count for weight, count in zip(row, features) if count)
+        for bias, row in zip(_BIASES, _WEIGHTS)
+    ]
+    top = max(scores)
+    exps = [math.exp(score - top) for score in scores]
+    total = sum(exps)
+    return {domain: value / total for domain, value in zip(DOMAINS, exps)}
+
+
+def classify_locally(query: str) -> Tuple[Dict[str, Any], float]:
+    """
+    Classify a query with keyword/regex features and a linear scorer.
+    Returns (problem_type, confidence) where problem_type has the same shape as
+    the LLM classification (minus "complexity", which the caller fills in).
+    """
+    query_lower = query.lower().strip()
+    features = extract_features(query_lower)
+    feature = dict(zip(FEATURES, features))
+    probabilities = score_domains(features)
+    domain = max(probabilities, key=probabilities.get)
+    confidence = probabilities[domain]
+
+    is_math = domain == "mathematics"
+    is_verbal = domain == "verbal_reasoning"
+    is_non_verbal = domain == "non_verbal_reasoning"
+    is_coding = domain == "programming"
+    is_factual = domain == "factual"
+
+    calculation_type = (_first_match(query_lower, CALCULATION_KEYWORDS) or "general_math") if is_math else None
+    reasoning_subtype = _first_match(query_lower, REASONING_SUBTYPE_KEYWORDS) if (is_verbal or is_non_verbal) else None
+    coding_type = (_first_match(query_lower, CODING_TYPE_KEYWORDS) or "general_programming") if is_coding else None
+
+    if is_math or is_verbal or is_non_verbal:
+        query_intent = "solve"
+    elif is_coding:
+        query_intent = "debug" if coding_type == "debugging" else "create"
+    elif feature["identity"]:
+        query_intent = "identity"
+    elif is_factual:
+        query_intent = "research" if feature["current"] else "explain"
+    elif domain == "creative":
+        query_intent = "create"
+    else:
+        query_intent = "explain"
+
+    problem_type = {
+        "is_mathematical": is_math,
+        "is_logical_reasoning": is_verbal or is_non_verbal,
+        "is_analytical": False,
+        "is_creative": domain == "creative",
+        "is_factual": is_factual,
+        "is_verbal_reasoning": is_verbal,
+        "is_non_verbal_reasoning": is_non_verbal,
+        "is_simple_solvable": True,
+        "is_coding": is_coding,
+        "domain": domain,
+        "requires_calculation": is_math,
+        "requires_research": is_factual,
+        "requires_multi_step_reasoning": is_math or is_verbal or is_non_verbal,
+        "calculation_type": calculation_type,
+        "reasoning_type": "verbal" if is_verbal else "non_verbal" if is_non_verbal else None,
+        "reasoning_subtype": reasoning_subtype,
+        "coding_type": coding_type,
+        "parameters": {"numbers": re.findall(r"\d+(?:\.\d+)?", query)} if is_math else {},
+        "query_intent": query_intent,
+        "confidence_level": round(confidence, 3),
+        "classified_by": "local",
+    }
+    return problem_type, confidence
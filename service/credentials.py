@@ -0,0 +1,215 @@
+# service/credentials.py
+import datetime
+import logging
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import webbrowser
+
+from google.auth.transport.requests import Request
+from google_auth_oauthlib.flow import InstalledAppFlow
+from dotenv import load_dotenv
+load_dotenv()
+
+# One token covers every Google API the server talks to. Tokens saved before Gmail and
+# Calendar shared a token only carry one of these and are re-authorised once (see README)
+GOOGLE_SCOPES = [
+    'https://mail.google.com/',
+    'https://www.googleapis.com/auth/calendar',
+]
+TOKEN_PATH = os.getenv("GOOGLE_TOKEN_PATH", "token.pickle")
+CLIENT_SECRETS_PATH = os.getenv("GOOGLE_CREDENTIALS_PATH", "credentials.json")
+# How to authorise when there's no usable token: "browser" opens a local browser,
+# "console" prints a URL and reads back the redirected URL from stdin, "none" fails
+# with instructions, and "auto" uses the browser when one is available, else fails
+GOOGLE_AUTH_MODE = os.getenv("GOOGLE_AUTH_MODE", "auto").lower()
+# Any localhost port is accepted for desktop OAuth clients; nothing listens on this one,
+# so in console mode the browser shows an error page whose URL carries the code
+CONSOLE_REDIRECT_URI = "http://localhost:1/"
+
+# Refresh the access token this many seconds before it expires
+REFRESH_MARGIN = float(os.getenv("GOOGLE_TOKEN_REFRESH_MARGIN", 300))
+# Wait this long before retrying a failed background refresh
+REFRESH_RETRY_DELAY = 60
+
+
+class GoogleAuthorizationRequired(RuntimeError):
+    """No usable token, and this process can't run the OAuth consent flow itself."""
+
+
+class CredentialManager:
+    """
+    Owns the shared Google OAuth credentials for Gmail and Calendar.
+
+    The token is loaded once and shared by every service. A daemon thread
+    refreshes it shortly before it expires, so tool calls don't pay for a
+    refresh on the request path. All refreshes happen under one lock, so
+    concurrent callers never hit the OAuth endpoint at the same time. The
+    token file is written atomically (temp file + rename).
+
+    A missing token, or one lacking some of the scopes, needs the user's
+    consent. Re-authorisation asks for the scopes already granted plus the
+    missing ones, so an older single-service token is upgraded rather than
+    replaced. See GOOGLE_AUTH_MODE for how consent is obtained; a headless
+    server should create the token beforehand with
+    `python -m service.credentials --console`.
+    """
+
+    def __init__(self, token_path: str = TOKEN_PATH, client_secrets_path: str = CLIENT_SECRETS_PATH,
+                 scopes=None, refresh_margin: float = REFRESH_MARGIN, auth_mode: str = GOOGLE_AUTH_MODE):
+        self.token_path = token_path
+        self.client_secrets_path = client_secrets_path
+        self.scopes = list(GOOGLE_SCOPES if scopes is None else scopes)
+        self.refresh_margin = refresh_margin
+        self.auth_mode = auth_mode
+        self._creds = None
+        self._lock = threading.RLock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._refresher = None
+
+    def get_credentials(self):
+        """Return valid credentials, loading, refreshing or authorising them if needed."""
+        with self._lock:
+            if self._creds is None:
+                self._creds = self._load()
+            if not self._creds or not self._creds.has_scopes(self.scopes):
+                self._creds = self._authorize()
+            elif not self._creds.valid or self._expires_in() <= self.refresh_margin:
+                self._refresh()
+            self._start_refresher()
+            return self._creds
+
+    def stop(self):
+        """Stop the background refresher."""
+        self._stopped = True
+        self._wakeup.set()
+
+    def _load(self):
+        if not os.path.exists(self.token_path):
+            return None
+        with open(self.token_path, 'rb') as token:
+            return pickle.load(token)
+
+    def _save(self):
+        """Write the token file atomically so a crash never leaves it half-written."""
+        directory = os.path.dirname(os.path.abspath(self.token_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".token-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                pickle.dump(self._creds, tmp)
+                tmp.flush()
+                os.fsync(tmp.fileno())
+            os.replace(tmp_path, self.token_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _requested_scopes(self):
+        """The scopes to ask for: everything already granted plus what's missing."""
+        granted = list(getattr(self._creds, "scopes", None) or [])
+        return granted + [scope for scope in self.scopes if scope not in granted]
+
+    def _auth_mode(self) -> str:
+        if self.auth_mode != "auto":
+            return self.auth_mode
+        try:
+            webbrowser.get()
+            return "browser"
+        except webbrowser.Error:
+            return "none"
+
+    def _authorize(self):
+        scopes = self._requested_scopes()
+        mode = self._auth_mode()
+        if mode not in ("browser", "console"):
+            if self._creds:
+                problem = f"was granted {sorted(self._creds.scopes or [])} but needs {self.scopes}"
+            else:
+                problem = "is missing"
+            raise GoogleAuthorizationRequired(
+                f"The Google token at {self.token_path} {problem}, and no browser is available to "
+                f"authorise it. Run `python -m service.credentials --console` once, or set GOOGLE_AUTH_MODE."
+            )
+        if self._creds:
+            logging.warning(f"Google token lacks {sorted(set(self.scopes) - set(self._creds.scopes or []))}; "
+                            "re-authorising once for the combined scopes")
+        flow = InstalledAppFlow.from_client_secrets_file(self.client_secrets_path, scopes)
+        if mode == "console":
+            self._creds = self._console_flow(flow)
+        else:
+            self._creds = flow.run_local_server(port=0, access_type="offline", include_granted_scopes="true")
+        self._save()
+        return self._creds
+
+    @staticmethod
+    def _console_flow(flow):
+        """Consent on any machine's browser; the user pastes back the URL it was redirected to."""
+        flow.redirect_uri = CONSOLE_REDIRECT_URI
+        url, _ = flow.authorization_url(prompt="consent", access_type="offline", include_granted_scopes="true")
+        print(f"Open this URL in a browser and approve access:\n\n{url}\n", file=sys.stderr)
+        print("The browser then fails to load a localhost page; paste that page's full URL here.", file=sys.stderr)
+        response = input("Redirected URL: ").strip()
+        # The redirect is plain http on localhost, which oauthlib otherwise refuses
+        flow.fetch_token(authorization_response=response.replace("http://", "https://", 1))
+        return flow.credentials
+
+    def _refresh(self):
+        if not self._creds.refresh_token:
+            self._authorize()
+            return
+        self._creds.refresh(Request())
+        self._save()
+        logging.info("Google OAuth token refreshed")
+
+    def _expires_in(self) -> float:
+        """Seconds until the access token expires (inf if it has no expiry)."""
+        expiry = getattr(self._creds, "expiry", None)
+        if expiry is None:
+            return float("inf")
+        # google-auth stores expiry as a naive UTC datetime
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return (expiry - now).total_seconds()
+
+    def _start_refresher(self):
+        if self._refresher is None and not self._stopped:
+            self._refresher = threading.Thread(target=self._refresh_loop, name="google-token-refresh", daemon=True)
+            self._refresher.start()
+
+    def _refresh_loop(self):
+        while not self._stopped:
+            with self._lock:
+                if not self._creds.refresh_token:
+                    # Needs interactive re-authorisation; leave that to the request path
+                    self._refresher = None
+                    return
+                delay = self._expires_in() - self.refresh_margin
+            if delay > 0:
+                self._wakeup.wait(min(delay, 3600))
+                self._wakeup.clear()
+                continue
+            try:
+                with self._lock:
+                    # Another caller may have refreshed while we waited for the lock
+                    if self._expires_in() <= self.refresh_margin:
+                        self._refresh()
+            except Exception as e:
+                logging.warning(f"Background token refresh failed: {e}")
+                self._wakeup.wait(REFRESH_RETRY_DELAY)
+                self._wakeup.clear()
+
+
+credential_manager = CredentialManager()
+
+
+if __name__ == "__main__":
+    # Create or upgrade the token ahead of time, e.g. on a headless server:
+    #   python -m service.credentials --console
+    mode = "console" if "--console" in sys.argv[1:] else "browser"
+    manager = CredentialManager(auth_mode=mode)
+    manager.stop()
+    manager.get_credentials()
+    print(f"Saved a token for {manager.scopes} to {manager.token_path}")
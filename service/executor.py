@@ -0,0 +1,268 @@
+# service/executor.py
+import asyncio
+import contextlib
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+from mcp.server.fastmcp import Context
+load_dotenv()
+
+# Total number of worker threads shared by every sync tool
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", 16))
+
+# Default number of concurrent calls allowed per limit group
+DEFAULT_TOOL_LIMIT = int(os.getenv("TOOL_DEFAULT_LIMIT", 4))
+
+# Per-group concurrency limits. The Google API clients share one httplib2
+# connection per service object, which is not thread-safe, so every tool that
+# touches the same service is kept to a single in-flight call.
+TOOL_LIMITS = {
+    "Insight_scope": int(os.getenv("INSIGHT_SCOPE_LIMIT", 8)),
+    "Quickclarity": int(os.getenv("QUICKCLARITY_LIMIT", 8)),
+    "Corebrief": int(os.getenv("COREBRIEF_LIMIT", 4)),
+    "Geo_whisper": int(os.getenv("GEO_WHISPER_LIMIT", 4)),
+    "gmail": 1,
+    # Bulk sends use their own connection per worker thread and are paced
+    # by a token bucket, so they don't hold up the shared Gmail service
+    "gmail_send_bulk": 1,
+    "calendar": 1,
+}
+
+# Tools that share a limit group with other tools
+TOOL_GROUPS = {
+    "gmail_send": "gmail",
+    "gmail_draft": "gmail",
+    "gmail_search": "gmail",
+    "schedule_meeting": "calendar",
+    "schedule_meetings": "calendar",
+    "find_slots": "calendar",
+    "schedule_best_slot": "calendar",
+    "list_meetings": "calendar",
+}
+
+# Read-only tools whose concurrent identical calls share one execution
+COALESCE_TOOLS = [
+    name.strip()
+    for name in os.getenv("COALESCE_TOOLS", "Insight_scope,Quickclarity,Corebrief,Geo_whisper,Reasoning_agent").split(",")
+    if name.strip()
+]
+
+# Side-effecting tools are never coalesced, whatever COALESCE_TOOLS says:
+# two identical sends are two emails
+NEVER_COALESCE = {
+    "gmail_send", "gmail_send_bulk", "gmail_draft",
+    "schedule_meeting", "schedule_meetings", "schedule_best_slot",
+}
+
+
+class ToolExecutor:
+    """
+    Runs blocking tool bodies on a bounded thread pool so the event loop
+    stays free for other sessions. Each tool (or group of tools) gets its own
+    concurrency limit, and calls over the limit wait in a per-group queue.
+    """
+
+    def __init__(self, max_workers: int = TOOL_WORKERS,
+                 limits: Optional[Dict[str, int]] = None,
+                 groups: Optional[Dict[str, str]] = None,
+                 default_limit: int = DEFAULT_TOOL_LIMIT):
+        self.max_workers = max_workers
+        self.limits = dict(TOOL_LIMITS if limits is None else limits)
+        self.groups = dict(TOOL_GROUPS if groups is None else groups)
+        self.default_limit = default_limit
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._lock = threading.Lock()
+        self._queued: Dict[str, int] = {}
+        self._running: Dict[str, int] = {}
+        self._completed: Dict[str, int] = {}
+        self._failed: Dict[str, int] = {}
+        self._wait_time: Dict[str, float] = {}
+
+    def _group(self, tool_name: str) -> str:
+        return self.groups.get(tool_name, tool_name)
+
+    def _semaphore(self, group: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(group)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.limits.get(group, self.default_limit))
+            self._semaphores[group] = semaphore
+        return semaphore
+
+    def _bump(self, counter: Dict[str, Any], tool_name: str, amount=1):
+        with self._lock:
+            counter[tool_name] = counter.get(tool_name, 0) + amount
+
+    @contextlib.asynccontextmanager
+    async def slot(self, tool_name: str):
+        """Hold one of the tool's concurrency slots, with queue and throughput accounting."""
+        enqueued_at = time.perf_counter()
+        self._bump(self._queued, tool_name)
+        waiting = True
+        try:
+            async with self._semaphore(self._group(tool_name)):
+                waiting = False
+                self._bump(self._queued, tool_name, -1)
+                self._bump(self._wait_time, tool_name, time.perf_counter() - enqueued_at)
+                self._bump(self._running, tool_name)
+                try:
+                    yield
+                except Exception:
+                    self._bump(self._failed, tool_name)
+                    raise
+                finally:
+                    self._bump(self._running, tool_name, -1)
+                self._bump(self._completed, tool_name)
+        finally:
+            if waiting:
+                # Cancelled before a slot was free
+                self._bump(self._queued, tool_name, -1)
+
+    async def run(self, tool_name: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) on the worker pool under the tool's limit.
+        A worker thread can't be interrupted, so a caller cancelled after fn
+        started leaves the slot held until fn actually returns; a caller
+        cancelled while still queued never runs fn.
+        """
+        loop = asyncio.get_running_loop()
+        started = False
+
+        async def _hold():
+            nonlocal started
+            async with self.slot(tool_name):
+                started = True
+                return await loop.run_in_executor(self._pool, functools.partial(fn, *args, **kwargs))
+
+        task = asyncio.ensure_future(_hold())
+        # Nobody may be left to read the result of an abandoned call
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not started:
+                task.cancel()
+            raise
+
+    async def run_async(self, tool_name: str, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Await an async tool body under the tool's limit (it stays on the event loop)."""
+        async with self.slot(tool_name):
+            return await fn(*args, **kwargs)
+
+    def queue_depth(self, tool_name: Optional[str] = None) -> int:
+        """Number of calls waiting for a slot, for one tool or for all tools."""
+        with self._lock:
+            if tool_name is not None:
+                return self._queued.get(tool_name, 0)
+            return sum(self._queued.values())
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of queue depth and throughput per tool."""
+        with self._lock:
+            names = set(self._queued) | set(self._running) | set(self._completed) | set(self._failed)
+            tools = {}
+            for name in sorted(names):
+                completed = self._completed.get(name, 0)
+                failed = self._failed.get(name, 0)
+                started = completed + failed + self._running.get(name, 0)
+                tools[name] = {
+                    "group": self._group(name),
+                    "limit": self.limits.get(self._group(name), self.default_limit),
+                    "queued": self._queued.get(name, 0),
+                    "running": self._running.get(name, 0),
+                    "completed": completed,
+                    "failed": failed,
+                    "avg_wait_ms": round(1000 * self._wait_time.get(name, 0.0) / started, 2) if started else 0.0,
+                }
+            return {
+                "max_workers": self.max_workers,
+                "queue_depth": sum(self._queued.values()),
+                "running": sum(self._running.values()),
+                "tools": tools,
+            }
+
+
+class Coalescer:
+    """
+    Single-flight for async MCP tools. Concurrent calls to an eligible tool
+    with the same canonicalised arguments await one shared task instead of
+    each hitting the upstream API. The shared task isn't cancelled when the
+    caller that started it goes away, so the other waiters still get the
+    result. Only the first caller receives progress notifications.
+    """
+
+    def __init__(self, tools=None):
+        self.tools = set(COALESCE_TOOLS if tools is None else tools) - NEVER_COALESCE
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._calls: Dict[str, int] = {}
+        self._coalesced: Dict[str, int] = {}
+
+    @staticmethod
+    def _canonical(value):
+        if isinstance(value, str):
+            return value.strip()
+        if isinstance(value, dict):
+            return {str(key): Coalescer._canonical(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [Coalescer._canonical(item) for item in value]
+        return value
+
+    def key(self, tool_name: str, signature: inspect.Signature, args, kwargs) -> tuple:
+        """(tool name, JSON of the bound arguments with defaults applied, Context excluded)."""
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = {
+            name: self._canonical(value)
+            for name, value in bound.arguments.items()
+            if not _is_context(signature.parameters[name])
+        }
+        return tool_name, json.dumps(arguments, sort_keys=True, default=str)
+
+    def __call__(self, fn: Callable[..., Awaitable[Any]]):
+        """Decorator for an async tool; functools.wraps keeps the signature FastMCP reads."""
+        tool_name = fn.__name__
+        if tool_name not in self.tools:
+            return fn
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            key = self.key(tool_name, signature, args, kwargs)
+            with self._lock:
+                self._calls[tool_name] = self._calls.get(tool_name, 0) + 1
+                task = self._inflight.get(key)
+                if task is None:
+                    task = asyncio.ensure_future(fn(*args, **kwargs))
+                    self._inflight[key] = task
+                    task.add_done_callback(lambda _: self._inflight.pop(key, None))
+                else:
+                    self._coalesced[tool_name] = self._coalesced.get(tool_name, 0) + 1
+            return await asyncio.shield(task)
+
+        return wrapper
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tools": sorted(self.tools),
+                "in_flight": len(self._inflight),
+                "calls": dict(self._calls),
+                "coalesced": dict(self._coalesced),
+            }
+
+
+def _is_context(parameter: inspect.Parameter) -> bool:
+    annotation = parameter.annotation
+    return isinstance(annotation, type) and issubclass(annotation, Context)
+
+
+tool_executor = ToolExecutor()
+coalesce = Coalescer()
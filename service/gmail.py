@@ -1,18 +1,14 @@
 import os
 import json
-import pickle
+import html
+import importlib
+import threading
 from openai import OpenAI
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from langchain_community.tools.gmail import GmailSendMessage
-from langchain_google_community.gmail.create_draft import GmailCreateDraft
-from langchain_google_community.gmail.search import GmailSearch, Resource
-from langchain_google_community.gmail.get_message import GmailGetMessage
 from openai import OpenAI
 import os
 from dotenv import load_dotenv
+from service.credentials import credential_manager
+from service.google_services import LazyGoogleService
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -26,37 +22,213 @@ client = OpenAI(api_key=OPENAI_API_KEY)
 # ===================
 def authenticate_gmail():
     """Authenticate Gmail and return Gmail API service."""
-    SCOPES = ['https://mail.google.com/']
-    creds = None
+    return gmail_service.get()
 
-    if os.path.exists('token.pickle'):
-        with open('token.pickle', 'rb') as token:
-            creds = pickle.load(token)
 
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
+# Gmail service + tools are built on first use, not at import time
+gmail_service = LazyGoogleService('gmail', 'v1', credential_manager.get_credentials)
+
+# LangChain tool classes per action, imported on first use (LangChain is slow to import)
+GMAIL_TOOL_CLASSES = {
+    "send": ("langchain_community.tools.gmail", "GmailSendMessage"),
+    "draft": ("langchain_google_community.gmail.create_draft", "GmailCreateDraft"),
+    "search": ("langchain_google_community.gmail.search", "GmailSearch"),
+}
+_gmail_tools = {}
+_gmail_tools_lock = threading.Lock()
+
+
+def get_gmail_tool(action):
+    """Return the LangChain Gmail tool for an action ('send', 'draft' or 'search')."""
+    tool = _gmail_tools.get(action)
+    if tool is None:
+        with _gmail_tools_lock:
+            if action not in _gmail_tools:
+                module_name, class_name = GMAIL_TOOL_CLASSES[action]
+                tool_class = getattr(importlib.import_module(module_name), class_name)
+                _gmail_tools[action] = tool_class(api_resource=gmail_service.get())
+            tool = _gmail_tools[action]
+    return tool
+
+# ===================
+# Native search
+# ===================
+
+# Headers requested for (and rendered in) search results
+SEARCH_HEADERS = ["From", "Subject", "Date"]
+# Partial-response projection for each message: only what we render
+DEFAULT_MESSAGE_FIELDS = "id,threadId,snippet,labelIds,internalDate,payload/headers"
+# Sub-requests per batch HTTP call (the Gmail API accepts at most 100)
+GMAIL_BATCH_SIZE = int(os.getenv("GMAIL_BATCH_SIZE", 100))
+
+
+def parse_message_metadata(message):
+    """Flatten a metadata-format message into the shape render_gmail_result expects."""
+    headers = {h["name"].lower(): h["value"] for h in message.get("payload", {}).get("headers", [])}
+    return {
+        "id": message.get("id"),
+        "threadId": message.get("threadId"),
+        "snippet": message.get("snippet", ""),
+        "sender": headers.get("from", ""),
+        "to": headers.get("to", ""),
+        "subject": headers.get("subject", ""),
+        "date": headers.get("date", ""),
+        "labelIds": message.get("labelIds", []),
+        "internalDate": message.get("internalDate"),
+    }
+
+
+def fetch_message_metadata(message_ids, fields=None, service=None, headers=SEARCH_HEADERS):
+    """
+    Fetch header/snippet metadata for many messages through the Gmail batch
+    endpoint: one HTTP request per GMAIL_BATCH_SIZE messages instead of one each.
+    Messages that fail individually come back with an "error" key.
+    """
+    service = service or gmail_service.get()
+    results = {}
+
+    def _collect(request_id, response, exception):
+        if exception is not None:
+            results[request_id] = {"id": request_id, "error": str(exception)}
         else:
-            flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
-            # creds = flow.run_local_server(port=0)
-            creds = flow.run_console()
-        with open('token.pickle', 'wb') as token:
-            pickle.dump(creds, token)
+            results[request_id] = parse_message_metadata(response)
+
+    for start in range(0, len(message_ids), GMAIL_BATCH_SIZE):
+        batch = service.new_batch_http_request(callback=_collect)
+        for message_id in message_ids[start:start + GMAIL_BATCH_SIZE]:
+            batch.add(
+                service.users().messages().get(
+                    userId="me",
+                    id=message_id,
+                    format="metadata",
+                    metadataHeaders=headers,
+                    fields=fields or DEFAULT_MESSAGE_FIELDS,
+                ),
+                request_id=message_id,
+            )
+        batch.execute()
 
-    return build('gmail', 'v1', credentials=creds)
+    return [results[message_id] for message_id in message_ids if message_id in results]
 
 
-# Initialize Gmail service + tools
-service = authenticate_gmail()
-gmail_send_tool = GmailSendMessage(service=service)
-gmail_draft_tool = GmailCreateDraft(api_resource=service)
-gmail_search_tool = GmailSearch(api_resource=service)
-gmail_get_tool = GmailGetMessage(api_resource=service)
+def search_messages(query, max_results=10, fields=None, service=None):
+    """List the ids matching a Gmail query, then batch-fetch their metadata."""
+    service = service or gmail_service.get()
+    message_ids = []
+    page_token = None
+    while len(message_ids) < max_results:
+        response = service.users().messages().list(
+            userId="me",
+            q=query,
+            maxResults=min(500, max_results - len(message_ids)),
+            pageToken=page_token,
+            fields="messages/id,nextPageToken",
+        ).execute()
+        message_ids.extend(message["id"] for message in response.get("messages", []))
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            break
+    return fetch_message_metadata(message_ids[:max_results], fields=fields, service=service)
+
+
+def search_gmail(query, max_results=10, fields=None, llm_format=False):
+    """
+    Search messages and format the results. Served from the local index when
+    GMAIL_INDEX_ENABLED is set, otherwise (or for queries the index can't
+    evaluate) natively against the API with a batched metadata fetch.
+    """
+    # Imported here: gmail_index imports this module
+    from service.gmail_index import UnsupportedQuery, gmail_index
+
+    results = None
+    if gmail_index is not None:
+        try:
+            results = gmail_index.search(query, max_results=max_results)
+        except UnsupportedQuery as e:
+            print(f"Gmail index can't answer {query!r} ({e}); querying the API")
+    if results is None:
+        results = search_messages(query, max_results=max_results, fields=fields)
+    if llm_format:
+        return format_search_results(str(results))
+    return render_gmail_result(results, "search")
+
 
 # ===================
 # Helpers
 # ===================
 
+def _recipients(value):
+    if not value:
+        return ""
+    return ", ".join(value) if isinstance(value, (list, tuple)) else str(value)
+
+
+def _render_messages(messages):
+    lines = [f"📬 Found {len(messages)} email{'s' if len(messages) != 1 else ''}:"]
+    for index, message in enumerate(messages, 1):
+        sender = message.get("sender") or message.get("from") or "Unknown sender"
+        subject = message.get("subject") or "(no subject)"
+        snippet = html.unescape(message.get("snippet") or "").strip()
+        entry = f"{index}. **From:** {sender}\n   **Subject:** {subject}"
+        if snippet:
+            entry += f"\n   {snippet}"
+        lines.append(entry)
+    return "\n\n".join(lines)
+
+
+def _render_threads(threads):
+    lines = [f"🧵 Found {len(threads)} thread{'s' if len(threads) != 1 else ''}:"]
+    for index, thread in enumerate(threads, 1):
+        count = len(thread.get("messages", []))
+        snippet = html.unescape(thread.get("snippet") or "").strip()
+        entry = f"{index}. {snippet or '(no preview)'}"
+        if count:
+            entry += f"\n   {count} message{'s' if count != 1 else ''} in thread"
+        lines.append(entry)
+    return "\n\n".join(lines)
+
+
+def render_gmail_result(result, action, payload=None):
+    """
+    Deterministically format the output of the LangChain Gmail tools
+    (send confirmation, draft id, message/thread lists) without an LLM call.
+    """
+    payload = payload or {}
+    to = _recipients(payload.get("to"))
+    subject = payload.get("subject") or "(no subject)"
+
+    if action == "send":
+        message_id = str(result).split("Message Id:")[-1].strip() if "Message Id:" in str(result) else ""
+        reply = f"✅ Email sent to {to} — “{subject}”."
+        return f"{reply} (Message Id: {message_id})" if message_id else reply
+
+    if action == "draft":
+        draft_id = str(result).split("Draft Id:")[-1].strip() if "Draft Id:" in str(result) else ""
+        reply = f"📝 Draft saved for {to} — “{subject}”."
+        return f"{reply} (Draft Id: {draft_id})" if draft_id else reply
+
+    if action == "search":
+        if not result:
+            return "📭 No emails matched your search."
+        if isinstance(result, list) and all(isinstance(item, dict) for item in result):
+            if any("messages" in item for item in result):
+                return _render_threads(result)
+            return _render_messages(result)
+
+    return str(result)
+
+
+def run_gmail_tool(action, payload, llm_format=False):
+    """
+    Invoke the LangChain Gmail tool for an action and format its output. Formatting
+    is local by default; llm_format=True sends the raw output through format_search_results.
+    """
+    result = get_gmail_tool(action).invoke(payload)
+    if llm_format:
+        return format_search_results(str(result))
+    return render_gmail_result(result, action, payload)
+
+
 def format_search_results(result_message):
     """
     Format Gmail tool responses into a clean conversational style
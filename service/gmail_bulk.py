@@ -0,0 +1,233 @@
+# service/gmail_bulk.py
+import base64
+import csv
+import io
+import logging
+import os
+import random
+import re
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.text import MIMEText
+
+import httplib2
+from dotenv import load_dotenv
+from google.auth.exceptions import TransportError
+
+from service.credentials import credential_manager
+from service.gmail import gmail_service
+load_dotenv()
+
+# messages.send costs 100 quota units against a 15,000 units/user/minute limit,
+# i.e. 2.5 sends/second; stay a little under it
+GMAIL_SEND_RATE = float(os.getenv("GMAIL_SEND_RATE", 2))
+GMAIL_SEND_BURST = int(os.getenv("GMAIL_SEND_BURST", 4))
+# Messages in flight at once; each worker thread has its own HTTP connection
+GMAIL_BULK_WORKERS = int(os.getenv("GMAIL_BULK_WORKERS", 4))
+# Consumer accounts may send ~500 messages a day
+GMAIL_BULK_MAX_RECIPIENTS = int(os.getenv("GMAIL_BULK_MAX_RECIPIENTS", 500))
+GMAIL_SEND_MAX_ATTEMPTS = int(os.getenv("GMAIL_SEND_MAX_ATTEMPTS", 5))
+GMAIL_SEND_BACKOFF = float(os.getenv("GMAIL_SEND_BACKOFF", 1.0))
+
+# messages.send isn't idempotent: only errors that show Gmail never accepted the
+# message are retried. Everything else that may have gone through is reported as
+# "unknown" rather than risking a second copy
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+# Raised before the request left this machine (DNS, refused connection, token refresh)
+NOT_SENT_ERRORS = (httplib2.ServerNotFoundError, ConnectionRefusedError, socket.gaierror, TransportError)
+EMAIL_REGEX = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+
+class TokenBucket:
+    """Thread-safe token bucket: acquire() blocks until a token is available."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+
+
+def parse_recipients(recipients=None, csv_text=None):
+    """
+    Combine a list of addresses (or dicts with an "email" key) and CSV text with
+    an "email" column into a list of per-recipient template variables.
+    """
+    rows = []
+    for recipient in recipients or []:
+        rows.append(dict(recipient) if isinstance(recipient, dict) else {"email": recipient})
+    if csv_text:
+        for row in csv.DictReader(io.StringIO(csv_text.strip())):
+            row = {(key or "").strip().lower(): (value or "").strip() for key, value in row.items()}
+            if "email" not in row and "to" in row:
+                row["email"] = row["to"]
+            rows.append(row)
+    for row in rows:
+        row["email"] = str(row.get("email") or "").strip()
+    return rows
+
+
+def render_message(subject_template, body_template, variables):
+    """Fill {placeholders} in the subject and body; raises KeyError for a missing field."""
+    return subject_template.format_map(variables), body_template.format_map(variables)
+
+
+def build_raw_message(to, subject, body, cc=None):
+    message = MIMEText(body)
+    message["to"] = to
+    message["subject"] = subject
+    if cc:
+        message["cc"] = cc
+    return base64.urlsafe_b64encode(message.as_bytes()).decode()
+
+
+def classify_send_error(error) -> str:
+    """
+    "retry" when the message certainly wasn't sent and trying again may work
+    (429, rate-limit 403s, errors before the request went out), "unknown" when
+    it may have been sent (5xx, connection lost mid-request), else "failed".
+    """
+    status = getattr(getattr(error, "resp", None), "status", None)
+    if status is not None:
+        status = int(status)
+        # Gmail reports per-user rate limiting as a 403 with a rateLimitExceeded reason
+        if status == 429 or (status == 403 and any(reason in str(error) for reason in RATE_LIMIT_REASONS)):
+            return "retry"
+        return "unknown" if status >= 500 else "failed"
+    if isinstance(error, NOT_SENT_ERRORS):
+        return "retry"
+    if isinstance(error, (OSError, httplib2.HttpLib2Error)):
+        return "unknown"
+    return "failed"
+
+
+class BulkSender:
+    """
+    Sends many messages concurrently within Gmail's quota. Sends are spaced by
+    a token bucket shared across worker threads, each worker has its own
+    AuthorizedHttp (httplib2 connections aren't thread-safe), and errors that
+    show the message wasn't sent (see classify_send_error) are retried with
+    exponential backoff and jitter.
+    """
+
+    def __init__(self, service=None, http_factory=None, rate=GMAIL_SEND_RATE, burst=GMAIL_SEND_BURST,
+                 workers=GMAIL_BULK_WORKERS, max_attempts=GMAIL_SEND_MAX_ATTEMPTS, backoff=GMAIL_SEND_BACKOFF):
+        self._service = service
+        self._http_factory = http_factory
+        self.bucket = TokenBucket(rate, burst)
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._local = threading.local()
+
+    @property
+    def service(self):
+        return self._service or gmail_service.get()
+
+    def _http(self):
+        http = getattr(self._local, "http", None)
+        if http is None:
+            if self._http_factory is not None:
+                http = self._http_factory()
+            else:
+                import google_auth_httplib2
+                import httplib2
+                http = google_auth_httplib2.AuthorizedHttp(credential_manager.get_credentials(), http=httplib2.Http())
+            self._local.http = http
+        return http
+
+    def send_one(self, raw):
+        """
+        Send one raw message, retrying failures that left it unsent. Returns
+        (response, attempts); a final error carries .attempts and .outcome.
+        """
+        request = self.service.users().messages().send(userId="me", body={"raw": raw})
+        for attempt in range(1, self.max_attempts + 1):
+            self.bucket.acquire()
+            try:
+                return request.execute(http=self._http()), attempt
+            except Exception as e:
+                outcome = classify_send_error(e)
+                if attempt == self.max_attempts or outcome != "retry":
+                    e.attempts = attempt
+                    # Retries ran out on an error that means "not sent"
+                    e.outcome = "failed" if outcome == "retry" else outcome
+                    raise
+                delay = self.backoff * 2 ** (attempt - 1) * (1 + random.random())
+                logging.warning(f"Gmail send failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def send_bulk(self, subject_template, body_template, recipients, cc=None, dry_run=False):
+        """
+        Render and send one message per recipient. Returns a summary and a
+        status entry per recipient ("sent", "rendered" on dry runs, "skipped",
+        "failed", or "unknown" when Gmail may have sent it despite an error), in
+        input order. Check the Sent folder before resending "unknown" entries.
+        """
+        results = [None] * len(recipients)
+        jobs = []
+        seen = set()
+        for index, variables in enumerate(recipients):
+            email = variables["email"]
+            status = {"to": email}
+            if not EMAIL_REGEX.match(email):
+                results[index] = {**status, "status": "skipped", "error": "invalid email address"}
+            elif email.lower() in seen:
+                results[index] = {**status, "status": "skipped", "error": "duplicate recipient"}
+            elif len(seen) >= GMAIL_BULK_MAX_RECIPIENTS:
+                results[index] = {**status, "status": "skipped",
+                                  "error": f"over the {GMAIL_BULK_MAX_RECIPIENTS}-recipient limit"}
+            else:
+                seen.add(email.lower())
+                try:
+                    subject, body = render_message(subject_template, body_template, variables)
+                except (KeyError, IndexError, ValueError) as e:
+                    results[index] = {**status, "status": "failed", "error": f"template error: {e}"}
+                    continue
+                if dry_run:
+                    results[index] = {**status, "status": "rendered", "subject": subject, "body": body}
+                else:
+                    jobs.append((index, status, build_raw_message(email, subject, body, cc)))
+
+        def _send(job):
+            index, status, raw = job
+            try:
+                response, attempts = self.send_one(raw)
+                results[index] = {**status, "status": "sent", "message_id": response.get("id"), "attempts": attempts}
+            except Exception as e:
+                results[index] = {**status, "status": getattr(e, "outcome", "failed"), "error": str(e),
+                                  "attempts": getattr(e, "attempts", 1)}
+
+        if jobs:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="gmail-send") as pool:
+                list(pool.map(_send, jobs))
+
+        counts = {}
+        for result in results:
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+        return {"total": len(results), **counts, "results": results}
+
+
+bulk_sender = BulkSender()
+
+
+def send_bulk_email(subject_template, body_template, recipients=None, csv_text=None, cc=None, dry_run=False):
+    """Parse recipients (list and/or CSV) and send a templated message to each."""
+    return bulk_sender.send_bulk(
+        subject_template, body_template, parse_recipients(recipients, csv_text), cc=cc, dry_run=dry_run
+    )
@@ -0,0 +1,355 @@
+# service/gmail_index.py
+import datetime
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from service.cache import CACHE_DIR
+from service.gmail import SEARCH_HEADERS, fetch_message_metadata, gmail_service
+load_dotenv()
+
+# Serve gmail_search from the local index (off by default: the first sync lists the mailbox)
+GMAIL_INDEX_ENABLED = os.getenv("GMAIL_INDEX_ENABLED", "0").lower() in ("1", "true", "yes")
+# Re-sync with history.list when the last sync is older than this many seconds
+GMAIL_INDEX_SYNC_INTERVAL = float(os.getenv("GMAIL_INDEX_SYNC_INTERVAL", 60))
+# The initial full sync indexes at most this many of the most recent messages
+GMAIL_INDEX_MAX_MESSAGES = int(os.getenv("GMAIL_INDEX_MAX_MESSAGES", 5000))
+
+INDEX_HEADERS = SEARCH_HEADERS + ["To"]
+HISTORY_TYPES = ["messageAdded", "messageDeleted", "labelAdded", "labelRemoved"]
+
+# Operators we can evaluate locally, mapped onto system label ids
+IS_LABELS = {"unread": "UNREAD", "starred": "STARRED", "important": "IMPORTANT"}
+IN_LABELS = {
+    "inbox": "INBOX", "sent": "SENT", "spam": "SPAM", "trash": "TRASH",
+    "drafts": "DRAFT", "draft": "DRAFT", "starred": "STARRED", "important": "IMPORTANT",
+}
+CATEGORY_LABELS = {
+    "primary": "CATEGORY_PERSONAL", "social": "CATEGORY_SOCIAL", "promotions": "CATEGORY_PROMOTIONS",
+    "updates": "CATEGORY_UPDATES", "forums": "CATEGORY_FORUMS",
+}
+TEXT_COLUMNS = {"from": "sender", "to": "recipients", "subject": "subject"}
+AGE_UNITS = {"h": 3600, "d": 86400, "m": 30 * 86400, "y": 365 * 86400}
+
+_TOKEN_REGEX = re.compile(r'(-?)(?:(\w+):("[^"]*"|\S+)|("[^"]*")|(\S+))')
+
+
+class UnsupportedQuery(ValueError):
+    """Raised when a query (or the state of the index) can't be answered locally."""
+
+
+def _fts_phrase(text):
+    return '"' + text.strip('"').replace('"', '""') + '"'
+
+
+def _parse_date(value):
+    """Gmail after:/before: accept YYYY/MM/DD, YYYY-MM-DD or epoch seconds; returns epoch ms."""
+    if value.isdigit():
+        return int(value) * 1000
+    for fmt in ("%Y/%m/%d", "%Y-%m-%d"):
+        try:
+            return int(datetime.datetime.strptime(value, fmt).timestamp() * 1000)
+        except ValueError:
+            continue
+    raise UnsupportedQuery(f"Unrecognised date: {value}")
+
+
+def translate_query(query):
+    """
+    Translate a Gmail search string into (fts_match, where_clauses, params).
+    Raises UnsupportedQuery for operators the index can't evaluate (has:, filename:,
+    OR, grouping, negation, user labels, ...), so the caller can fall back to the API.
+    """
+    terms, where, params = [], [], []
+    in_spam_or_trash = False
+
+    for match in _TOKEN_REGEX.finditer(query):
+        negated, operator, value, phrase, word = match.groups()
+        if negated:
+            raise UnsupportedQuery("Negation is not supported locally")
+        if operator is None:
+            text = phrase or word
+            if text in ("OR", "AND", "AROUND") or text[0] in "({" or text[-1] in ")}":
+                raise UnsupportedQuery(f"Unsupported search syntax: {text}")
+            terms.append(_fts_phrase(text))
+            continue
+
+        operator = operator.lower()
+        value = value.strip('"')
+        label = None
+        if operator in TEXT_COLUMNS:
+            terms.append(f"{TEXT_COLUMNS[operator]} : {_fts_phrase(value)}")
+        elif operator == "is" and value.lower() == "read":
+            where.append("labels NOT LIKE ?")
+            params.append("% UNREAD %")
+        elif operator == "is" and value.lower() in IS_LABELS:
+            label = IS_LABELS[value.lower()]
+        elif operator == "in" and value.lower() in IN_LABELS:
+            label = IN_LABELS[value.lower()]
+        elif operator == "in" and value.lower() == "anywhere":
+            in_spam_or_trash = True
+        elif operator == "category" and value.lower() in CATEGORY_LABELS:
+            label = CATEGORY_LABELS[value.lower()]
+        elif operator == "label" and value.upper() in set(IN_LABELS.values()) | set(CATEGORY_LABELS.values()):
+            label = value.upper()
+        elif operator in ("after", "before"):
+            where.append("internal_date >= ?" if operator == "after" else "internal_date < ?")
+            params.append(_parse_date(value))
+        elif operator in ("newer_than", "older_than") and re.fullmatch(r"\d+[hdmy]", value):
+            cutoff = int((time.time() - int(value[:-1]) * AGE_UNITS[value[-1]]) * 1000)
+            where.append("internal_date >= ?" if operator == "newer_than" else "internal_date < ?")
+            params.append(cutoff)
+        else:
+            raise UnsupportedQuery(f"Unsupported operator: {operator}:{value}")
+
+        if label is not None:
+            where.append("labels LIKE ?")
+            params.append(f"% {label} %")
+            in_spam_or_trash = in_spam_or_trash or label in ("SPAM", "TRASH")
+
+    if not in_spam_or_trash:
+        # Like the API, leave spam and trash out unless asked for
+        where.append("labels NOT LIKE ? AND labels NOT LIKE ?")
+        params.extend(["% SPAM %", "% TRASH %"])
+
+    return " AND ".join(terms), where, params
+
+
+class GmailIndex:
+    """
+    A local SQLite/FTS5 index of message headers and snippets.
+
+    The first sync lists the most recent GMAIL_INDEX_MAX_MESSAGES messages and
+    batch-fetches their metadata; after that, Gmail's history.list is replayed
+    from the last stored history id, so each sync only touches what changed. If
+    the history id has expired (404) the index is rebuilt from scratch.
+    """
+
+    def __init__(self, path=None, service=None, sync_interval=GMAIL_INDEX_SYNC_INTERVAL,
+                 max_messages=GMAIL_INDEX_MAX_MESSAGES):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "gmail_index.sqlite3")
+        self.path = path
+        self.sync_interval = sync_interval
+        self.max_messages = max_messages
+        self._service = service
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._last_synced = 0.0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " id TEXT PRIMARY KEY, thread_id TEXT, sender TEXT, recipients TEXT, subject TEXT,"
+            " date TEXT, snippet TEXT, labels TEXT NOT NULL, internal_date INTEGER);"
+            "CREATE INDEX IF NOT EXISTS messages_date ON messages (internal_date);"
+            "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(sender, recipients, subject, snippet);"
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);"
+        )
+
+    @property
+    def service(self):
+        return self._service or gmail_service.get()
+
+    # ----- metadata -----
+
+    def _get_meta(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    @property
+    def history_id(self):
+        return self._get_meta("history_id")
+
+    @property
+    def complete(self):
+        """True when the full sync indexed the whole mailbox, not just the newest messages."""
+        return self._get_meta("complete") == "1"
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    # ----- writes -----
+
+    def _upsert(self, messages):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for message in messages:
+                    if "error" in message:
+                        continue
+                    self._conn.execute(
+                        "INSERT INTO messages (id, thread_id, sender, recipients, subject, date, snippet, labels,"
+                        " internal_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                        " ON CONFLICT(id) DO UPDATE SET thread_id = excluded.thread_id, sender = excluded.sender,"
+                        " recipients = excluded.recipients, subject = excluded.subject, date = excluded.date,"
+                        " snippet = excluded.snippet, labels = excluded.labels, internal_date = excluded.internal_date",
+                        (
+                            message["id"], message.get("threadId"), message.get("sender", ""), message.get("to", ""),
+                            message.get("subject", ""), message.get("date", ""), message.get("snippet", ""),
+                            f" {' '.join(message.get('labelIds') or [])} ", int(message.get("internalDate") or 0),
+                        ),
+                    )
+                    rowid = self._conn.execute("SELECT rowid FROM messages WHERE id = ?", (message["id"],)).fetchone()[0]
+                    self._conn.execute("DELETE FROM messages_fts WHERE rowid = ?", (rowid,))
+                    self._conn.execute(
+                        "INSERT INTO messages_fts (rowid, sender, recipients, subject, snippet) VALUES (?, ?, ?, ?, ?)",
+                        (rowid, message.get("sender", ""), message.get("to", ""), message.get("subject", ""),
+                         message.get("snippet", "")),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _delete(self, message_ids):
+        with self._lock:
+            for message_id in message_ids:
+                row = self._conn.execute("SELECT rowid FROM messages WHERE id = ?", (message_id,)).fetchone()
+                if row is not None:
+                    self._conn.execute("DELETE FROM messages_fts WHERE rowid = ?", row)
+                    self._conn.execute("DELETE FROM messages WHERE rowid = ?", row)
+
+    def _set_labels(self, message_id, label_ids):
+        with self._lock:
+            self._conn.execute("UPDATE messages SET labels = ? WHERE id = ?", (f" {' '.join(label_ids)} ", message_id))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM messages")
+            self._conn.execute("DELETE FROM messages_fts")
+            self._conn.execute("DELETE FROM meta")
+        self._last_synced = 0.0
+
+    # ----- sync -----
+
+    def full_sync(self):
+        """Rebuild the index from messages.list + batched metadata fetches."""
+        service = self.service
+        # Take the history id first so nothing that changes during the listing is lost
+        history_id = service.users().getProfile(userId="me").execute()["historyId"]
+        message_ids, page_token = [], None
+        while len(message_ids) < self.max_messages:
+            response = service.users().messages().list(
+                userId="me",
+                maxResults=min(500, self.max_messages - len(message_ids)),
+                pageToken=page_token,
+                fields="messages/id,nextPageToken",
+            ).execute()
+            message_ids.extend(message["id"] for message in response.get("messages", []))
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                break
+
+        self.clear()
+        self._upsert(fetch_message_metadata(message_ids, service=service, headers=INDEX_HEADERS))
+        self._set_meta("complete", 0 if page_token else 1)
+        self._set_meta("history_id", history_id)
+        logging.info(f"Gmail index rebuilt with {len(message_ids)} messages")
+
+    def incremental_sync(self):
+        """Replay history.list from the stored history id. Returns the number of changes applied."""
+        service = self.service
+        added, deleted, labels = set(), set(), {}
+        start_history_id = history_id = self.history_id
+        page_token = None
+        while True:
+            response = service.users().history().list(
+                userId="me",
+                startHistoryId=start_history_id,
+                historyTypes=HISTORY_TYPES,
+                pageToken=page_token,
+                maxResults=500,
+            ).execute()
+            for record in response.get("history", []):
+                for change in record.get("messagesAdded", []):
+                    added.add(change["message"]["id"])
+                    deleted.discard(change["message"]["id"])
+                for change in record.get("messagesDeleted", []):
+                    deleted.add(change["message"]["id"])
+                    added.discard(change["message"]["id"])
+                for change in record.get("labelsAdded", []) + record.get("labelsRemoved", []):
+                    message = change["message"]
+                    if "labelIds" in message:
+                        labels[message["id"]] = message["labelIds"]
+                    else:
+                        added.add(message["id"])
+            history_id = response.get("historyId", history_id)
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                break
+
+        if added:
+            self._upsert(fetch_message_metadata(sorted(added), service=service, headers=INDEX_HEADERS))
+        for message_id, label_ids in labels.items():
+            if message_id not in added and message_id not in deleted:
+                self._set_labels(message_id, label_ids)
+        self._delete(deleted)
+        self._set_meta("history_id", history_id)
+        return len(added) + len(deleted) + len(labels)
+
+    def sync(self, force=False):
+        """Bring the index up to date if it is older than sync_interval (or force=True)."""
+        with self._sync_lock:
+            if not force and time.time() - self._last_synced < self.sync_interval:
+                return
+            if self.history_id is None:
+                self.full_sync()
+            else:
+                try:
+                    self.incremental_sync()
+                except Exception as e:
+                    if getattr(getattr(e, "resp", None), "status", None) != 404:
+                        raise
+                    logging.info("Gmail history id expired; rebuilding the index")
+                    self.full_sync()
+            self._last_synced = time.time()
+
+    # ----- queries -----
+
+    def search(self, query, max_results=10):
+        """
+        Answer a Gmail search from the index, newest first. Raises UnsupportedQuery
+        when the query uses operators we can't evaluate, or when a partial index
+        can't guarantee it found every match.
+        """
+        fts_match, where, params = translate_query(query)
+        self.sync()
+
+        sql = ("SELECT m.id, m.thread_id, m.sender, m.recipients, m.subject, m.date, m.snippet, m.labels,"
+               " m.internal_date FROM messages m")
+        if fts_match:
+            sql += " JOIN messages_fts f ON f.rowid = m.rowid"
+            where = ["messages_fts MATCH ?"] + where
+            params = [fts_match] + params
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY m.internal_date DESC LIMIT ?"
+
+        with self._lock:
+            rows = self._conn.execute(sql, params + [max_results]).fetchall()
+        if len(rows) < max_results and not self.complete:
+            raise UnsupportedQuery("Index holds only the most recent messages")
+
+        return [
+            {
+                "id": row[0], "threadId": row[1], "sender": row[2], "to": row[3], "subject": row[4],
+                "date": row[5], "snippet": row[6], "labelIds": row[7].split(), "internalDate": str(row[8]),
+            }
+            for row in rows
+        ]
+
+
+gmail_index = GmailIndex() if GMAIL_INDEX_ENABLED else None
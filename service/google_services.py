@@ -0,0 +1,48 @@
+# service/google_services.py
+import threading
+from typing import Any, Callable
+
+from googleapiclient.discovery import build
+
+
+class LazyGoogleService:
+    """
+    A Google API service handle that is only built on first use.
+
+    Authentication and client construction happen once, under a lock, the
+    first time get() is called, so importing a module that declares a service
+    costs nothing and concurrent first calls don't build it twice. The
+    discovery document comes from the copy bundled with google-api-python-client
+    (static_discovery) instead of being fetched over the network.
+    """
+
+    def __init__(self, api: str, version: str, credentials_factory: Callable[[], Any]):
+        self.api = api
+        self.version = version
+        self._credentials_factory = credentials_factory
+        self._service = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        service = self._service
+        if service is None:
+            with self._lock:
+                if self._service is None:
+                    self._service = build(
+                        self.api,
+                        self.version,
+                        credentials=self._credentials_factory(),
+                        static_discovery=True,
+                        cache_discovery=False,
+                    )
+                service = self._service
+        return service
+
+    @property
+    def is_built(self) -> bool:
+        return self._service is not None
+
+    def reset(self):
+        """Drop the built service so the next get() re-authenticates."""
+        with self._lock:
+            self._service = None
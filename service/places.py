@@ -1,12 +1,29 @@
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv  
 import os
-import json
+from dataclasses import dataclass, field
+from typing import List, Literal, Optional, get_args
+from service.cache import TieredCache
+from service.semantic_cache import SemanticCache
 load_dotenv() 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 BASE_URL_PLACES = os.getenv("GOOGLE_PLACE_BASE_URL")
 DETAILS_URL = os.getenv("GOOGLE_PLACE_DETAILS_URL")
 
+# Per-request timeout (seconds) for every Places API call
+PLACES_TIMEOUT = float(os.getenv("PLACES_TIMEOUT", 5))
+# Number of search results enriched with place details
+MAX_PLACE_RESULTS = 5
+
+# Shared keep-alive connection pool for all Places API calls
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=16))
+
+# Fans out place-details lookups so they overlap instead of running back to back
+details_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="places")
+
 #  Price level mapping
 PRICE_LEVEL_MAP = {
     0: "Free",
@@ -16,115 +33,307 @@ PRICE_LEVEL_MAP = {
     4: "Very Expensive"
 }
 
+# Place fields that rarely change, and the frequently changing opening hours
+PLACE_STATIC_FIELDS = [
+    "name",
+    "formatted_address",
+    "rating",
+    "user_ratings_total",
+    "price_level",
+    "editorial_summary",
+    "website",
+]
+PLACE_HOURS_FIELDS = ["opening_hours"]
+
+# Static details are cached for a day, opening hours (open_now) for a few minutes
+place_static_cache = TieredCache(
+    "places_static",
+    ttl=float(os.getenv("PLACE_STATIC_TTL", 24 * 3600)),
+    max_entries=int(os.getenv("PLACE_CACHE_SIZE", 5000)),
+)
+place_hours_cache = TieredCache(
+    "places_hours",
+    ttl=float(os.getenv("PLACE_HOURS_TTL", 10 * 60)),
+    max_entries=int(os.getenv("PLACE_CACHE_SIZE", 5000)),
+)
+# Finished answers per mode, reused for reworded queries; they mention open_now, so like opening hours they go stale fast
+PLACE_ANSWER_TTL = float(os.getenv("PLACE_ANSWER_TTL", 10 * 60))
+# "guide" rewrites the results as a travel-guide answer; "fast" returns the rendering as-is
+PlaceMode = Literal["fast", "guide"]
+PLACE_MODES = get_args(PlaceMode)
+place_answer_caches = {
+    mode: SemanticCache(f"places_{mode}", ttl=PLACE_ANSWER_TTL) for mode in PLACE_MODES
+}
+
+
+def check_place_mode(mode: str):
+    """Raise ValueError unless mode is one of PLACE_MODES."""
+    if mode not in PLACE_MODES:
+        raise ValueError(f"mode must be 'fast' or 'guide', not {mode!r}")
+
+
+def place_cache_stats():
+    """Hit/miss counters for the place details caches."""
+    return {
+        "static": place_static_cache.stats(),
+        "opening_hours": place_hours_cache.stats(),
+    }
+
+
 # Get detailed information for a place
-def get_place_details(place_id):
-    # Specify the fields you want to retrieve
-    fields = ",".join([
-        "name",
-        "formatted_address",
-        "rating",
-        "user_ratings_total",
-        "price_level",
-        "editorial_summary",
-        "website",
-        "opening_hours"
-    ])
+def get_place_details(place_id, timeout=PLACES_TIMEOUT):
+    static = place_static_cache.get(place_id)
+    hours = place_hours_cache.get(place_id)
+
+    # Only request the field groups whose cache entry is missing or stale
+    missing = []
+    if static is None:
+        missing += PLACE_STATIC_FIELDS
+    if hours is None:
+        missing += PLACE_HOURS_FIELDS
+    if not missing:
+        return {"status": "OK", "result": {**static, "opening_hours": hours}}
+
     params = {
         "place_id": place_id,
-        "fields": fields,
+        "fields": ",".join(missing),
         "key": GOOGLE_API_KEY
     }
-    response = requests.get(DETAILS_URL, params=params)
+    response = session.get(DETAILS_URL, params=params, timeout=timeout)
     info = response.json()
     # Debug print (optional)
     # print(info)
-    return info
+    if info.get("status") != "OK":
+        return info
+
+    result = info.get("result", {})
+    if static is None:
+        static = {field: result[field] for field in PLACE_STATIC_FIELDS if field in result}
+        place_static_cache.set(place_id, static)
+    if hours is None:
+        hours = result.get("opening_hours", {})
+        place_hours_cache.set(place_id, hours)
+    return {"status": "OK", "result": {**static, "opening_hours": hours}}
+
+@dataclass(slots=True)
+class Place:
+    """A single place with its raw (unrendered) fields."""
+    place_id: str
+    name: str = "Unnamed Place"
+    address: str = "Address not available"
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+    rating: Optional[float] = None
+    total_reviews: int = 0
+    price_level: Optional[int] = None
+    summary: str = ""
+    website: str = ""
+    hours: List[str] = field(default_factory=list)
+    open_now: Optional[bool] = None
+
+    @classmethod
+    def from_api(cls, place_id, result, geometry):
+        """Build a Place from a details (or text-search) result and the search geometry."""
+        opening_hours = result.get("opening_hours", {})
+        location = geometry.get("location", {})
+        price_level = result.get("price_level")
+        return cls(
+            place_id=place_id,
+            name=result.get("name", "Unnamed Place"),
+            address=result.get("formatted_address", "Address not available"),
+            lat=location.get("lat"),
+            lng=location.get("lng"),
+            rating=result.get("rating"),
+            total_reviews=result.get("user_ratings_total", 0),
+            price_level=price_level if isinstance(price_level, int) else None,
+            summary=result.get("editorial_summary", {}).get("overview", ""),
+            website=result.get("website", ""),
+            hours=opening_hours.get("weekday_text", []),
+            open_now=opening_hours.get("open_now"),
+        )
+
+    @property
+    def price_label(self):
+        return PRICE_LEVEL_MAP.get(self.price_level, "N/A")
+
+    @property
+    def maps_url(self):
+        # Mobile-friendly Google Maps URL
+        return f"https://www.google.com/maps/search/?api=1&query={self.lat},{self.lng}&query_place_id={self.place_id}"
+
+    def to_dict(self):
+        return {
+            "place_id": self.place_id,
+            "name": self.name,
+            "address": self.address,
+            "lat": self.lat,
+            "lng": self.lng,
+            "rating": self.rating,
+            "total_reviews": self.total_reviews,
+            "price_level": self.price_level,
+            "summary": self.summary,
+            "website": self.website,
+            "hours": self.hours,
+            "open_now": self.open_now,
+            "maps_url": self.maps_url,
+        }
+
+    def render(self):
+        """Markdown block for this place."""
+        if self.open_now is True:
+            open_status = "Open Now ✅"
+        elif self.open_now is False:
+            open_status = "Closed ❌"
+        else:
+            open_status = ""
+
+        place_info = f"🏬 **{self.name}**\n"
+        if self.summary:
+            place_info += f"📖 {self.summary}\n"
+        place_info += f"⭐ {self.rating if self.rating is not None else 'N/A'} ({self.total_reviews} reviews)\n"
+        if open_status:
+            place_info += f"⏰ {open_status}\n"
+        place_info += f"💰 Price Level: {self.price_label}\n"
+        place_info += f"📍 {self.address}\n"
+        if self.hours:
+            place_info += f"🕒 Hours: {' | '.join(self.hours)}\n"
+        if self.website:
+            place_info += f"🌐 [Visit Website]({self.website})\n"
+        place_info += f"[📍 View on Google Maps]({self.maps_url})\n"
+        return place_info
+
+
+@dataclass
+class PlaceResults:
+    """
+    Result of a place search. Keeps typed Place records so callers can filter,
+    sort and dedupe cheaply; rendering to markdown only happens in render().
+    """
+    query: str
+    places: List[Place] = field(default_factory=list)
+    status: str = "OK"
+    error: Optional[str] = None
+
+    def __bool__(self):
+        return self.error is None and bool(self.places)
+
+    def __len__(self):
+        return len(self.places)
+
+    def __iter__(self):
+        return iter(self.places)
+
+    def _with(self, places):
+        return PlaceResults(query=self.query, places=places, status=self.status, error=self.error)
+
+    def filter(self, predicate):
+        return self._with([place for place in self.places if predicate(place)])
+
+    def sorted_by(self, key, reverse=False):
+        return self._with(sorted(self.places, key=key, reverse=reverse))
+
+    def dedupe(self):
+        seen = set()
+        unique = []
+        for place in self.places:
+            if place.place_id not in seen:
+                seen.add(place.place_id)
+                unique.append(place)
+        return self._with(unique)
+
+    def to_dict(self):
+        return {
+            "query": self.query,
+            "status": self.status,
+            "error": self.error,
+            "places": [place.to_dict() for place in self.places],
+        }
+
+    def render(self):
+        """Markdown rendering used at the output boundary."""
+        if self.error:
+            return self.error
+        message_lines = ["Here’s what I found ✨:\n"]
+        message_lines.extend(place.render() for place in self.places)
+        return "\n\n".join(message_lines)
+
+    def __str__(self):
+        return self.render()
+
 
 # Search for places and enrich with details
-def search_places(query):
+def search_places(query) -> PlaceResults:
     params = {
         "query": query,
         "key": GOOGLE_API_KEY
     }
-    response = requests.get(BASE_URL_PLACES, params=params)
-    data = response.json()
+    try:
+        response = session.get(BASE_URL_PLACES, params=params, timeout=PLACES_TIMEOUT)
+        data = response.json()
+    except (requests.RequestException, ValueError) as e:
+        print("[ERROR] Places search failed:", e)
+        return PlaceResults(query, status="UNAVAILABLE",
+                            error="Sorry, the place search service is unavailable right now. Please try again.")
 
     if data.get("status") != "OK":
-        return f"Sorry, I couldn't find any matching places. (Status: {data.get('status')})"
+        return PlaceResults(query, status=data.get("status"),
+                            error=f"Sorry, I couldn't find any matching places. (Status: {data.get('status')})")
 
     results = data.get("results", [])
     if not results:
-        return "I couldn’t find any places matching your request. Want to try a different query?"
-
-    message_lines = ["Here’s what I found ✨:\n"]
-    for place in results[:5]:  # Top 5 results only
-        place_id = place.get("place_id")
-        if not place_id:
-            continue
-
-        # Get enriched place details
-        detail_data = get_place_details(place_id)
-        result = detail_data.get("result", {})
-
-        name = result.get("name", "Unnamed Place")
-        address = result.get("formatted_address", "Address not available")
-        rating = result.get("rating", "N/A")
-        total_reviews = result.get("user_ratings_total", 0)
-        # Convert numeric price_level to descriptive string if available
-        price_level_num = result.get("price_level")
-        if price_level_num is not None and isinstance(price_level_num, int):
-            price_level = PRICE_LEVEL_MAP.get(price_level_num, "N/A")
-        else:
-            price_level = "N/A"
-        # Extract editorial_summary overview if available
-        summary = result.get("editorial_summary", {}).get("overview", "")
-        website = result.get("website", "")
-        hours = result.get("opening_hours", {}).get("weekday_text", [])
-        # Extract open_now status
-        open_now = result.get("opening_hours", {}).get("open_now")
-        if open_now is True:
-            open_status = "Open Now ✅"
-        elif open_now is False:
-            open_status = "Closed ❌"
-        else:
-            open_status = ""
+        return PlaceResults(query, status="ZERO_RESULTS",
+                            error="I couldn’t find any places matching your request. Want to try a different query?")
 
-         # Get coordinates for the mobile-friendly URL
-        lat = place.get("geometry", {}).get("location", {}).get("lat")
-        lng = place.get("geometry", {}).get("location", {}).get("lng")
-        
-        # Create mobile-friendly Google Maps URL
-        maps_url = f"https://www.google.com/maps/search/?api=1&query={lat},{lng}&query_place_id={place_id}"
-
-        # Build the output message for this place
-        place_info = f"🏬 **{name}**\n"
-        if summary:
-            place_info += f"📖 {summary}\n"
-        place_info += f"⭐ {rating} ({total_reviews} reviews)\n"
-        if open_status:
-            place_info += f"⏰ {open_status}\n"
-        place_info += f"💰 Price Level: {price_level}\n"
-        place_info += f"📍 {address}\n"
-        if hours:
-            place_info += f"🕒 Hours: {' | '.join(hours)}\n"
-        if website:
-            place_info += f"🌐 [Visit Website]({website})\n"
-        place_info += f"[📍 View on Google Maps]({maps_url})\n"
+    # Top results only; fetch all their details concurrently
+    candidates = [place for place in results[:MAX_PLACE_RESULTS] if place.get("place_id")]
+    detail_futures = [details_executor.submit(get_place_details, place["place_id"]) for place in candidates]
+
+    places = []
+    for place, future in zip(candidates, detail_futures):
+        place_id = place["place_id"]
+
+        # Get enriched place details; a failed lookup falls back to the
+        # (less detailed) text-search fields instead of dropping the place
+        try:
+            detail_data = future.result()
+        except Exception as e:
+            print(f"[WARN] Place details failed for {place_id}:", e)
+            detail_data = {}
+        result = detail_data.get("result") or place
+
+        places.append(Place.from_api(place_id, result, place.get("geometry", {})))
+
+    return PlaceResults(query, places=places)
 
-        message_lines.append(place_info)
 
-    return "\n\n".join(message_lines)
+def chat_with_places_assistant(user_query, client, mode: PlaceMode = "guide") -> str:
+    """
+    Answer a place query. mode="fast" returns the deterministic rendering from
+    search_places directly; mode="guide" (default) rewrites it with gpt-4o-mini
+    as a conversational travel-guide answer. Answers to a similar earlier
+    query in the same mode are served from the semantic cache. Any other
+    mode raises ValueError.
+    """
+    check_place_mode(mode)
+    cache = place_answer_caches[mode]
+    answer = cache.get(user_query)
+    if answer is None:
+        answer, found = _answer_place_query(user_query, client, mode)
+        # "Nothing found" isn't worth remembering for similar queries
+        if found:
+            cache.set(user_query, answer)
+    return answer
 
 
-def chat_with_places_assistant(user_query, client) -> str:
+def _answer_place_query(user_query, client, mode):
+    """(answer, whether any places were found)"""
     places_result = search_places(user_query)
-    print(places_result)  # Debug print (optional)
+    places_text = places_result.render()
+    print(places_text)  # Debug print (optional)
 
-    # If search_places returns dict/list, convert it to a readable string
-    if isinstance(places_result, (dict, list)):
-        places_text = json.dumps(places_result, indent=2)
-    else:
-        places_text = str(places_result)
+    # Fast mode (or nothing found): the rendering is already user-ready
+    if mode == "fast" or not places_result:
+        return places_text, bool(places_result)
 
     # Step 2: Send the data to OpenAI for formatting, with clear instructions on map links
     response = client.chat.completions.create(
@@ -163,5 +372,5 @@ def chat_with_places_assistant(user_query, client) -> str:
             }
         ]
     )
-    return response.choices[0].message.content
+    return response.choices[0].message.content, True
 
@@ -0,0 +1,67 @@
+# service/progress.py
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Progress messages that announce a pipeline stage start with this prefix;
+# every other progress message is a chunk of streamed model output
+STAGE_PREFIX = "stage:"
+
+# Streamed tokens are batched into one notification at most this often (seconds)
+PROGRESS_FLUSH_INTERVAL = float(os.getenv("PROGRESS_FLUSH_INTERVAL", 0.1))
+
+
+class ProgressReporter:
+    """
+    Sends stage transitions and streamed model tokens to an MCP client as
+    progress notifications on the tool's Context.
+
+    Stage messages look like "stage:classify"; token chunks are sent verbatim,
+    so a client rebuilds the answer by concatenating the non-stage messages.
+    Tokens are buffered and flushed every PROGRESS_FLUSH_INTERVAL seconds to
+    keep the notification rate sane. With no Context (plain Python callers,
+    or a client that didn't ask for progress) every call is a no-op.
+
+    Progress is best-effort: if a notification can't be sent (e.g. the
+    client disconnected) the error is logged and later progress is dropped,
+    so the tool call itself, and any callers coalesced onto it, still finish.
+    """
+
+    def __init__(self, ctx=None, flush_interval: float = PROGRESS_FLUSH_INTERVAL):
+        self.ctx = ctx
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._last_flush = 0.0
+        self._count = 0
+
+    async def _send(self, message: str):
+        if self.ctx is None:
+            return
+        # Progress must increase with every notification
+        self._count += 1
+        try:
+            await self.ctx.report_progress(self._count, None, message)
+        except Exception as e:
+            logging.warning(f"Dropping progress notifications: {e}")
+            self.ctx = None
+
+    async def stage(self, name: str):
+        await self.flush()
+        await self._send(f"{STAGE_PREFIX}{name}")
+
+    async def token(self, delta: str):
+        if not delta:
+            return
+        self._buffer.append(delta)
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            await self.flush()
+
+    async def flush(self):
+        if self._buffer:
+            # The first token after a quiet spell goes out immediately
+            self._last_flush = time.monotonic()
+            chunk, self._buffer = "".join(self._buffer), []
+            await self._send(chunk)
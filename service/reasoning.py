@@ -1,4 +1,5 @@
 # core/reasoning/agent.py
+import asyncio
 import logging
 import os
 import time
@@ -6,71 +7,76 @@ import json
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass, field
 from enum import Enum
-from openai import OpenAI
-from concurrent.futures import ThreadPoolExecutor
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 import re
 from dotenv import load_dotenv
+from service.cache import DiskCache
+from service.classifier import LOCAL_CLASSIFIER_THRESHOLD, classify_locally
+from service.progress import ProgressReporter
+from service.search import web_search
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
+
+# Async client with a shared keep-alive pool so concurrent requests reuse
+# connections instead of opening a new TLS session per LLM round trip
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", 50))
+client = AsyncOpenAI(
+    api_key=OPENAI_API_KEY,
+    http_client=DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_CONNECTIONS // 2,
+        ),
+    ),
+)
+
+# Start the web search alongside classification and drop it if the query is solved directly
+SPECULATIVE_EXECUTION = os.getenv("REASONING_SPECULATIVE", "true").lower() in ("1", "true", "yes")
+
+# Problem signature of the domain-agnostic framework
+GENERIC_FRAMEWORK_SIGNATURE = ("general", "general", "general", "general", "general")
+# A speculative direct solve waits this long for its type-specific framework before
+# settling for the cached generic one; the specific one is still cached when it lands
+FRAMEWORK_FALLBACK_TIMEOUT = float(os.getenv("REASONING_FRAMEWORK_TIMEOUT", 15))
+
+# Generated frameworks depend only on the problem signature, so they are kept on disk
+framework_cache = DiskCache(
+    "frameworks",
+    max_entries=int(os.getenv("FRAMEWORK_CACHE_SIZE", 500)),
+    ttl=float(os.getenv("FRAMEWORK_CACHE_TTL", 7 * 24 * 3600)),
+)
+
+# Signatures (reasoning_type, reasoning_subtype, calculation_type, coding_type, domain)
+# that cover most production queries; used to pre-warm the framework cache
+COMMON_FRAMEWORK_SIGNATURES = (
+    [GENERIC_FRAMEWORK_SIGNATURE]
+    + [(None, None, calculation_type, None, "mathematics") for calculation_type in (
+        "basic_arithmetic", "percentage", "compound_interest", "simple_interest", "profit_loss",
+        "speed_distance_time", "work_time", "probability", "geometry", "algebra", "statistics",
+        "mixture", "age_problems", "general_math")]
+    + [("verbal", reasoning_subtype, None, None, "verbal_reasoning") for reasoning_subtype in (
+        "blood_relation", "analogy", "classification", "coding_decoding", "syllogism",
+        "letter_series", "critical_reasoning")]
+    + [("non_verbal", reasoning_subtype, None, None, "non_verbal_reasoning") for reasoning_subtype in (
+        "calendar_clock", "direction_distance", "pattern_recognition", "series_completion")]
+    + [(None, None, None, coding_type, "programming") for coding_type in (
+        "data_structures", "algorithms", "web_development", "system_design", "database",
+        "debugging", "general_programming")]
+)
+
+
+def framework_cache_key(reasoning_type, reasoning_subtype, calculation_type, coding_type, domain) -> str:
+    """Normalised cache key for a problem signature"""
+    return "|".join(str(part).strip().lower() for part in (reasoning_type, reasoning_subtype, calculation_type, coding_type, domain))
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
-def format_search_response(raw_content: str) -> tuple[str, List[str]]:
-    """
-    Format the search response by:
-    1. Removing markdown links
-    2. Extracting sources separately
-    3. Creating a clean, readable summary
-    """
-    # Extract URLs from markdown links
-    url_pattern = r'\[([^\]]+)\]\(([^)]+)\)'
-    sources = []
-    
-    # Find all markdown links
-    matches = re.findall(url_pattern, raw_content)
-    for text, url in matches:
-        # Clean up the URL (remove utm_source parameters)
-        clean_url = url.split('?')[0]
-        if clean_url not in sources:
-            sources.append(clean_url)
-    
-    # Remove markdown links from the content
-    clean_content = re.sub(url_pattern, r'\1', raw_content)
-    
-    # Remove parentheses that contained sources
-    clean_content = re.sub(r'\s*\([^)]*https?://[^)]+\)', '', clean_content)
-    
-    # Clean up extra spaces and punctuation
-    clean_content = re.sub(r'\s+', ' ', clean_content).strip()
-    clean_content = re.sub(r'\s+([.,;])', r'\1', clean_content)
-    
-    return clean_content, sources
-
-def perform_search(user_query: str) -> tuple[str, List[str]]:
-    response = client.chat.completions.create(
-        model="gpt-4o-search-preview",
-        web_search_options={"search_context_size": "low"},
-        messages=[
-            {
-                "role": "system",
-                "content": """Answer the user's query with accurate, real-time web results. 
-                Format your response as a clear, concise paragraph without any markdown formatting.
-                Include source citations naturally in the text."""
-            },
-            {
-                "role": "user",
-                "content": user_query
-            }
-        ],
-    )
-    
-    raw_content = response.choices[0].message.content.strip()
-    summary, sources = format_search_response(raw_content)
-    
-    return summary, sources
+async def perform_search(user_query: str) -> tuple[str, List[str]]:
+    """Web search through the shared search cache (also used by Insight_scope)"""
+    return await web_search(user_query)
 
 class TaskType(str, Enum):
     RESEARCH = "research"
@@ -112,15 +118,40 @@ class ExecutionPlan:
     context: Dict[str, Any] = field(default_factory=dict)
     created_at: float = field(default_factory=time.time)
 
+def _discard(task: asyncio.Task):
+    """Cancel a speculative task whose result is no longer needed."""
+    if not task.done():
+        task.cancel()
+    # Retrieve the outcome so a failed branch doesn't log "exception was never retrieved"
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
 class ReasoningAgent:
-    def __init__(self):
+    def __init__(self, speculative: bool = SPECULATIVE_EXECUTION,
+                 local_classifier_threshold: float = LOCAL_CLASSIFIER_THRESHOLD):
         self.model = "gpt-4o"
-        self.executor = ThreadPoolExecutor(max_workers=4)
+        self.speculative = speculative
+        self.local_classifier_threshold = local_classifier_threshold
 
-
-    def _detect_problem_type(self, query: str) -> Dict[str, Any]:
+    async def _detect_problem_type(self, query: str) -> Dict[str, Any]:
         """AI-powered problem type detection with same return structure"""
         
+        # Cheap local tier first; only ambiguous queries escalate to the LLM
+        local_type, confidence = classify_locally(query)
+        if confidence >= self.local_classifier_threshold:
+            local_type["complexity"] = self._determine_complexity(query, local_type)
+            return local_type
+
+        try:
+            return await self._classify_with_llm(query)
+        except Exception as e:
+            print("Error occurred while detecting problem type:", e)
+            # Fall back to the local classifier regardless of its confidence
+            local_type["complexity"] = self._determine_complexity(query, local_type)
+            return local_type
+
+    async def _classify_with_llm(self, query: str) -> Dict[str, Any]:
+        """The LLM classification alone; raises instead of falling back to the local one."""
         prompt = f"""
         Analyze this query and classify it comprehensively. You must return ONLY a valid JSON object with no markdown formatting.
 
@@ -326,109 +357,29 @@ class ReasoningAgent:
         Return ONLY valid JSON without any markdown formatting or code blocks.
         """
         
+        response = await client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.1,
+            max_tokens=800,
+            response_format={"type": "json_object"}
+        )
+        
+        response_content = response.choices[0].message.content.strip()
+        
         try:
-            response = client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.1,
-                max_tokens=800,
-                response_format={"type": "json_object"}
-            )
-            
-            response_content = response.choices[0].message.content.strip()
-            
             problem_type = json.loads(response_content)
-            print("Parsed problem type:", problem_type)
-            
-            # Ensure complexity is properly set if missing (fallback only)
-            if "complexity" not in problem_type or not problem_type["complexity"]:
-                problem_type["complexity"] = "medium"  # Safe fallback
-            
-            return problem_type
-            
-        except Exception as e:
-            print("Error occurred while detecting problem type:", e)
-            print("Raw response content:", response.choices[0].message.content if 'response' in locals() else "No response")
-            
-            # Enhanced fallback with better detection
-            query_lower = query.lower()
-            
-            # Check for mathematical problems
-            math_keywords = ["calculate", "solve", "find", "determine", "compute", "percentage", "profit", "loss", "speed", "distance", "time", "interest", "mixture", "work", "efficiency"]
-            has_math = any(word in query_lower for word in math_keywords) and any(char.isdigit() for char in query)
-            
-            # Check for verbal reasoning
-            verbal_keywords = ["father", "mother", "son", "daughter", "brother", "sister", "relation", "related", "photograph", "pointing"]
-            has_verbal = any(word in query_lower for word in verbal_keywords)
-            
-            # Check for coding
-            coding_keywords = ["code", "program", "implement", "algorithm", "python", "java", "javascript", "function", "class", "array", "list"]
-            has_coding = any(word in query_lower for word in coding_keywords)
-            
-            # Check for factual questions
-            factual_keywords = ["what is", "who is", "define", "explain", "describe", "tell me about"]
-            has_factual = any(phrase in query_lower for phrase in factual_keywords)
-            
-            # Determine domain and type
-            if has_math:
-                domain = "mathematics"
-                calculation_type = "general_math"
-                if "percentage" in query_lower:
-                    calculation_type = "percentage"
-                elif "mixture" in query_lower:
-                    calculation_type = "mixture"
-                elif "profit" in query_lower or "loss" in query_lower:
-                    calculation_type = "profit_loss"
-                elif "speed" in query_lower or "distance" in query_lower or "time" in query_lower:
-                    calculation_type = "speed_distance_time"
-                elif "work" in query_lower or "efficiency" in query_lower:
-                    calculation_type = "work_time"
-                elif "interest" in query_lower:
-                    calculation_type = "simple_interest" if "simple" in query_lower else "compound_interest"
-            elif has_verbal:
-                domain = "verbal_reasoning"
-                calculation_type = None
-            elif has_coding:
-                domain = "programming"
-                calculation_type = None
-            elif has_factual:
-                domain = "factual"
-                calculation_type = None
-            else:
-                domain = "general"
-                calculation_type = None
-            
-            # Create the problem type dictionary
-            problem_type = {
-                "is_mathematical": has_math,
-                "is_logical_reasoning": has_verbal,
-                "is_analytical": False,
-                "is_creative": False,
-                "is_factual": has_factual,
-                "is_verbal_reasoning": has_verbal,
-                "is_non_verbal_reasoning": False,
-                "is_simple_solvable": True,
-                "is_coding": has_coding,
-                "domain": domain,
-                "requires_calculation": has_math,
-                "requires_research": has_factual,
-                "requires_multi_step_reasoning": has_math or has_verbal,
-                "complexity": self._determine_complexity(query, {
-                    "is_mathematical": has_math,
-                    "is_coding": has_coding,
-                    "is_verbal_reasoning": has_verbal,
-                    "requires_calculation": has_math,
-                    "requires_research": has_factual,
-                    "requires_multi_step_reasoning": has_math or has_verbal
-                }),
-                "calculation_type": calculation_type,
-                "reasoning_type": "verbal" if has_verbal else None,
-                "reasoning_subtype": "blood_relation" if has_verbal and any(word in query_lower for word in ["father", "mother", "son", "daughter", "relation", "related"]) else None,
-                "coding_type": "general_programming" if has_coding else None,
-                "parameters": {}
-            }
-            
-            return problem_type
+        except ValueError:
+            print("Raw response content:", response_content)
+            raise
+        print("Parsed problem type:", problem_type)
+        
+        # Ensure complexity is properly set if missing (fallback only)
+        if "complexity" not in problem_type or not problem_type["complexity"]:
+            problem_type["complexity"] = "medium"  # Safe fallback
+        problem_type["classified_by"] = "llm"
+        
+        return problem_type
 
     def _determine_complexity(self, query: str, problem_type: Dict[str, Any]) -> str:
         """Helper method to determine complexity based on query and problem type"""
@@ -473,22 +424,41 @@ class ReasoningAgent:
                 return "complex"
  
     
+    def _needs_research(self, problem_info: Dict[str, Any]) -> bool:
+        """Whether a classified query goes down the research path"""
+        return bool(problem_info["requires_research"] and not problem_info["is_mathematical"] and not problem_info["is_coding"])
+
     async def process_request(self, query: str, max_depth: int = 5, 
-                            include_sources: bool = True) -> Dict[str, Any]:
-        """Universal entry point for processing any type of request"""
+                            include_sources: bool = True,
+                            speculative: Optional[bool] = None,
+                            progress=None) -> Dict[str, Any]:
+        """
+        Universal entry point for processing any type of request.
+        progress (a service.progress.ProgressReporter) receives the stage
+        transitions (classify -> framework/research -> solve) and the streamed
+        tokens of the final answer.
+        """
         start_time = time.time()
+        progress = progress or ProgressReporter()
         sources_used = []
         execution_plan = None
+        speculative = self.speculative if speculative is None else speculative
         
         try:
-            problem_info = self._detect_problem_type(query)
-            if problem_info["requires_research"] and not problem_info["is_mathematical"] and not problem_info["is_coding"]:
-                result = await self._research_and_answer(query, problem_info, sources_used)
-                execution_plan = self._create_research_plan(query, problem_info)
+            # Speculation only pays off when classification needs an LLM round trip
+            if speculative and classify_locally(query)[1] < self.local_classifier_threshold:
+                problem_info, result, execution_plan = await self._process_speculatively(query, sources_used, progress)
             else:
-                result = await self._solve_directly(query, problem_info)
-                execution_plan = self._create_direct_solve_plan(query, problem_info)
-
+                await progress.stage("classify")
+                problem_info = await self._detect_problem_type(query)
+                if self._needs_research(problem_info):
+                    result = await self._research_and_answer(query, problem_info, sources_used, progress=progress)
+                    execution_plan = self._create_research_plan(query, problem_info)
+                else:
+                    result = await self._solve_directly(query, problem_info, progress=progress)
+                    execution_plan = self._create_direct_solve_plan(query, problem_info)
+
+            await progress.flush()
             execution_time = time.time() - start_time
             return {
                 "success": True,
@@ -509,6 +479,54 @@ class ReasoningAgent:
                 "sources_used": []
             }
     
+    async def _process_speculatively(self, query: str, sources_used: List[str], progress=None):
+        """
+        Run classification and the web search concurrently, so a research query
+        finds its search already under way. A query solved directly cancels the
+        search and starts its type-specific framework as soon as it's classified
+        (see _speculative_framework).
+        """
+        progress = progress or ProgressReporter()
+        await progress.stage("classify")
+        classify_task = asyncio.create_task(self._detect_problem_type(query))
+        search_task = asyncio.create_task(perform_search(query))
+
+        try:
+            problem_info = await classify_task
+            if self._needs_research(problem_info):
+                result = await self._research_and_answer(query, problem_info, sources_used, search_task=search_task,
+                                                         progress=progress)
+                execution_plan = self._create_research_plan(query, problem_info)
+            else:
+                _discard(search_task)
+                await progress.stage("framework")
+                solving_framework = await self._speculative_framework(problem_info)
+                result = await self._solve_directly(query, problem_info, solving_framework=solving_framework,
+                                                    progress=progress)
+                execution_plan = self._create_direct_solve_plan(query, problem_info)
+        finally:
+            for task in (classify_task, search_task):
+                _discard(task)
+
+        execution_plan.context["speculative"] = True
+        return problem_info, result, execution_plan
+
+    async def _speculative_framework(self, problem_info: Dict[str, Any]) -> str:
+        """
+        The type-specific framework, or the cached generic one if generating the
+        specific one takes longer than FRAMEWORK_FALLBACK_TIMEOUT. A timed-out
+        generation keeps running so its framework is cached for next time.
+        """
+        framework_task = asyncio.ensure_future(self._get_solving_framework(*self._framework_signature(problem_info)))
+        generic = framework_cache.get(framework_cache_key(*GENERIC_FRAMEWORK_SIGNATURE))
+        if generic is None:
+            return await framework_task
+        try:
+            return await asyncio.wait_for(asyncio.shield(framework_task), FRAMEWORK_FALLBACK_TIMEOUT)
+        except asyncio.TimeoutError:
+            framework_task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            return generic
+
     def _create_direct_solve_plan(self, query: str, problem_info: Dict[str, Any]) -> ExecutionPlan:
         """Create a simple execution plan for direct solving"""
         task_type = TaskType.DIRECT_SOLVE
@@ -558,17 +576,27 @@ class ReasoningAgent:
             }
         )
     
-    async def _solve_directly(self, query: str, problem_info: Dict[str, Any]) -> Dict[str, Any]:
+    def _framework_signature(self, problem_info: Dict[str, Any]) -> tuple:
+        """Signature (reasoning_type, reasoning_subtype, calculation_type, coding_type, domain) of a problem"""
+        return (
+            problem_info.get("reasoning_type", "general"),
+            problem_info.get("reasoning_subtype", "general"),
+            problem_info.get("calculation_type", "general"),
+            problem_info.get("coding_type", "general"),
+            problem_info.get("domain", "general"),
+        )
+
+    async def _solve_directly(self, query: str, problem_info: Dict[str, Any],
+                              solving_framework: Optional[str] = None, progress=None) -> Dict[str, Any]:
         """Universal direct solver for all types of problems"""
+        progress = progress or ProgressReporter()
         
-        reasoning_type = problem_info.get("reasoning_type", "general")
-        reasoning_subtype = problem_info.get("reasoning_subtype", "general")
-        calculation_type = problem_info.get("calculation_type", "general")
-        coding_type = problem_info.get("coding_type", "general")
-        domain = problem_info.get("domain", "general")
+        reasoning_type, reasoning_subtype, calculation_type, coding_type, domain = self._framework_signature(problem_info)
         
-        # Create comprehensive solving framework
-        solving_framework = self._get_solving_framework(reasoning_type, reasoning_subtype, calculation_type, coding_type, domain)
+        # Create comprehensive solving framework (unless one was generated speculatively)
+        if solving_framework is None:
+            await progress.stage("framework")
+            solving_framework = await self._get_solving_framework(reasoning_type, reasoning_subtype, calculation_type, coding_type, domain)
         print(" ******* Generated solving framework:", solving_framework)
         
         prompt = f"""
@@ -637,14 +665,13 @@ class ReasoningAgent:
         Now solve the problem following this format:
         """
         
-        response = client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
+        await progress.stage("solve")
+        solution = await self._generate(
+            prompt,
             temperature=0.1 if problem_info.get('is_mathematical') else 0.2,
-            max_tokens=3000
+            max_tokens=3000,
+            progress=progress
         )
-        
-        solution = response.choices[0].message.content
         print("Solution generated:", solution)
         
         # Extract the final answer
@@ -662,9 +689,14 @@ class ReasoningAgent:
             "coding_type": coding_type
         }
 
-    def _get_solving_framework(self, reasoning_type: str, reasoning_subtype: str, calculation_type: str, coding_type: str, domain: str) -> str:
+    async def _get_solving_framework(self, reasoning_type: str, reasoning_subtype: str, calculation_type: str, coding_type: str, domain: str) -> str:
         """Get appropriate solving framework based on problem type using OpenAI"""
         
+        cache_key = framework_cache_key(reasoning_type, reasoning_subtype, calculation_type, coding_type, domain)
+        cached = framework_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         # Build the prompt for OpenAI to generate the framework
         prompt = f"""Generate a comprehensive problem-solving framework for the following problem characteristics:
 
@@ -695,7 +727,7 @@ class ReasoningAgent:
 
         try:
             # Call OpenAI API to generate the framework
-            response = client.chat.completions.create(
+            response = await client.chat.completions.create(
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.3,
@@ -704,6 +736,7 @@ class ReasoningAgent:
             
             # Extract and return the generated framework
             framework = response.choices[0].message.content.strip()
+            framework_cache.set(cache_key, framework)
             return framework
             
         except Exception as e:
@@ -725,9 +758,30 @@ class ReasoningAgent:
     Note: Framework generated for {domain} domain with {reasoning_type} reasoning."""
     
 
+    async def prewarm_framework_cache(self, signatures=None, concurrency: int = 4) -> int:
+        """Generate and cache frameworks for common problem signatures; returns how many were stored"""
+        signatures = COMMON_FRAMEWORK_SIGNATURES if signatures is None else signatures
+        missing = [sig for sig in signatures if framework_cache_key(*sig) not in framework_cache]
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _warm(signature):
+            async with semaphore:
+                await self._get_solving_framework(*signature)
+            # A failed generation returns a fallback framework without caching it
+            return framework_cache_key(*signature) in framework_cache
+
+        stored = sum(await asyncio.gather(*(_warm(sig) for sig in missing)))
+        logging.info(f"Framework cache pre-warmed: {stored} generated, {len(missing) - stored} failed, "
+                     f"{len(signatures) - len(missing)} already cached")
+        return stored
+
     async def _research_and_answer(self, query: str, problem_info: Dict[str, Any], 
-                                 sources_used: List[str]) -> Dict[str, Any]:
+                                 sources_used: List[str],
+                                 search_task: Optional[asyncio.Task] = None,
+                                 progress=None) -> Dict[str, Any]:
         """Research-focused approach for factual questions"""
+        progress = progress or ProgressReporter()
+        await progress.stage("research")
         
         # Gather information from multiple sources
         research_data = {}
@@ -740,9 +794,9 @@ class ReasoningAgent:
         #     logging.warning(f"RAG search failed: {e}")
         #     research_data["rag_context"] = None
         
-        # Try web search
+        # Try web search (reuse the speculative search if it's already in flight)
         try:
-            web_summary, web_sources = perform_search(query)
+            web_summary, web_sources = await (search_task if search_task is not None else perform_search(query))
             research_data["web_search"] = web_summary
             sources_used.extend(web_sources)
         except Exception as e:
@@ -784,14 +838,8 @@ class ReasoningAgent:
         Be thorough but concise, accurate, and well-organized.
         """
         
-        response = client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            max_tokens=3000
-        )
-        
-        research_result = response.choices[0].message.content
+        await progress.stage("solve")
+        research_result = await self._generate(prompt, temperature=0.3, max_tokens=3000, progress=progress)
         
         # Extract final answer
         final_answer_match = re.search(r'FINAL ANSWER:\s*(.+?)(?:\n\n|\n$|$)', research_result, re.IGNORECASE | re.DOTALL)
@@ -805,6 +853,33 @@ class ReasoningAgent:
             "research_quality": "high" if research_data.get('web_search') or research_data.get('rag_context') else "limited"
         }
     
+    async def _generate(self, prompt: str, temperature: float, max_tokens: int, progress=None) -> str:
+        """Answer completion; streamed token by token to progress when a client is listening"""
+        if progress is None or progress.ctx is None:
+            response = await client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            return response.choices[0].message.content
+
+        stream = await client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        parts = []
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                await progress.token(delta)
+        await progress.flush()
+        return "".join(parts)
+
     def _plan_to_dict(self, plan: ExecutionPlan) -> Dict[str, Any]:
         """Convert ExecutionPlan to dictionary for response"""
         return {
@@ -826,4 +901,9 @@ class ReasoningAgent:
         }
 
 # Initialize the enhanced reasoning agent
-reasoning_agent = ReasoningAgent()
\ No newline at end of file
+reasoning_agent = ReasoningAgent()
+
+
+if __name__ == "__main__":
+    # python -m service.reasoning  -> fill the framework cache for common problem types
+    asyncio.run(reasoning_agent.prewarm_framework_cache())
@@ -1,93 +1,381 @@
 # service/meeting_scheduler.py
-import os
-import pickle
 import datetime
+import os
 import pytz
 from typing import List, Dict, Any
 
-from googleapiclient.discovery import build
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
+from service.calendar_store import CALENDAR_STORE_ENABLED, CalendarEventStore
+from service.credentials import credential_manager
+from service.google_services import LazyGoogleService
+
+DEFAULT_TIMEZONE = 'Asia/Kolkata'
+# Slots are only proposed inside working hours (local time, HH:MM)
+WORKING_HOURS_START = os.getenv("WORKING_HOURS_START", "09:00")
+WORKING_HOURS_END = os.getenv("WORKING_HOURS_END", "18:00")
+# Event fields returned by list_meetings_page unless a projection is given
+DEFAULT_EVENT_FIELDS = "id,summary,start,end,attendees(email)"
+# Events per Calendar batch HTTP request (the API accepts up to 50)
+CALENDAR_BATCH_SIZE = int(os.getenv("CALENDAR_BATCH_SIZE", 50))
+
+
+def _parse_time(value):
+    return datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def _localize(date_str, time_str, local_timezone):
+    """YYYY-MM-DD + HH:MM in a timezone -> aware datetime."""
+    year, month, day = map(int, date_str.split('-'))
+    hour, minute = map(int, time_str.split(':'))
+    return local_timezone.localize(datetime.datetime(year, month, day, hour, minute))
+
+
+def _event_body(start_time, end_time, attendees, timezone=DEFAULT_TIMEZONE, summary='Meeting'):
+    return {
+        'summary': summary,
+        'start': {'dateTime': start_time.isoformat(), 'timeZone': timezone},
+        'end': {'dateTime': end_time.isoformat(), 'timeZone': timezone},
+        'attendees': [{'email': email} for email in attendees],
+    }
+
+
+def _parse_bound(value, local_timezone):
+    """A time-range bound: None (now), YYYY-MM-DD (local midnight) or an ISO datetime."""
+    if not value:
+        return datetime.datetime.now(local_timezone)
+    if len(value) == 10:
+        return local_timezone.localize(datetime.datetime.combine(datetime.date.fromisoformat(value), datetime.time()))
+    bound = _parse_time(value)
+    return bound if bound.tzinfo else local_timezone.localize(bound)
+
+
+def _format_event(event):
+    """Flatten an API event; with a fields projection only the requested keys are present."""
+    meeting = {}
+    for key, value in event.items():
+        if key in ('start', 'end'):
+            meeting[key] = value.get('dateTime') or value.get('date')
+        elif key == 'attendees':
+            meeting[key] = [a.get('email') for a in value]
+        else:
+            meeting[key] = value
+    return meeting
+
+
+def _emails(value):
+    """Accept a list of addresses or a comma-separated string."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [email.strip() for email in value if email and email.strip()]
+
+
+def merge_busy(intervals):
+    """
+    Merge (start, end) busy intervals from any number of calendars with a sweep
+    line: walk the sorted start/end points and emit a block whenever the count
+    of overlapping intervals goes from zero to positive and back.
+    """
+    points = []
+    for start, end in intervals:
+        if start < end:
+            points.append((start, 1))
+            points.append((end, -1))
+    # Starts sort before ends at the same instant, so back-to-back blocks merge
+    points.sort(key=lambda point: (point[0], -point[1]))
+    merged, active, block_start = [], 0, None
+    for instant, delta in points:
+        if active == 0 and delta == 1:
+            block_start = instant
+        active += delta
+        if active == 0:
+            merged.append((block_start, instant))
+    return merged
 
 
-SCOPES = ['https://www.googleapis.com/auth/calendar']
+def free_gaps(busy, window_start, window_end):
+    """Free (start, end) gaps inside a window, given merged busy intervals."""
+    gaps, cursor = [], window_start
+    for start, end in busy:
+        if end <= cursor:
+            continue
+        if start >= window_end:
+            break
+        if start > cursor:
+            gaps.append((cursor, start))
+        cursor = max(cursor, end)
+    if cursor < window_end:
+        gaps.append((cursor, window_end))
+    return gaps
 
 
 class MeetingScheduler:
     def __init__(self):
-        self.service = self._get_calendar_service()
-
-    def _get_calendar_service(self):
-        """Authenticate and return Google Calendar service."""
-        creds = None
-        if os.path.exists('token.pickle'):
-            with open('token.pickle', 'rb') as token:
-                creds = pickle.load(token)
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    'credentials.json', SCOPES
-                )
-                creds = flow.run_local_server(port=0)
-            with open('token.pickle', 'wb') as token:
-                pickle.dump(creds, token)
-        return build('calendar', 'v3', credentials=creds)
+        # Authenticated and built on first use, not at import time
+        self._calendar = LazyGoogleService('calendar', 'v3', credential_manager.get_credentials)
+        # Local copy of the primary calendar for listing and conflict checks
+        self.store = CalendarEventStore(self._calendar.get, timezone=DEFAULT_TIMEZONE) if CALENDAR_STORE_ENABLED else None
 
-    def schedule_meeting(self, date_str, start_time_str, end_time_str, attendee_email):
-        """Schedules a meeting if no conflict exists."""
-        # Parse meeting datetime
-        year, month, day = map(int, date_str.split('-'))
-        start_hour, start_minute = map(int, start_time_str.split(':'))
-        end_hour, end_minute = map(int, end_time_str.split(':'))
+    @property
+    def service(self):
+        """Google Calendar service, built on first access."""
+        return self._calendar.get()
 
-        local_timezone = pytz.timezone('Asia/Kolkata')
-        start_time = local_timezone.localize(datetime.datetime(year, month, day, start_hour, start_minute))
-        end_time = local_timezone.localize(datetime.datetime(year, month, day, end_hour, end_minute))
+    def query_busy(self, calendars, time_min, time_max, timezone=DEFAULT_TIMEZONE):
+        """
+        One freebusy.query across every calendar. Returns (busy, errors): the
+        (start, end) busy intervals of all calendars, and the calendars whose
+        availability couldn't be read (e.g. no sharing permission).
+        """
+        response = self.service.freebusy().query(body={
+            'timeMin': time_min.isoformat(),
+            'timeMax': time_max.isoformat(),
+            'timeZone': timezone,
+            'items': [{'id': calendar} for calendar in calendars],
+        }).execute()
 
-        # Check for conflicts
-        events_result = self.service.events().list(
-            calendarId='primary',
-            timeMin=start_time.isoformat(),
-            timeMax=end_time.isoformat(),
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
+        busy, errors = [], {}
+        for calendar, info in response.get('calendars', {}).items():
+            if info.get('errors'):
+                errors[calendar] = [error.get('reason') for error in info['errors']]
+            for block in info.get('busy', []):
+                busy.append((_parse_time(block['start']), _parse_time(block['end']), calendar))
+        return busy, errors
 
-        conflicts = events_result.get('items', [])
-        if conflicts:
+    def find_slots(self, attendee_emails, duration_minutes=30, start_date=None, days=5, max_results=5,
+                   step_minutes=30, timezone=DEFAULT_TIMEZONE, working_hours=None):
+        """
+        Find the best free slots for everyone: a single freebusy.query over the
+        organiser and all attendees, busy intervals merged with a sweep line, and
+        free gaps within working hours cut into candidate slots. The first slot
+        of each free gap ranks ahead of later slots in the same gap, so the
+        results spread across the days instead of packing one morning.
+        """
+        local_timezone = pytz.timezone(timezone)
+        work_start, work_end = working_hours or (WORKING_HOURS_START, WORKING_HOURS_END)
+        work_start = datetime.time(*map(int, work_start.split(':')))
+        work_end = datetime.time(*map(int, work_end.split(':')))
+        duration = datetime.timedelta(minutes=duration_minutes)
+        step = datetime.timedelta(minutes=step_minutes)
+
+        now = datetime.datetime.now(local_timezone)
+        first_day = datetime.date.fromisoformat(start_date) if start_date else now.date()
+        windows = []
+        for offset in range(days):
+            day = first_day + datetime.timedelta(days=offset)
+            window_start = local_timezone.localize(datetime.datetime.combine(day, work_start))
+            window_end = local_timezone.localize(datetime.datetime.combine(day, work_end))
+            window_start = max(window_start, now)
+            if window_end - window_start >= duration:
+                windows.append((window_start, window_end))
+        if not windows:
+            return {"status": "no_slots", "message": "⚠️ No working hours left in the requested range.", "slots": []}
+
+        attendees = _emails(attendee_emails)
+        busy, errors = self.query_busy(['primary'] + attendees, windows[0][0], windows[-1][1], timezone)
+        merged = merge_busy((start, end) for start, end, _ in busy)
+
+        first_slots, later_slots = [], []
+        for window_start, window_end in windows:
+            for gap_start, gap_end in free_gaps(merged, window_start, window_end):
+                # Align candidates to the step grid (e.g. :00/:30) in local time
+                gap_start = gap_start.astimezone(local_timezone)
+                grid = datetime.timedelta(minutes=(gap_start.hour * 60 + gap_start.minute) % step_minutes,
+                                          seconds=gap_start.second, microseconds=gap_start.microsecond)
+                slot_start = gap_start if not grid else gap_start - grid + step
+                first = True
+                while slot_start + duration <= gap_end:
+                    (first_slots if first else later_slots).append(slot_start)
+                    first = False
+                    slot_start += step
+
+        ranked = sorted(first_slots) + sorted(later_slots)
+        slots = [
+            {
+                "date": start.astimezone(local_timezone).date().isoformat(),
+                "start_time": start.astimezone(local_timezone).strftime('%H:%M'),
+                "end_time": (start + duration).astimezone(local_timezone).strftime('%H:%M'),
+                "start": start.astimezone(local_timezone).isoformat(),
+                "end": (start + duration).astimezone(local_timezone).isoformat(),
+            }
+            for start in ranked[:max_results]
+        ]
+        result = {
+            "status": "ok" if slots else "no_slots",
+            "timezone": timezone,
+            "duration_minutes": duration_minutes,
+            "attendees": attendees,
+            "slots": slots,
+        }
+        if errors:
+            # Availability unknown for these calendars; the slots ignore them
+            result["unavailable_calendars"] = errors
+        return result
+
+    def schedule_best_slot(self, attendee_emails, duration_minutes=30, start_date=None, days=5,
+                           timezone=DEFAULT_TIMEZONE):
+        """Book the top slot from find_slots; freebusy already vouched for it, so no re-check."""
+        found = self.find_slots(attendee_emails, duration_minutes, start_date, days, max_results=1,
+                                timezone=timezone)
+        if not found["slots"]:
+            return {"status": "no_slots", "message": "⚠️ No free slot found for all attendees."}
+        slot = found["slots"][0]
+        return self._insert_event(_parse_time(slot["start"]), _parse_time(slot["end"]),
+                                  found["attendees"], timezone)
+
+    def schedule_meeting(self, date_str, start_time_str, end_time_str, attendee_email, timezone=DEFAULT_TIMEZONE):
+        """Schedules a meeting if no conflict exists."""
+        # Parse meeting datetime
+        local_timezone = pytz.timezone(timezone)
+        start_time = _localize(date_str, start_time_str, local_timezone)
+        end_time = _localize(date_str, end_time_str, local_timezone)
+
+        # Check the organiser's calendar (locally when the event store is on) and
+        # the attendees' calendars with one freebusy call
+        attendees = _emails(attendee_email)
+        conflict_summaries = []
+        calendars = ['primary'] + attendees
+        if self.store is not None:
             conflict_summaries = [
                 {
                     "summary": e.get("summary"),
                     "start": e["start"].get("dateTime"),
                     "end": e["end"].get("dateTime")
                 }
-                for e in conflicts
+                for e in self.store.overlapping(start_time, end_time)
+            ]
+            calendars = attendees
+        if not conflict_summaries and calendars:
+            busy, _ = self.query_busy(calendars, start_time, end_time)
+            conflict_summaries = [
+                {
+                    "calendar": calendar,
+                    "start": start.astimezone(local_timezone).isoformat(),
+                    "end": end.astimezone(local_timezone).isoformat()
+                }
+                for start, end, calendar in sorted(busy)
+                if start < end_time and end > start_time
             ]
+        if conflict_summaries:
             return {
                 "status": "conflict",
                 "message": "⚠️ Conflicting meetings found. Cannot schedule.",
                 "conflicts": conflict_summaries
             }
 
-        # Create new event
-        event = {
-            'summary': 'Meeting',
-            'start': {'dateTime': start_time.isoformat(), 'timeZone': 'Asia/Kolkata'},
-            'end': {'dateTime': end_time.isoformat(), 'timeZone': 'Asia/Kolkata'},
-            'attendees': [{'email': attendee_email}],
-        }
+        return self._insert_event(start_time, end_time, attendees, timezone)
+
+    def schedule_meetings(self, meetings):
+        """
+        Schedule many meetings in one go. Each item is a dict with date,
+        start_time, end_time, attendee_email (one or comma-separated) and
+        optionally timezone and summary.
+
+        Busy times for every calendar involved are fetched once for the window
+        spanning all requests. Items are then accepted greedily in the order
+        given, so a later item that overlaps an earlier accepted one (they all
+        land on the organiser's calendar) is reported as a conflict. The
+        survivors are inserted with one Calendar batch HTTP request per
+        CALENDAR_BATCH_SIZE events. Returns one status dict per item, in order.
+        """
+        results = [None] * len(meetings)
+        parsed = []
+        for index, meeting in enumerate(meetings):
+            try:
+                timezone = meeting.get('timezone') or DEFAULT_TIMEZONE
+                local_timezone = pytz.timezone(timezone)
+                start_time = _localize(meeting['date'], meeting['start_time'], local_timezone)
+                end_time = _localize(meeting['date'], meeting['end_time'], local_timezone)
+                if end_time <= start_time:
+                    raise ValueError("end_time must be after start_time")
+                attendees = _emails(meeting.get('attendee_email') or meeting.get('attendee_emails'))
+            except (KeyError, ValueError, AttributeError, pytz.UnknownTimeZoneError) as e:
+                results[index] = {"index": index, "status": "invalid", "message": f"⚠️ Invalid meeting request: {e}"}
+                continue
+            parsed.append((index, start_time, end_time, attendees, timezone, meeting.get('summary') or 'Meeting'))
+
+        if parsed:
+            window_start = min(item[1] for item in parsed)
+            window_end = max(item[2] for item in parsed)
+            calendars = sorted({email for item in parsed for email in item[3]})
+            if self.store is None:
+                calendars = ['primary'] + calendars
+            busy = self.query_busy(calendars, window_start, window_end)[0] if calendars else []
+            if self.store is not None:
+                busy += [(e['_start'], e['_end'], 'primary') for e in self.store.overlapping(window_start, window_end)]
+
+            accepted = []
+            for index, start_time, end_time, attendees, timezone, summary in parsed:
+                involved = {'primary', *attendees}
+                conflicts = [
+                    {"calendar": calendar, "start": start.isoformat(), "end": end.isoformat()}
+                    for start, end, calendar in busy
+                    if calendar in involved and start < end_time and end > start_time
+                ] + [
+                    {"calendar": "primary", "start": other[1].isoformat(), "end": other[2].isoformat(),
+                     "request_index": other[0]}
+                    for other in accepted
+                    if other[1] < end_time and other[2] > start_time
+                ]
+                if conflicts:
+                    results[index] = {
+                        "index": index,
+                        "status": "conflict",
+                        "message": "⚠️ Conflicting meetings found. Cannot schedule.",
+                        "conflicts": conflicts,
+                    }
+                else:
+                    accepted.append((index, start_time, end_time, attendees, timezone, summary))
+
+            for index, result in self._insert_events_batch(accepted).items():
+                results[index] = result
+        return results
 
+    def _insert_events_batch(self, items):
+        """Insert events with Calendar batch HTTP requests; returns {index: status dict}."""
+        results = {}
+
+        def _collect(request_id, response, exception):
+            index, start_time, end_time, attendees, _, _ = pending[request_id]
+            if exception is not None:
+                results[index] = {"index": index, "status": "error", "message": f"Error creating event: {exception}"}
+                return
+            if self.store is not None:
+                self.store.apply(response)
+            results[index] = {"index": index, **self._scheduled(response, start_time, end_time, attendees)}
+
+        for start in range(0, len(items), CALENDAR_BATCH_SIZE):
+            pending = {str(item[0]): item for item in items[start:start + CALENDAR_BATCH_SIZE]}
+            batch = self.service.new_batch_http_request(callback=_collect)
+            for request_id, (_, start_time, end_time, attendees, timezone, summary) in pending.items():
+                batch.add(
+                    self.service.events().insert(
+                        calendarId='primary', body=_event_body(start_time, end_time, attendees, timezone, summary)
+                    ),
+                    request_id=request_id,
+                )
+            batch.execute()
+        return results
+
+    def _insert_event(self, start_time, end_time, attendees, timezone=DEFAULT_TIMEZONE):
+        # Create new event
         created_event = self.service.events().insert(
-            calendarId='primary', body=event
+            calendarId='primary', body=_event_body(start_time, end_time, attendees, timezone)
         ).execute()
+        if self.store is not None:
+            # Write through so the next conflict check sees it before the next sync
+            self.store.apply(created_event)
+        return self._scheduled(created_event, start_time, end_time, attendees)
 
+    @staticmethod
+    def _scheduled(created_event, start_time, end_time, attendees):
         return {
             "status": "scheduled",
-            "message": f"✅ Meeting scheduled with {attendee_email}",
+            "message": f"✅ Meeting scheduled with {', '.join(attendees)}",
             "meeting_link": created_event.get("htmlLink"),
             "event_id": created_event.get("id"),
+            "start": start_time.isoformat(),
+            "end": end_time.isoformat(),
         }
 
     def finish_meeting(self, event_id):
@@ -103,6 +391,17 @@ class MeetingScheduler:
 
     def list_meetings(self):
         """Fetch upcoming 10 events."""
+        if self.store is not None:
+            return [
+                {
+                    "summary": e.get("summary"),
+                    "start": e["start"].get("dateTime"),
+                    "end": e["end"].get("dateTime"),
+                    "attendees": [a["email"] for a in e.get("attendees", [])]
+                }
+                for e in self.store.upcoming(limit=10)
+            ]
+
         now = datetime.datetime.utcnow().isoformat() + 'Z'
         events_result = self.service.events().list(
             calendarId='primary',
@@ -123,6 +422,34 @@ class MeetingScheduler:
             for e in events
         ]
 
+    def list_meetings_page(self, time_min=None, time_max=None, page_size=50, page_token=None, fields=None,
+                           timezone=DEFAULT_TIMEZONE):
+        """
+        One page of events between time_min and time_max (ISO dates or datetimes,
+        default from now with no upper bound). fields is a projection of event
+        fields sent to the API (e.g. "summary,start"), so only those come back.
+        Returns {"meetings": [...], "next_page_token": str | None}.
+        """
+        local_timezone = pytz.timezone(timezone)
+        params = {
+            'calendarId': 'primary',
+            'timeMin': _parse_bound(time_min, local_timezone).isoformat(),
+            'maxResults': min(page_size, 2500),
+            'singleEvents': True,
+            'orderBy': 'startTime',
+            'fields': f"nextPageToken,items({fields or DEFAULT_EVENT_FIELDS})",
+        }
+        if time_max:
+            params['timeMax'] = _parse_bound(time_max, local_timezone).isoformat()
+        if page_token:
+            params['pageToken'] = page_token
+
+        events_result = self.service.events().list(**params).execute()
+        return {
+            "meetings": [_format_event(e) for e in events_result.get('items', [])],
+            "next_page_token": events_result.get('nextPageToken'),
+        }
+
 
 # Instantiate scheduler
 scheduler = MeetingScheduler()
\ No newline at end of file
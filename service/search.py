@@ -0,0 +1,224 @@
+# service/search.py
+import asyncio
+import logging
+import os
+import re
+import unicodedata
+from typing import List
+
+from dotenv import load_dotenv
+
+from service.cache import TieredCache
+from service.semantic_cache import SemanticCache
+from service.services import client, stream_completion
+load_dotenv()
+
+SEARCH_MODEL = "gpt-4o-search-preview"
+# Web results go stale quickly, so they are only reused for a few minutes
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", 300))
+search_cache = TieredCache(
+    "search",
+    ttl=SEARCH_CACHE_TTL,
+    max_entries=int(os.getenv("SEARCH_CACHE_SIZE", 2000)),
+    memory_entries=256,
+)
+# Paraphrases of a recent query ("vision pro news" / "latest on the vision pro") reuse its result
+search_semantic_cache = SemanticCache("web_search", ttl=SEARCH_CACHE_TTL)
+# Searches in progress by normalised query: {"task": ..., "waiters": n}. Concurrent
+# callers await the same task, which is cancelled once every caller has given up
+_pending = {}
+
+
+def normalize_query(user_query: str) -> str:
+    """Casefold, unify unicode and whitespace, and drop trailing punctuation."""
+    query = unicodedata.normalize("NFKC", user_query).casefold()
+    query = re.sub(r"\s+", " ", query).strip()
+    return query.rstrip("?!. ")
+
+
+def format_search_response(raw_content: str) -> tuple[str, List[str]]:
+    """
+    Format the search response by:
+    1. Removing markdown links
+    2. Extracting sources separately
+    3. Creating a clean, readable summary
+    """
+    # Extract URLs from markdown links
+    url_pattern = r'\[([^\]]+)\]\(([^)]+)\)'
+    sources = []
+
+    # Find all markdown links
+    matches = re.findall(url_pattern, raw_content)
+    for text, url in matches:
+        # Clean up the URL (remove utm_source parameters)
+        clean_url = url.split('?')[0]
+        if clean_url not in sources:
+            sources.append(clean_url)
+
+    # Remove markdown links from the content
+    clean_content = re.sub(url_pattern, r'\1', raw_content)
+
+    # Remove parentheses that contained sources
+    clean_content = re.sub(r'\s*\([^)]*https?://[^)]+\)', '', clean_content)
+
+    # Clean up extra spaces and punctuation
+    clean_content = re.sub(r'\s+', ' ', clean_content).strip()
+    clean_content = re.sub(r'\s+([.,;])', r'\1', clean_content)
+
+    return clean_content, sources
+
+
+def _settled(raw_content: str) -> int:
+    """
+    Length of the longest prefix of a partial answer whose formatting can't
+    change as more text arrives: it stops before any "(" or "[" that isn't
+    closed yet, and before a "[text]" that may still turn into a link.
+    """
+    cut = len(raw_content)
+    for opening, closing in (("(", ")"), ("[", "]")):
+        start = raw_content.find(opening, raw_content.rfind(closing) + 1)
+        if start != -1:
+            cut = min(cut, start)
+    head = raw_content[:cut].rstrip()
+    if head.endswith("]"):
+        cut = max(head.rfind("["), 0)
+    return cut
+
+
+class _FormattedStream:
+    """
+    Streams the text format_search_response will produce instead of the raw
+    markdown: chunks passed to on_token add up to the final summary.
+    """
+
+    def __init__(self, on_token):
+        self.on_token = on_token
+        self.raw_content = ""
+        self.sent = ""
+
+    async def token(self, delta: str):
+        self.raw_content += delta
+        await self.send(format_search_response(self.raw_content[:_settled(self.raw_content)])[0])
+
+    async def send(self, summary: str):
+        """Pass on whatever summary adds to the text already sent."""
+        if len(summary) > len(self.sent) and summary.startswith(self.sent):
+            chunk, self.sent = summary[len(self.sent):], summary
+            await self.on_token(chunk)
+        elif not summary.startswith(self.sent):
+            logging.warning("Streamed search text diverged from the formatted answer")
+
+
+def format_search_answer(summary: str, sources: List[str]) -> str:
+    """A search result as text: the summary followed by its source links."""
+    if not sources:
+        return summary
+    return summary + "\n\nSources:\n" + "\n".join(f"- {source}" for source in sources)
+
+
+def _search_messages(user_query: str):
+    return [
+        {
+            "role": "system",
+            "content": """Answer the user's query to the point with accurate, real-time web results.
+            Format your response as a clear, concise paragraph without any markdown formatting.
+            Include source citations naturally in the text."""
+        },
+        {
+            "role": "user",
+            "content": user_query
+        }
+    ]
+
+
+def _lookup(user_query: str, key: str):
+    """Exact (normalised) match first, then the closest paraphrase."""
+    cached = search_cache.get(key)
+    if cached is None:
+        cached = search_semantic_cache.get(user_query)
+    return cached
+
+
+def _store(user_query: str, key: str, summary: str, sources: List[str]):
+    result = {"summary": summary, "sources": sources}
+    search_cache.set(key, result)
+    search_semantic_cache.set(user_query, result)
+
+
+async def _search(user_query: str, key: str, on_token=None):
+    stream = _FormattedStream(on_token) if on_token is not None else None
+    raw_content = await stream_completion(
+        model=SEARCH_MODEL,
+        messages=_search_messages(user_query),
+        on_token=stream.token if stream is not None else None,
+        cache=False,
+        web_search_options={"search_context_size": "low"},
+    )
+    summary, sources = format_search_response(raw_content)
+    if stream is not None:
+        await stream.send(summary)
+    _store(user_query, key, summary, sources)
+    return summary, sources
+
+
+async def web_search(user_query: str, on_token=None) -> tuple[str, List[str]]:
+    """
+    Real-time web search shared by Insight_scope and the reasoning agent.
+    Returns (summary, sources). Results are cached for SEARCH_CACHE_TTL
+    seconds under the normalised query (and reused for close paraphrases),
+    and a search already running for the same query is awaited instead of
+    started again. The search itself is cancelled when the last caller
+    waiting on it is cancelled, e.g. a speculative search the reasoning
+    agent turns out not to need. on_token receives the cleaned summary (as
+    returned, not the raw markdown), streamed for a fresh search and in one
+    chunk for a reused result.
+    """
+    key = normalize_query(user_query)
+    cached = _lookup(user_query, key)
+    if cached is not None:
+        summary, sources = cached["summary"], cached["sources"]
+        if on_token is not None:
+            await on_token(summary)
+        return summary, sources
+
+    pending = _pending.get(key)
+    leader = pending is None
+    if leader:
+        pending = {"task": asyncio.ensure_future(_search(user_query, key, on_token)), "waiters": 0}
+        _pending[key] = pending
+        pending["task"].add_done_callback(lambda _: _pending.pop(key, None) if _pending.get(key) is pending else None)
+    pending["waiters"] += 1
+    try:
+        # Shielded so one caller giving up doesn't cancel the search for the others
+        summary, sources = await asyncio.shield(pending["task"])
+    finally:
+        pending["waiters"] -= 1
+        if pending["waiters"] == 0 and not pending["task"].done():
+            # Nobody is waiting any more; don't let a new caller join a cancelled search
+            if _pending.get(key) is pending:
+                del _pending[key]
+            pending["task"].cancel()
+    if not leader and on_token is not None:
+        await on_token(summary)
+    return summary, sources
+
+
+def web_search_sync(user_query: str) -> tuple[str, List[str]]:
+    """Blocking web_search for callers outside the event loop; shares the same cache."""
+    key = normalize_query(user_query)
+    cached = _lookup(user_query, key)
+    if cached is not None:
+        return cached["summary"], cached["sources"]
+    response = client.chat.completions.create(
+        model=SEARCH_MODEL,
+        web_search_options={"search_context_size": "low"},
+        messages=_search_messages(user_query),
+    )
+    summary, sources = format_search_response(response.choices[0].message.content.strip())
+    _store(user_query, key, summary, sources)
+    return summary, sources
+
+
+def search_cache_stats():
+    """Hit/miss counters for cached web searches."""
+    return search_cache.stats()
@@ -0,0 +1,244 @@
+# service/semantic_cache.py
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from typing import Any, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from service.cache import CACHE_DIR
+load_dotenv()
+
+# Serve rewordings of earlier queries ("cafes in Juhu" / "Juhu cafés?") from cache. Off by
+# default: a lexical embedding only catches reordered or re-spelled queries, not real paraphrases
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+# Width of the hashed feature vectors and number of queries kept per cache
+SEMANTIC_CACHE_DIM = int(os.getenv("SEMANTIC_CACHE_DIM", 1024))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", 2048))
+# Minimum cosine similarity for a hit, per cache; override with SEMANTIC_CACHE_THRESHOLD_<NAME>.
+# General answers are only reused for near-identical wording (a lexical embedding can't
+# tell every paraphrase from a different question); place lookups tolerate more rephrasing.
+SEMANTIC_CACHE_THRESHOLDS = {
+    "general_query": 0.97,
+    "web_search": 0.88,
+    "places_guide": 0.82,
+    "places_fast": 0.82,
+}
+DEFAULT_SEMANTIC_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.9))
+
+# Words that don't change what is being asked about. Question words are kept
+# ("who founded X" and "when was X founded" need different answers), and so are
+# direction and negation words ("to"/"from", "with"/"without", "not").
+STOPWORDS = frozenset(
+    "a an the of in on at for by and or is are was were be been it its this that these those "
+    "i me my we our you your please can could would should do does tell show give find list get "
+    "best top good great nice popular famous recommended recommend some any near nearby around close "
+    "about there here".split()
+)
+TRIGRAM_WEIGHT = 0.35
+# Adjacent-word pairs make the vector order-aware: "celsius to fahrenheit" and
+# "fahrenheit to celsius" share every word but no bigram
+BIGRAM_WEIGHT = 1.0
+# Bumped whenever embed() changes; vectors stored under another version are dropped
+EMBEDDING_VERSION = 2
+
+_caches = []
+
+
+def semantic_threshold(name: str) -> float:
+    return float(os.getenv(f"SEMANTIC_CACHE_THRESHOLD_{name.upper()}",
+                           SEMANTIC_CACHE_THRESHOLDS.get(name, DEFAULT_SEMANTIC_THRESHOLD)))
+
+
+def _words(text: str):
+    """Accent-folded, casefolded content words with a plural 's' trimmed."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char)).casefold()
+    words = []
+    for word in re.findall(r"[a-z0-9]+", text):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+
+def _numbers(text: str):
+    return sorted(re.findall(r"\d+(?:\.\d+)?", text))
+
+
+def _guard(text: str):
+    """
+    What two queries must share exactly to reuse an answer: their content
+    words (qualifiers and negations included) and their numbers. Similarity
+    alone can't tell "vegan restaurants near X" from "restaurants near X".
+    """
+    return frozenset(_words(text)), _numbers(text)
+
+
+def embed(text: str, dim: int = SEMANTIC_CACHE_DIM) -> np.ndarray:
+    """
+    Hashing-trick embedding: content words, their character trigrams and
+    adjacent word pairs, hashed with crc32 (stable across processes) into a
+    signed, L2-normalised float32 vector. Trigrams make near-spellings
+    ("cafe"/"cafes") overlap; bigrams keep word order.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    words = _words(text)
+    features = [(f"{first} {second}", BIGRAM_WEIGHT) for first, second in zip(words, words[1:])]
+    for word in words:
+        features.append((word, 1.0))
+        padded = f"#{word}#"
+        features += [(padded[i:i + 3], TRIGRAM_WEIGHT) for i in range(len(padded) - 2)]
+    for feature, weight in features:
+        h = zlib.crc32(feature.encode("utf-8"))
+        vector[h % dim] += weight if h & 0x80000000 else -weight
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """
+    Near-duplicate cache keyed by query meaning rather than exact text.
+
+    Query embeddings live in a float32 matrix memory-mapped from
+    <name>.vectors.f32, so the cache survives restarts without re-embedding;
+    answers and per-slot metadata live in SQLite next to it. A lookup is one
+    matrix-vector product over every slot (cosine top-1), masked to live,
+    unexpired slots. A hit needs similarity >= threshold and the same content
+    words and numbers in both queries, so "cheap hotels" never answers "hotels
+    with wifi" and "2024" never answers "2025"; what's left for the embedding
+    is word order, accents, plurals and filler words. When full, the least
+    recently used slot is overwritten. Values must be JSON-serialisable.
+    Safe to share between threads.
+    """
+
+    def __init__(self, name: str, ttl: Optional[float] = None, threshold: Optional[float] = None,
+                 capacity: int = SEMANTIC_CACHE_SIZE, dim: int = SEMANTIC_CACHE_DIM, directory: str = CACHE_DIR):
+        self.name = name
+        self.ttl = ttl
+        self.threshold = semantic_threshold(name) if threshold is None else threshold
+        self.capacity = capacity
+        self.dim = dim
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, f"{name}.semantic.sqlite3"),
+                                     check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS slots ("
+            " slot INTEGER PRIMARY KEY,"
+            " query TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        path = os.path.join(directory, f"{name}.vectors.f32")
+        size = capacity * dim * np.dtype(np.float32).itemsize
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if not os.path.exists(path) or os.path.getsize(path) != size or version != EMBEDDING_VERSION:
+            # New file, or one written with a different capacity/dim/embedding: start over
+            self._conn.execute("DELETE FROM slots")
+            self._conn.execute(f"PRAGMA user_version = {EMBEDDING_VERSION}")
+            self._vectors = np.memmap(path, dtype=np.float32, mode="w+", shape=(capacity, dim))
+        else:
+            self._vectors = np.memmap(path, dtype=np.float32, mode="r+", shape=(capacity, dim))
+        self._live = np.zeros(capacity, dtype=bool)
+        self._expires = np.full(capacity, np.inf)
+        self._accessed = np.zeros(capacity)
+        for slot, expires_at, accessed_at in self._conn.execute("SELECT slot, expires_at, accessed_at FROM slots"):
+            self._live[slot] = True
+            self._expires[slot] = np.inf if expires_at is None else expires_at
+            self._accessed[slot] = accessed_at
+        self.hits = 0
+        self.misses = 0
+        _caches.append(self)
+
+    def __len__(self):
+        return int(self._live.sum())
+
+    def _best(self, vector, now):
+        """(slot, similarity) of the closest live entry, or (None, -1)."""
+        usable = self._live & (self._expires > now)
+        if not usable.any():
+            return None, -1.0
+        scores = self._vectors @ vector
+        scores[~usable] = -np.inf
+        slot = int(np.argmax(scores))
+        return slot, float(scores[slot])
+
+    def get(self, query: str, default: Any = None) -> Any:
+        """The answer cached for the most similar earlier query, or default."""
+        if not SEMANTIC_CACHE_ENABLED:
+            return default
+        vector = embed(query, self.dim)
+        now = time.time()
+        with self._lock:
+            slot, score = self._best(vector, now)
+            row = None
+            if slot is not None and score >= self.threshold:
+                row = self._conn.execute("SELECT query, value FROM slots WHERE slot = ?", (slot,)).fetchone()
+                if row is not None and _guard(row[0]) != _guard(query):
+                    row = None
+            if row is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._accessed[slot] = now
+            self._conn.execute("UPDATE slots SET accessed_at = ? WHERE slot = ?", (now, slot))
+        return json.loads(row[1])
+
+    def set(self, query: str, value: Any, ttl: Optional[float] = None):
+        """Store an answer for query, replacing an identical-meaning entry or the LRU slot."""
+        if not SEMANTIC_CACHE_ENABLED:
+            return
+        vector = embed(query, self.dim)
+        if not vector.any():
+            return
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        expires_at = None if ttl is None else now + ttl
+        payload = json.dumps(value)
+        with self._lock:
+            slot, score = self._best(vector, now)
+            if slot is None or score < 0.999:
+                free = np.flatnonzero(~self._live | (self._expires <= now))
+                slot = int(free[0]) if len(free) else int(np.argmin(self._accessed))
+            # Vector first: a slot only becomes live once its SQLite row exists
+            self._vectors[slot] = vector
+            self._vectors.flush()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO slots (slot, query, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (slot, query, payload, expires_at, now),
+            )
+            self._live[slot] = True
+            self._expires[slot] = np.inf if expires_at is None else expires_at
+            self._accessed[slot] = now
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM slots")
+            self._live[:] = False
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+def semantic_cache_stats():
+    """Hit/miss counters for every semantic cache in the process."""
+    return {cache.name: cache.stats() for cache in _caches}
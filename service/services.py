@@ -1,20 +1,177 @@
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
+import asyncio
+import hashlib
+import json
 import os
+import re
 from dotenv import load_dotenv
+from service.cache import SingleFlight, TieredCache
+from service.semantic_cache import SemanticCache
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 # Initialize OpenAI client
 client = OpenAI(api_key=OPENAI_API_KEY)
+# Async client for the streaming variants used by MCP tools
+async_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
 
+# Completions for the same normalised prompt, model and temperature are served from cache
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+response_cache = TieredCache(
+    "responses",
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", 24 * 3600)),
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", 5000)),
+    memory_entries=512,
+    max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    memory_bytes=int(os.getenv("RESPONSE_CACHE_MEMORY_BYTES", 8 * 1024 * 1024)),
+)
+# Concurrent identical requests share one API call
+response_flights = SingleFlight()
+# Streaming completions in progress by (event loop, cache key), the async counterpart of response_flights
+_streams = {}
+# Reworded general questions reuse an earlier answer
+general_query_cache = SemanticCache("general_query", ttl=float(os.getenv("RESPONSE_CACHE_TTL", 24 * 3600)))
 
-def generate_summary(long_text: str):
+
+def normalize_prompt(text: str) -> str:
+    """Collapse runs of whitespace so formatting-only differences hit the same cache entry."""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def response_cache_key(messages, model: str, temperature=None, **params) -> str:
+    """Content address of a completion request: sha256 over normalised messages, model and sampling params."""
+    payload = {
+        "model": model,
+        "temperature": temperature,
+        "messages": [[message["role"], normalize_prompt(message["content"])] for message in messages],
+        **params,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def cached_completion(model: str, messages, temperature=None, **params) -> str:
     """
-    Summarizes long paragraphs or content from a text file in a professional, engaging manner,
-    preserving the original context and key information.
+    Chat completion text through the response cache. A miss takes a
+    single-flight slot, so concurrent identical requests wait for the first
+    one's answer instead of each calling the API. Errors and empty answers
+    are never cached.
     """
-    # Step 1: Define the summarization prompt
-    summary_prompt = [
+    if temperature is not None:
+        params["temperature"] = temperature
+
+    def _complete():
+        response = client.chat.completions.create(model=model, messages=messages, **params)
+        return response.choices[0].message.content.strip()
+
+    if not RESPONSE_CACHE_ENABLED:
+        return _complete()
+
+    key = response_cache_key(messages, model, **params)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+
+    def _complete_and_store():
+        # A flight for this key may have finished between our miss and now
+        entry = response_cache.memory.get_entry(key)
+        if entry is not None:
+            return entry[0]
+        content = _complete()
+        if content:
+            response_cache.set(key, content)
+        return content
+
+    return response_flights.do(key, _complete_and_store)
+
+
+async def _stream(flight, model: str, messages, openai_client, params) -> str:
+    """Stream one completion, passing each delta to the flight's on_token while it's set."""
+    stream = await (openai_client or async_client).chat.completions.create(model=model, messages=messages, stream=True, **params)
+    parts = []
+    async for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            parts.append(delta)
+            on_token = flight["on_token"]
+            if on_token is not None:
+                try:
+                    await on_token(delta)
+                except Exception as e:
+                    # Only the caller whose callback failed sees the error
+                    flight["on_token"], flight["error"] = None, e
+    content = "".join(parts).strip()
+    if flight["key"] is not None and content:
+        response_cache.set(flight["key"], content)
+    return content
+
+
+async def stream_completion(model: str, messages, on_token=None, temperature=None, cache: bool = True,
+                            openai_client=None, **params) -> str:
+    """
+    Async chat completion that streams: on_token(delta) is awaited for every
+    chunk of text as it arrives, and the full text is returned at the end.
+    With cache=True a cached answer is replayed as a single chunk, and a
+    fresh (non-empty) answer is stored under the same key as
+    cached_completion uses. A miss for a request already streaming on this
+    event loop waits for that stream and gets its text as one chunk; the
+    stream is cancelled once every caller waiting on it has been cancelled.
+    openai_client overrides the shared async_client (which is bound to the
+    server's event loop).
+    """
+    if temperature is not None:
+        params["temperature"] = temperature
+    key = response_cache_key(messages, model, **params) if cache and RESPONSE_CACHE_ENABLED else None
+    if key is None:
+        flight = {"key": None, "on_token": on_token, "error": None}
+        content = await _stream(flight, model, messages, openai_client, params)
+        if flight["error"] is not None:
+            raise flight["error"]
+        return content
+
+    cached = response_cache.get(key)
+    if cached is not None:
+        if on_token is not None:
+            await on_token(cached)
+        return cached
+
+    # Keyed by loop too: a task can only be awaited from the loop running it
+    flight_key = (asyncio.get_running_loop(), key)
+    flight = _streams.get(flight_key)
+    leader = flight is None
+    if leader:
+        flight = {"key": key, "on_token": on_token, "error": None, "waiters": 0}
+        flight["task"] = asyncio.ensure_future(_stream(flight, model, messages, openai_client, params))
+        _streams[flight_key] = flight
+        flight["task"].add_done_callback(
+            lambda _: _streams.pop(flight_key, None) if _streams.get(flight_key) is flight else None
+        )
+    else:
+        response_flights.coalesced += 1
+    flight["waiters"] += 1
+    try:
+        content = await asyncio.shield(flight["task"])
+    finally:
+        flight["waiters"] -= 1
+        if leader:
+            flight["on_token"] = None
+        if flight["waiters"] == 0 and not flight["task"].done():
+            if _streams.get(flight_key) is flight:
+                del _streams[flight_key]
+            flight["task"].cancel()
+    if leader and flight["error"] is not None:
+        raise flight["error"]
+    if not leader and on_token is not None:
+        await on_token(content)
+    return content
+
+
+def response_cache_stats():
+    """Hit/miss counters and sizes for the completion cache."""
+    return {**response_cache.stats(), "coalesced": response_flights.coalesced}
+
+
+def _summary_messages(long_text: str):
+    return [
         {
             "role": "system",
             "content": (
@@ -37,15 +194,44 @@ def generate_summary(long_text: str):
         }
     ]
 
+
+def generate_summary(long_text: str):
+    """
+    Summarizes long paragraphs or content from a text file in a professional, engaging manner,
+    preserving the original context and key information.
+    """
+    from service.summarizer import SUMMARY_SINGLE_PASS_TOKENS, exceeds_tokens, summarizer
+
+    if exceeds_tokens(long_text, SUMMARY_SINGLE_PASS_TOKENS):
+        if RESPONSE_CACHE_ENABLED:
+            # Same key as the single-pass request, and the one summarizer.summarize stores under
+            key = response_cache_key(_summary_messages(long_text), "gpt-4o-mini", temperature=0.3, max_tokens=600)
+            cached = response_cache.get(key)
+            if cached is not None:
+                return cached
+
+        # Too long for one prompt: map-reduce over chunks on a private event loop. It gets its
+        # own async client, since async_client's connection pool belongs to the server's loop
+        async def _summarize_long():
+            async with AsyncOpenAI(api_key=OPENAI_API_KEY) as openai_client:
+                return await summarizer.summarize(long_text, openai_client=openai_client)
+
+        try:
+            return asyncio.run(_summarize_long())
+        except Exception as e:
+            print("[ERROR] Failed to generate summary:", e)
+            return "Summary generation failed. Please try again."
+
+    # Step 1: Define the summarization prompt
+    summary_prompt = _summary_messages(long_text)
+
     try:
-        response = client.chat.completions.create(
+        summary_output = cached_completion(
             model="gpt-4o-mini",
             messages=summary_prompt,
             temperature=0.3,
             max_tokens=600  # You can increase this if needed
         )
-
-        summary_output = response.choices[0].message.content.strip()
         print("[DEBUG] Generated Summary:\n", summary_output)
         return summary_output
 
@@ -54,9 +240,35 @@ def generate_summary(long_text: str):
         return "Summary generation failed. Please try again."
 
 
+async def generate_summary_stream(long_text: str, on_token=None, on_stage=None) -> str:
+    """
+    generate_summary, streaming the summary through on_token as it is written.
+    Inputs over SUMMARY_SINGLE_PASS_TOKENS go through the hierarchical
+    summarizer, which reports its map/reduce levels through on_stage.
+    """
+    from service.summarizer import SUMMARY_SINGLE_PASS_TOKENS, exceeds_tokens, summarizer
+
+    try:
+        if exceeds_tokens(long_text, SUMMARY_SINGLE_PASS_TOKENS):
+            return await summarizer.summarize(long_text, on_token=on_token, on_stage=on_stage)
+        return await stream_completion(
+            model="gpt-4o-mini",
+            messages=_summary_messages(long_text),
+            on_token=on_token,
+            temperature=0.3,
+            max_tokens=600
+        )
+    except Exception as e:
+        print("[ERROR] Failed to generate summary:", e)
+        return "Summary generation failed. Please try again."
+
+
 def perform_general_query(user_query: str) -> str:
     """Perform a general query using a faster model."""
-    response = client.chat.completions.create(
+    cached = general_query_cache.get(user_query)
+    if cached is not None:
+        return cached
+    answer = cached_completion(
         model="gpt-3.5-turbo",  # Changed to a faster, general-purpose model
         messages=[
             {
@@ -69,23 +281,27 @@ def perform_general_query(user_query: str) -> str:
             }
         ],
     )
-    return response.choices[0].message.content.strip()
+    general_query_cache.set(user_query, answer)
+    return answer
 
 
 def realtime_web_search(user_query: str) -> str:
     """Perform real-time web search using OpenAI GPT-4o with web browsing"""
-    response = client.chat.completions.create(
-        model="gpt-4o-search-preview",
-        web_search_options={"search_context_size": "low"},
-        messages=[
-            {
-                "role": "system",
-                "content": "Answer the user's query to the point using real-time web results. Do not include any extra information or commentary."
-            },
-            {
-                "role": "user",
-                "content": user_query
-            }
-        ],
-    )
-    return response.choices[0].message.content.strip()
+    from service.search import format_search_answer, web_search_sync
+
+    return format_search_answer(*web_search_sync(user_query))
+
+
+async def realtime_web_search_stream(user_query: str, on_token=None) -> str:
+    """
+    realtime_web_search, streaming the answer through on_token: the chunks add
+    up to the returned text (summary, then its sources). Results come from the
+    shared short-TTL search cache when the query was searched recently.
+    """
+    from service.search import format_search_answer, web_search
+
+    summary, sources = await web_search(user_query, on_token)
+    answer = format_search_answer(summary, sources)
+    if on_token is not None and len(answer) > len(summary):
+        await on_token(answer[len(summary):])
+    return answer
@@ -0,0 +1,274 @@
+# service/summarizer.py
+import asyncio
+import os
+import re
+
+from dotenv import load_dotenv
+
+from service.services import (
+    RESPONSE_CACHE_ENABLED, _summary_messages, response_cache, response_cache_key, stream_completion
+)
+load_dotenv()
+
+SUMMARY_MODEL = "gpt-4o-mini"
+# Inputs up to this many tokens are summarised in a single call
+SUMMARY_SINGLE_PASS_TOKENS = int(os.getenv("SUMMARY_SINGLE_PASS_TOKENS", 6000))
+# Target size of each chunk in the map step
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", 3000))
+# Partial summaries are merged in groups of at most this many tokens
+SUMMARY_REDUCE_TOKENS = int(os.getenv("SUMMARY_REDUCE_TOKENS", 6000))
+# Chunk summaries in flight at once
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", 8))
+SUMMARY_PARTIAL_MAX_TOKENS = 400
+
+# Rough characters per token when tiktoken isn't installed
+CHARS_PER_TOKEN = 4
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+
+try:
+    import tiktoken
+    try:
+        _encoding = tiktoken.encoding_for_model(SUMMARY_MODEL)
+    except KeyError:
+        _encoding = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Token count with tiktoken when it's installed, otherwise a ~4 chars/token estimate."""
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def exceeds_tokens(text: str, limit: int) -> bool:
+    """
+    Whether text is over limit tokens, counted a paragraph at a time and
+    stopping as soon as the limit is passed, so a huge input isn't encoded
+    in one go just to pick the summarization path.
+    """
+    # A token is at least one character
+    if len(text) <= limit:
+        return False
+    total = 0
+    for paragraph in iter_paragraphs(text):
+        total += count_tokens(paragraph)
+        if total > limit:
+            return True
+    return False
+
+
+def _split_by_tokens(text: str, max_tokens: int):
+    """Hard-split text that has no usable sentence boundaries."""
+    if _encoding is not None:
+        tokens = _encoding.encode(text, disallowed_special=())
+        for start in range(0, len(tokens), max_tokens):
+            yield _encoding.decode(tokens[start:start + max_tokens])
+    else:
+        step = max_tokens * CHARS_PER_TOKEN
+        for start in range(0, len(text), step):
+            yield text[start:start + step]
+
+
+def iter_paragraphs(source):
+    """
+    Paragraphs from a string or from an iterable of lines (e.g. an open file),
+    yielded one at a time so the whole document never has to be held at once.
+    """
+    if isinstance(source, str):
+        position = 0
+        for match in PARAGRAPH_BREAK.finditer(source):
+            paragraph = source[position:match.start()].strip()
+            if paragraph:
+                yield paragraph
+            position = match.end()
+        paragraph = source[position:].strip()
+        if paragraph:
+            yield paragraph
+        return
+    lines = []
+    for line in source:
+        if line.strip():
+            lines.append(line.rstrip("\n"))
+        elif lines:
+            yield "\n".join(lines).strip()
+            lines = []
+    if lines:
+        yield "\n".join(lines).strip()
+
+
+def _pieces(paragraph: str, max_tokens: int):
+    """
+    (piece, tokens) for a paragraph as-is, or split on sentences (then
+    tokens) when it's over max_tokens. Each piece is only encoded once.
+    """
+    tokens = count_tokens(paragraph)
+    if tokens <= max_tokens:
+        yield paragraph, tokens
+        return
+    for sentence in SENTENCE_BREAK.split(paragraph):
+        tokens = count_tokens(sentence)
+        if tokens <= max_tokens:
+            yield sentence, tokens
+        else:
+            for piece in _split_by_tokens(sentence, max_tokens):
+                yield piece, count_tokens(piece)
+
+
+def iter_chunks(source, max_tokens: int = SUMMARY_CHUNK_TOKENS):
+    """
+    Pack paragraphs into chunks of at most max_tokens, splitting oversized
+    paragraphs on sentence and then token boundaries. Tokens are counted a
+    paragraph at a time as the source is read.
+    """
+    chunk, size = [], 0
+    for paragraph in iter_paragraphs(source):
+        for piece, tokens in _pieces(paragraph, max_tokens):
+            if chunk and size + tokens > max_tokens:
+                yield "\n\n".join(chunk)
+                chunk, size = [], 0
+            chunk.append(piece)
+            size += tokens
+    if chunk:
+        yield "\n\n".join(chunk)
+
+
+def _partial_messages(text: str, part: str):
+    return [
+        {
+            "role": "system",
+            "content": (
+                "You are a professional summarization agent working on one part of a longer document. "
+                "Summarize it faithfully and densely: keep every key fact, figure, name, decision and argument, "
+                "and drop filler. Do not add an introduction or conclusion."
+            )
+        },
+        {
+            "role": "user",
+            "content": f"{part}:\n\n{text}\n\nOutput the result as plain text (no headings or labels)."
+        }
+    ]
+
+
+class HierarchicalSummarizer:
+    """
+    Map-reduce summarizer for documents too long for one prompt.
+
+    The map step streams chunks off the input and summarises them
+    concurrently; at most `concurrency` calls are in flight, so the chunk
+    generator (and memory) only advances as fast as summaries complete. The
+    reduce step packs partial summaries into groups of up to reduce_tokens,
+    merges the groups concurrently under the same cap, and repeats until one
+    group is left, which gets the regular summary prompt and is streamed
+    through on_token.
+    Wall-clock time grows with the depth of that tree, not with the number
+    of chunks. Every call goes through the response cache, and the final
+    summary of a string input is cached under the same key a single-pass
+    summary of it would use, so a repeated document skips the whole tree.
+    """
+
+    def __init__(self, model=SUMMARY_MODEL, chunk_tokens=SUMMARY_CHUNK_TOKENS,
+                 reduce_tokens=SUMMARY_REDUCE_TOKENS, concurrency=SUMMARY_CONCURRENCY):
+        self.model = model
+        self.chunk_tokens = chunk_tokens
+        self.reduce_tokens = reduce_tokens
+        self.concurrency = concurrency
+
+    async def _summarize_part(self, text: str, part: str, openai_client=None) -> str:
+        return await stream_completion(
+            model=self.model,
+            messages=_partial_messages(text, part),
+            temperature=0.3,
+            openai_client=openai_client,
+            max_tokens=SUMMARY_PARTIAL_MAX_TOKENS
+        )
+
+    async def _merge(self, group, semaphore, openai_client=None):
+        async with semaphore:
+            return await self._summarize_part(
+                "\n\n".join(group), "Merge these consecutive section summaries into one", openai_client
+            )
+
+    async def _map(self, source, semaphore, openai_client=None):
+        tasks = []
+
+        async def _run(chunk):
+            try:
+                return await self._summarize_part(chunk, "Summarize this section of the document", openai_client)
+            finally:
+                semaphore.release()
+
+        try:
+            for chunk in iter_chunks(source, self.chunk_tokens):
+                # Don't read further ahead than the summaries in flight
+                await semaphore.acquire()
+                tasks.append(asyncio.create_task(_run(chunk)))
+            return list(await asyncio.gather(*tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+    def _groups(self, summaries):
+        """Consecutive summaries packed into groups of at most reduce_tokens (and at least two)."""
+        groups, group, size = [], [], 0
+        for summary in summaries:
+            tokens = count_tokens(summary)
+            if len(group) >= 2 and size + tokens > self.reduce_tokens:
+                groups.append(group)
+                group, size = [], 0
+            group.append(summary)
+            size += tokens
+        if group:
+            groups.append(group)
+        return groups
+
+    async def summarize(self, source, on_token=None, on_stage=None, openai_client=None) -> str:
+        """
+        Summarise a string or an iterable of lines; on_stage(name) is awaited at
+        each level. openai_client is passed through to stream_completion.
+        """
+        key = None
+        if isinstance(source, str) and RESPONSE_CACHE_ENABLED:
+            key = response_cache_key(_summary_messages(source), self.model, temperature=0.3, max_tokens=600)
+            cached = response_cache.get(key)
+            if cached is not None:
+                if on_token is not None:
+                    await on_token(cached)
+                return cached
+        if on_stage is not None:
+            await on_stage("map")
+        semaphore = asyncio.Semaphore(self.concurrency)
+        summaries = await self._map(source, semaphore, openai_client)
+        if not summaries:
+            return ""
+        level = 0
+        while True:
+            groups = self._groups(summaries)
+            if len(groups) == 1:
+                break
+            level += 1
+            if on_stage is not None:
+                await on_stage(f"reduce:{level}")
+            summaries = list(await asyncio.gather(*(
+                self._merge(group, semaphore, openai_client) for group in groups
+            )))
+        if on_stage is not None:
+            await on_stage("final")
+        summary = await stream_completion(
+            model=self.model,
+            messages=_summary_messages("\n\n".join(groups[0])),
+            on_token=on_token,
+            temperature=0.3,
+            openai_client=openai_client,
+            max_tokens=600
+        )
+        if key is not None and summary:
+            response_cache.set(key, summary)
+        return summary
+
+
+summarizer = HierarchicalSummarizer()
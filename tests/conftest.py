@@ -0,0 +1,13 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+
+# Service modules build API clients and on-disk caches at import time; keep
+# them offline and out of the working tree
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("SMART_MCP_CACHE_DIR", tempfile.mkdtemp(prefix="smart-mcp-tests-"))
+os.environ.setdefault("CALENDAR_STORE_ENABLED", "0")
+os.environ.setdefault("GMAIL_INDEX_ENABLED", "0")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,63 @@
+# tests/test_cache.py
+import json
+import sqlite3
+import time
+
+from service.cache import DiskCache
+
+
+def _cache(tmp_path, **kwargs):
+    return DiskCache("test", directory=str(tmp_path), **kwargs)
+
+
+def test_entries_expire_after_their_ttl(tmp_path):
+    cache = _cache(tmp_path, ttl=0.05)
+    cache.set("default", 1)
+    cache.set("longer", 2, ttl=60)
+    assert cache.get("default") == 1 and "default" in cache
+    time.sleep(0.06)
+    assert cache.get("default") is None and "default" not in cache
+    assert cache.get("longer") == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entries_are_evicted_by_count(tmp_path):
+    cache = _cache(tmp_path, max_entries=2)
+    cache.set("a", 1)
+    time.sleep(0.01)
+    cache.set("b", 2)
+    time.sleep(0.01)
+    cache.get("a")
+    time.sleep(0.01)
+    cache.set("c", 3)
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_least_recently_used_entries_are_evicted_by_size(tmp_path):
+    cache = _cache(tmp_path, max_bytes=250)
+    for key in "abc":
+        cache.set(key, "x" * 100)
+        time.sleep(0.01)
+    # Three 102-byte payloads don't fit in 250 bytes; the oldest goes
+    assert cache.get("a") is None
+    assert cache.size_bytes() == 204
+
+
+def test_size_column_is_added_and_filled_for_old_cache_files(tmp_path):
+    path = tmp_path / "test.sqlite3"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL, accessed_at REAL NOT NULL)")
+    for index, key in enumerate("ab"):
+        conn.execute("INSERT INTO entries VALUES (?, ?, NULL, ?)", (key, json.dumps("x" * 100), time.time() - 10 + index))
+    conn.commit()
+    conn.close()
+
+    cache = _cache(tmp_path, max_bytes=250)
+    assert cache.get("a") == "x" * 100
+    assert cache.size_bytes() == 204
+    # Old rows count towards the limit: b (now least recently used) makes room for c
+    cache.set("c", "y" * 100)
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 100 and cache.get("c") == "y" * 100
@@ -0,0 +1,145 @@
+# tests/test_calendar_store.py
+import datetime
+
+import pytest
+import pytz
+
+from service.calendar_store import CalendarEventStore
+
+UTC = pytz.utc
+
+
+class _HttpError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.resp = type("Response", (), {"status": status})()
+
+
+class _Request:
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self, http=None):
+        return self._fn(http)
+
+
+class FakeCalendar:
+    """events().list() with paging, sync tokens and an expirable token."""
+
+    def __init__(self, events, page_size=2):
+        self.events_by_id = {event["id"]: event for event in events}
+        self.changes = []
+        self.page_size = page_size
+        self.token_expired = False
+        self.calls = []
+        self.https = []
+
+    def events(self):
+        return self
+
+    def list(self, calendarId, singleEvents, pageToken=None, syncToken=None, **params):
+        def _list(http):
+            self.https.append(http)
+            self.calls.append("incremental" if syncToken else "full")
+            if syncToken and self.token_expired:
+                raise _HttpError(410)
+            items = list(self.changes) if syncToken else list(self.events_by_id.values())
+            start = int(pageToken or 0)
+            response = {"items": items[start:start + self.page_size]}
+            if start + self.page_size < len(items):
+                response["nextPageToken"] = str(start + self.page_size)
+            else:
+                response["nextSyncToken"] = f"token-{len(self.calls)}"
+            return response
+        return _Request(_list)
+
+
+def _at(hour, minute=0, day=1):
+    return datetime.datetime(2030, 1, day, hour, minute, tzinfo=UTC)
+
+
+def _event(event_id, start, end, **extra):
+    return {"id": event_id, "start": {"dateTime": start.isoformat()}, "end": {"dateTime": end.isoformat()}, **extra}
+
+
+@pytest.fixture
+def calendar():
+    return FakeCalendar([
+        _event("long", _at(8), _at(18)),
+        _event("standup", _at(9), _at(9, 15)),
+        _event("lunch", _at(12), _at(13)),
+        _event("focus", _at(14), _at(16), transparency="transparent"),
+        _event("tomorrow", _at(9, day=2), _at(10, day=2)),
+    ])
+
+
+@pytest.fixture
+def store(calendar):
+    store = CalendarEventStore(lambda: calendar, timezone="UTC", http_factory=object)
+    store.stop()  # no background thread in tests
+    return store
+
+
+def _ids(events):
+    return [event["id"] for event in events]
+
+
+def test_full_sync_pages_through_and_keeps_the_token(store, calendar):
+    store.sync()
+    assert len(store) == 5
+    assert calendar.calls == ["full", "full", "full"]
+    assert store.sync_token == "token-3"
+
+
+def test_overlapping_finds_events_that_started_earlier(store):
+    store.sync()
+    # "long" started hours before the window but is still running
+    assert _ids(store.overlapping(_at(12, 30), _at(12, 45))) == ["long", "lunch"]
+    # Touching boundaries don't overlap
+    assert _ids(store.overlapping(_at(9, 15), _at(12))) == ["long"]
+    assert _ids(store.overlapping(_at(14), _at(15))) == ["long"]
+    assert _ids(store.overlapping(_at(14), _at(15), include_transparent=True)) == ["long", "focus"]
+    assert _ids(store.overlapping(_at(19), _at(20))) == []
+
+
+def test_incremental_sync_updates_and_cancels(store, calendar):
+    store.sync()
+    calendar.changes = [
+        _event("lunch", _at(13), _at(14)),
+        {"id": "standup", "status": "cancelled"},
+        _event("review", _at(17), _at(17, 30)),
+    ]
+    store.sync()
+    assert calendar.calls[-2:] == ["incremental", "incremental"]
+    assert _ids(store.overlapping(_at(9), _at(9, 30))) == ["long"]
+    assert _ids(store.overlapping(_at(12), _at(13))) == ["long"]
+    assert _ids(store.overlapping(_at(13), _at(18))) == ["long", "lunch", "review"]
+
+
+def test_expired_sync_token_triggers_full_resync(store, calendar):
+    store.sync()
+    del calendar.events_by_id["lunch"]
+    calendar.token_expired = True
+    store.sync()
+    assert calendar.calls[3:] == ["incremental", "full", "full"]
+    assert "lunch" not in _ids(store.overlapping(_at(0), _at(23)))
+    assert len(store) == 4
+
+
+def test_failed_incremental_sync_keeps_the_token(store, calendar):
+    store.sync()
+    token = store.sync_token
+    calendar.changes = [_event("x", _at(1), _at(2))]
+
+    def _fail(*args, **kwargs):
+        raise _HttpError(500)
+
+    calendar.list = _fail
+    with pytest.raises(_HttpError):
+        store.sync()
+    assert store.sync_token == token
+
+
+def test_requests_use_the_store_http_not_the_shared_one(store, calendar):
+    store.sync()
+    assert calendar.https and all(http is not None for http in calendar.https)
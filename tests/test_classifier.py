@@ -0,0 +1,137 @@
+# tests/test_classifier.py
+import asyncio
+import math
+
+import pytest
+
+from service.classifier import FEATURES, MAX_FEATURE_COUNT, classify_locally, extract_features, score_domains
+from service.reasoning import ReasoningAgent
+
+
+def _features(query):
+    return dict(zip(FEATURES, extract_features(query.lower())))
+
+
+# ----- features and scoring -----
+
+def test_features_are_counted_in_one_pass():
+    features = _features("Calculate 12 + 7 and 3 * 4")
+    assert features["arithmetic"] == 2
+    assert features["math"] == 1
+    assert features["coding"] == 0
+
+
+def test_feature_counts_are_capped():
+    assert _features("north north north north north")["non_verbal"] == MAX_FEATURE_COUNT
+
+
+def test_greeting_only_counts_at_the_start():
+    assert _features("hello there")["greeting"] == 1
+    assert _features("say hello to bob")["greeting"] == 0
+
+
+def test_scores_are_a_distribution():
+    probabilities = score_domains(extract_features("implement binary search in python"))
+    assert math.isclose(sum(probabilities.values()), 1.0)
+    assert max(probabilities, key=probabilities.get) == "programming"
+
+
+@pytest.mark.parametrize("query, domain, detail", [
+    ("Implement binary search in python", "programming", ("coding_type", "algorithms")),
+    ("A is the father of B. B is the sister of C. How is C related to A?", "verbal_reasoning",
+     ("reasoning_subtype", "blood_relation")),
+    ("latest news about the vision pro", "factual", ("query_intent", "research")),
+    ("who created you", "factual", ("query_intent", "identity")),
+    ("Write a poem about rain", "creative", ("query_intent", "create")),
+])
+def test_classify_locally(query, domain, detail):
+    problem_type, confidence = classify_locally(query)
+    assert problem_type["domain"] == domain
+    assert problem_type[detail[0]] == detail[1]
+    assert problem_type["classified_by"] == "local"
+    assert problem_type["confidence_level"] == round(confidence, 3)
+
+
+# ----- calculation type order -----
+
+@pytest.mark.parametrize("query, calculation_type", [
+    # Stated with a % but not percentage problems
+    ("Compound interest on 5000 at 10% for 2 years", "compound_interest"),
+    ("Simple interest on 1000 at 5% for 3 years", "simple_interest"),
+    ("Calculate the profit if 200 costs 150 with 20% margin", "profit_loss"),
+    ("Calculate the mixture: 40 litres at 25% milk", "mixture"),
+    ("increase 50 by 10 percent", "percentage"),
+    ("Calculate 12 + 7", "basic_arithmetic"),
+])
+def test_specific_calculation_types_win_over_percentage(query, calculation_type):
+    problem_type, _ = classify_locally(query)
+    assert problem_type["domain"] == "mathematics"
+    assert problem_type["calculation_type"] == calculation_type
+
+
+# ----- threshold -----
+
+def _agent(threshold, llm):
+    agent = ReasoningAgent(local_classifier_threshold=threshold)
+    calls = []
+
+    async def _classify_with_llm(query):
+        calls.append(query)
+        return llm(query)
+
+    agent._classify_with_llm = _classify_with_llm
+    return agent, calls
+
+
+def _llm_label(query):
+    return {"domain": "llm", "complexity": "simple", "classified_by": "llm"}
+
+
+def test_confident_local_classification_skips_the_llm():
+    agent, calls = _agent(0.75, _llm_label)
+    problem_type = asyncio.run(agent._detect_problem_type("Implement binary search in python"))
+    assert calls == []
+    assert problem_type["classified_by"] == "local"
+    assert problem_type["complexity"]
+
+
+def test_ambiguous_query_goes_to_the_llm():
+    agent, calls = _agent(0.75, _llm_label)
+    problem_type = asyncio.run(agent._detect_problem_type("Fix this bug: IndexError in my loop"))
+    assert calls == ["Fix this bug: IndexError in my loop"]
+    assert problem_type["domain"] == "llm"
+
+
+def test_failed_llm_call_falls_back_to_the_local_label():
+    def _fail(query):
+        raise ValueError("not JSON")
+
+    agent, calls = _agent(float("inf"), _fail)
+    problem_type = asyncio.run(agent._detect_problem_type("Implement binary search in python"))
+    assert calls and problem_type["classified_by"] == "local"
+    assert problem_type["domain"] == "programming"
+
+
+# ----- agreement benchmark -----
+
+def test_benchmark_keeps_only_real_llm_labels(tmp_path, monkeypatch):
+    from benchmarks import classifier_agreement
+
+    async def _classify_with_llm(self, query):
+        if query == "broken":
+            raise ValueError("not JSON")
+        return {"domain": "factual", "classified_by": "llm"}
+
+    monkeypatch.setattr(ReasoningAgent, "_classify_with_llm", _classify_with_llm)
+    labels_path = tmp_path / "labels.jsonl"
+    # A fallback label written by an older run is relabelled, not trusted
+    labels_path.write_text('{"query": "stale", "label": {"domain": "general", "classified_by": "local"}}\n')
+
+    queries = ["who created you", "broken", "stale"]
+    labels, failed = asyncio.run(classifier_agreement._label_with_llm(queries, str(labels_path), 2))
+    assert failed == ["broken"]
+    assert set(labels) == {"who created you", "stale"}
+    assert all(label["classified_by"] == "llm" for label in labels.values())
+
+    report = classifier_agreement.evaluate(queries, labels, 0.75)
+    assert report["queries"] == 2 and report["unlabelled"] == 1
@@ -0,0 +1,63 @@
+# tests/test_credentials.py
+import pytest
+
+from service import credentials
+from service.credentials import CredentialManager, GoogleAuthorizationRequired
+
+MAIL = "https://mail.google.com/"
+CALENDAR = "https://www.googleapis.com/auth/calendar"
+
+
+class FakeCredentials:
+    def __init__(self, scopes, valid=True):
+        self.scopes = scopes
+        self.valid = valid
+        self.refresh_token = "refresh"
+        self.expiry = None
+
+    def has_scopes(self, scopes):
+        return set(scopes) <= set(self.scopes)
+
+
+class FakeFlow:
+    requested = None
+
+    @classmethod
+    def from_client_secrets_file(cls, path, scopes):
+        cls.requested = scopes
+        return cls()
+
+    def run_local_server(self, port, **kwargs):
+        return FakeCredentials(FakeFlow.requested)
+
+
+def _manager(tmp_path, mode, creds=None):
+    manager = CredentialManager(token_path=str(tmp_path / "token.pickle"), scopes=[MAIL, CALENDAR], auth_mode=mode)
+    manager.stop()
+    manager._creds = creds
+    return manager
+
+
+def test_headless_without_token_fails_clearly(tmp_path):
+    with pytest.raises(GoogleAuthorizationRequired, match="service.credentials --console"):
+        _manager(tmp_path, "none").get_credentials()
+
+
+def test_headless_with_old_single_scope_token_names_the_missing_scope(tmp_path):
+    manager = _manager(tmp_path, "none", FakeCredentials([MAIL]))
+    with pytest.raises(GoogleAuthorizationRequired, match="calendar"):
+        manager.get_credentials()
+
+
+def test_old_token_is_upgraded_with_the_scopes_it_already_had(tmp_path, monkeypatch):
+    monkeypatch.setattr(credentials, "InstalledAppFlow", FakeFlow)
+    manager = _manager(tmp_path, "browser", FakeCredentials(["openid", MAIL]))
+    creds = manager.get_credentials()
+    assert FakeFlow.requested == ["openid", MAIL, CALENDAR]
+    assert creds.has_scopes([MAIL, CALENDAR])
+    assert (tmp_path / "token.pickle").exists()
+
+
+def test_token_with_every_scope_is_used_as_is(tmp_path):
+    creds = FakeCredentials([MAIL, CALENDAR])
+    assert _manager(tmp_path, "none", creds).get_credentials() is creds
@@ -0,0 +1,195 @@
+# tests/test_executor.py
+import asyncio
+import threading
+
+from mcp.server.fastmcp import Context
+
+from service.executor import Coalescer, ToolExecutor
+from service.progress import ProgressReporter
+
+
+def _coalescer(calls):
+    coalesce = Coalescer(tools={"lookup", "search_with_progress"})
+
+    @coalesce
+    async def lookup(query: str, limit: int = 5):
+        calls.append((query, limit))
+        await asyncio.sleep(0.01)
+        return f"{query}:{limit}"
+
+    @coalesce
+    async def other(query: str):
+        calls.append(query)
+        return query
+
+    return coalesce, lookup, other
+
+
+def test_identical_concurrent_calls_share_one_run():
+    calls = []
+    coalesce, lookup, _ = _coalescer(calls)
+
+    async def main():
+        return await asyncio.gather(lookup("a"), lookup(" a "), lookup(query="a", limit=5), lookup("a", 6))
+
+    assert asyncio.run(main()) == ["a:5", "a:5", "a:5", "a:6"]
+    assert calls == [("a", 5), ("a", 6)]
+    stats = coalesce.stats()
+    assert stats["calls"] == {"lookup": 4}
+    assert stats["coalesced"] == {"lookup": 2}
+    assert stats["in_flight"] == 0
+
+
+def test_sequential_calls_are_not_coalesced():
+    calls = []
+    _, lookup, _ = _coalescer(calls)
+
+    async def main():
+        await lookup("a")
+        await lookup("a")
+
+    asyncio.run(main())
+    assert len(calls) == 2
+
+
+def test_tools_not_listed_are_left_alone():
+    calls = []
+    coalesce, _, other = _coalescer(calls)
+    assert other.__name__ == "other" and not hasattr(other, "__wrapped__")
+
+    async def main():
+        return await asyncio.gather(other("a"), other("a"))
+
+    assert asyncio.run(main()) == ["a", "a"]
+    assert calls == ["a", "a"]
+
+
+def test_side_effecting_tools_are_never_coalesced():
+    assert "gmail_send" not in Coalescer(tools={"gmail_send", "lookup"}).tools
+
+
+def test_errors_reach_every_waiter():
+    coalesce = Coalescer(tools={"broken"})
+
+    @coalesce
+    async def broken(query: str):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def main():
+        return await asyncio.gather(broken("a"), broken("a"), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    calls = []
+    _, lookup, _ = _coalescer(calls)
+
+    async def main():
+        leader = asyncio.ensure_future(lookup("a"))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(lookup("a"))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == "a:5"
+    assert calls == [("a", 5)]
+
+
+class _ClosedContext:
+    """A Context whose session has gone away."""
+
+    async def report_progress(self, progress, total=None, message=None):
+        raise RuntimeError("session closed")
+
+
+def test_leader_disconnect_does_not_fail_followers():
+    coalesce = Coalescer(tools={"search_with_progress"})
+
+    @coalesce
+    async def search_with_progress(query: str, ctx: Context):
+        progress = ProgressReporter(ctx)
+        await progress.stage("search")
+        await asyncio.sleep(0.01)
+        await progress.token("partial")
+        await progress.flush()
+        return f"answer for {query}"
+
+    async def main():
+        # The Context is left out of the key, so both calls share the leader's run
+        return await asyncio.gather(
+            search_with_progress("a", _ClosedContext()), search_with_progress("a", None)
+        )
+
+    assert asyncio.run(main()) == ["answer for a", "answer for a"]
+    assert coalesce.stats()["coalesced"] == {"search_with_progress": 1}
+
+
+
+# ----- ToolExecutor -----
+
+def _executor():
+    return ToolExecutor(max_workers=4, limits={"gmail": 1}, groups={"send": "gmail", "search": "gmail"})
+
+
+def test_cancelled_call_keeps_its_slot_until_the_thread_finishes():
+    executor = _executor()
+    release = threading.Event()
+    started = threading.Event()
+    calls = []
+
+    def send():
+        started.set()
+        release.wait(5)
+        calls.append("send")
+
+    def search():
+        calls.append("search")
+        return "results"
+
+    async def main():
+        first = asyncio.ensure_future(executor.run("send", send))
+        while not started.is_set():
+            await asyncio.sleep(0.005)
+        first.cancel()
+        try:
+            await first
+        except asyncio.CancelledError:
+            pass
+        second = asyncio.ensure_future(executor.run("search", search))
+        await asyncio.sleep(0.05)
+        # send's thread is still running, so search must still be queued
+        assert calls == [] and not second.done()
+        assert executor.queue_depth("search") == 1
+        release.set()
+        return await second
+
+    assert asyncio.run(main()) == "results"
+    assert calls == ["send", "search"]
+
+
+def test_call_cancelled_while_queued_never_runs():
+    executor = _executor()
+    release = threading.Event()
+    calls = []
+
+    def send(name):
+        release.wait(5)
+        calls.append(name)
+
+    async def main():
+        first = asyncio.ensure_future(executor.run("send", send, "first"))
+        queued = asyncio.ensure_future(executor.run("send", send, "queued"))
+        await asyncio.sleep(0.02)
+        queued.cancel()
+        await asyncio.sleep(0.01)
+        release.set()
+        await first
+        await asyncio.sleep(0.02)
+
+    asyncio.run(main())
+    assert calls == ["first"]
+    assert executor.queue_depth() == 0
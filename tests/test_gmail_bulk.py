@@ -0,0 +1,136 @@
+# tests/test_gmail_bulk.py
+import socket
+import time
+
+import httplib2
+import pytest
+
+from service.gmail_bulk import BulkSender, TokenBucket, classify_send_error, parse_recipients
+
+
+class _HttpError(Exception):
+    def __init__(self, status, reason=""):
+        super().__init__(f"HTTP {status} {reason}".strip())
+        self.resp = type("Response", (), {"status": status})()
+
+
+class _Request:
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self, http=None):
+        return self._fn()
+
+
+class FakeGmail:
+    """users().messages().send() failing with the queued errors before succeeding."""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.sent = []
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def send(self, userId, body):
+        def _send():
+            if self.errors:
+                raise self.errors.pop(0)
+            self.sent.append(body["raw"])
+            return {"id": f"id{len(self.sent)}"}
+        return _Request(_send)
+
+
+def _sender(errors=(), max_attempts=3):
+    gmail = FakeGmail(errors)
+    sender = BulkSender(service=gmail, http_factory=object, rate=1000, burst=1000, workers=2,
+                        max_attempts=max_attempts, backoff=0)
+    return sender, gmail
+
+
+# ----- TokenBucket -----
+
+def test_token_bucket_allows_a_burst_then_paces():
+    bucket = TokenBucket(rate=50, capacity=3)
+    start = time.monotonic()
+    for _ in range(3):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.01
+    bucket.acquire()
+    bucket.acquire()
+    # Two more tokens at 50/s take about 40ms
+    assert time.monotonic() - start >= 0.035
+
+
+# ----- retry classification -----
+
+@pytest.mark.parametrize("error, kind", [
+    (_HttpError(429), "retry"),
+    (_HttpError(403, "userRateLimitExceeded"), "retry"),
+    (_HttpError(403, "insufficientPermissions"), "failed"),
+    (_HttpError(400), "failed"),
+    (_HttpError(500), "unknown"),
+    (_HttpError(503), "unknown"),
+    (httplib2.ServerNotFoundError("no DNS"), "retry"),
+    (ConnectionRefusedError(), "retry"),
+    (socket.gaierror(), "retry"),
+    (ConnectionResetError(), "unknown"),
+    (socket.timeout(), "unknown"),
+    (ValueError("bad"), "failed"),
+])
+def test_classify_send_error(error, kind):
+    assert classify_send_error(error) == kind
+
+
+def test_rate_limited_send_is_retried():
+    sender, gmail = _sender([_HttpError(429), _HttpError(403, "rateLimitExceeded")])
+    response, attempts = sender.send_one("raw")
+    assert attempts == 3 and response == {"id": "id1"}
+    assert gmail.sent == ["raw"]
+
+
+def test_server_error_is_not_retried_and_reported_unknown():
+    sender, gmail = _sender([_HttpError(503)])
+    summary = sender.send_bulk("Hi", "Body", parse_recipients(["a@example.com"]))
+    assert summary["unknown"] == 1
+    assert summary["results"][0]["attempts"] == 1
+    assert gmail.errors == []  # the one error was consumed, no second attempt
+
+
+def test_exhausted_retries_are_failed():
+    sender, _ = _sender([_HttpError(429)] * 3)
+    summary = sender.send_bulk("Hi", "Body", parse_recipients(["a@example.com"]))
+    assert summary["results"][0]["status"] == "failed"
+    assert summary["results"][0]["attempts"] == 3
+
+
+# ----- recipients -----
+
+def test_parse_recipients_merges_list_and_csv():
+    rows = parse_recipients(["a@example.com", {"email": " b@example.com ", "name": "Bo"}],
+                            "To,Name\nc@example.com,Cy\n")
+    assert [row["email"] for row in rows] == ["a@example.com", "b@example.com", "c@example.com"]
+    assert rows[2]["name"] == "Cy"
+
+
+def test_invalid_and_duplicate_addresses_are_skipped():
+    sender, gmail = _sender()
+    recipients = parse_recipients(["a@example.com", "not-an-email", "A@Example.com", "b@example.com"])
+    summary = sender.send_bulk("Hi {email}", "Body", recipients)
+    assert [result["status"] for result in summary["results"]] == ["sent", "skipped", "skipped", "sent"]
+    assert summary["results"][1]["error"] == "invalid email address"
+    assert summary["results"][2]["error"] == "duplicate recipient"
+    assert len(gmail.sent) == 2
+
+
+def test_template_errors_and_dry_runs_send_nothing():
+    sender, gmail = _sender()
+    recipients = parse_recipients([{"email": "a@example.com", "name": "Al"}, "b@example.com"])
+    summary = sender.send_bulk("Hi {name}", "Body", recipients, dry_run=True)
+    assert summary["results"][0] == {"to": "a@example.com", "status": "rendered", "subject": "Hi Al", "body": "Body"}
+    assert summary["results"][1]["status"] == "failed"
+    assert "template error" in summary["results"][1]["error"]
+    assert gmail.sent == []
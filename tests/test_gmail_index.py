@@ -0,0 +1,226 @@
+# tests/test_gmail_index.py
+import time
+
+import pytest
+
+from service.gmail_index import GmailIndex, UnsupportedQuery, translate_query
+
+
+class _Request:
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self, **kwargs):
+        return self._fn()
+
+
+class _Batch:
+    def __init__(self, service, callback):
+        self._service = service
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request, request_id=None):
+        self._requests.append((request_id, request))
+
+    def execute(self):
+        self._service.batches += 1
+        for request_id, request in self._requests:
+            try:
+                self._callback(request_id, request.execute(), None)
+            except Exception as e:
+                self._callback(request_id, None, e)
+
+
+class _HttpError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.resp = type("Response", (), {"status": status})()
+
+
+class FakeGmail:
+    """Just enough of the Gmail API for GmailIndex: profile, list, batched get and history."""
+
+    def __init__(self, messages):
+        self.mailbox = {message["id"]: message for message in messages}
+        self.history_id = 100
+        self.history_records = []
+        self.history_expired = False
+        self.batches = 0
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return _Messages(self)
+
+    def history(self):
+        return _History(self)
+
+    def getProfile(self, userId):
+        return _Request(lambda: {"historyId": str(self.history_id)})
+
+    def new_batch_http_request(self, callback=None):
+        return _Batch(self, callback)
+
+
+class _Messages:
+    def __init__(self, service):
+        self._service = service
+
+    def list(self, userId, maxResults=100, pageToken=None, fields=None, q=None):
+        ids = sorted(self._service.mailbox, key=lambda i: -self._service.mailbox[i]["ts"])
+        start = int(pageToken or 0)
+        page = ids[start:start + maxResults]
+        response = {"messages": [{"id": message_id} for message_id in page]}
+        if start + len(page) < len(ids):
+            response["nextPageToken"] = str(start + len(page))
+        return _Request(lambda: response)
+
+    def get(self, userId, id, **kwargs):
+        def _get():
+            message = self._service.mailbox[id]
+            return {
+                "id": id,
+                "threadId": "t" + id,
+                "snippet": message["snippet"],
+                "labelIds": message.get("labels", ["INBOX"]),
+                "internalDate": str(message["ts"]),
+                "payload": {"headers": [
+                    {"name": "From", "value": message["from"]},
+                    {"name": "To", "value": "me@example.com"},
+                    {"name": "Subject", "value": message["subject"]},
+                ]},
+            }
+        return _Request(_get)
+
+
+class _History:
+    def __init__(self, service):
+        self._service = service
+
+    def list(self, userId, startHistoryId, historyTypes=None, pageToken=None, maxResults=500):
+        def _list():
+            if self._service.history_expired:
+                raise _HttpError(404)
+            return {"history": self._service.history_records, "historyId": str(self._service.history_id)}
+        return _Request(_list)
+
+
+def _message(message_id, subject, sender="alice@example.com", labels=None, ts=None):
+    return {"id": message_id, "subject": subject, "from": sender, "snippet": f"About {subject.lower()}",
+            "labels": labels or ["INBOX"], "ts": ts or int(time.time() * 1000)}
+
+
+@pytest.fixture
+def gmail():
+    now = int(time.time() * 1000)
+    return FakeGmail([
+        _message("m1", "Quarterly report", ts=now - 3000),
+        _message("m2", "Lunch plans", sender="bob@example.com", labels=["INBOX", "UNREAD"], ts=now - 2000),
+        _message("m3", "Invoice overdue", labels=["SPAM"], ts=now - 1000),
+    ])
+
+
+@pytest.fixture
+def index(gmail, tmp_path):
+    return GmailIndex(path=str(tmp_path / "index.sqlite3"), service=gmail, sync_interval=0)
+
+
+# ----- translate_query -----
+
+def test_translate_plain_terms_and_fields():
+    fts_match, where, params = translate_query('from:alice subject:"quarterly report" budget')
+    assert fts_match == 'sender : "alice" AND subject : "quarterly report" AND "budget"'
+    # Spam and trash are excluded unless asked for
+    assert params[-2:] == ["% SPAM %", "% TRASH %"]
+
+
+def test_translate_labels_and_read_state():
+    _, where, params = translate_query("is:unread in:inbox")
+    assert "% UNREAD %" in params and "% INBOX %" in params
+    _, where, params = translate_query("is:read")
+    assert "labels NOT LIKE ?" in where and "% UNREAD %" in params
+
+
+def test_translate_spam_keeps_spam():
+    _, _, params = translate_query("in:spam")
+    assert "% SPAM %" in params
+    assert params.count("% SPAM %") == 1
+
+
+def test_translate_dates():
+    _, where, params = translate_query("after:2024/01/15 newer_than:2d")
+    assert "internal_date >= ?" in where
+    assert all(isinstance(param, int) for param in params[:2])
+
+
+@pytest.mark.parametrize("query", [
+    "-from:alice", "has:attachment", "a OR b", "(a b)", "label:my-project", "filename:pdf",
+])
+def test_translate_rejects_unsupported(query):
+    with pytest.raises(UnsupportedQuery):
+        translate_query(query)
+
+
+# ----- GmailIndex -----
+
+def test_full_sync_and_search(index, gmail):
+    index.sync()
+    assert len(index) == 3
+    assert index.history_id == "100"
+    assert index.complete
+    assert [m["id"] for m in index.search("report")] == ["m1"]
+    # Newest first; spam excluded
+    assert [m["id"] for m in index.search("in:inbox")] == ["m2", "m1"]
+    assert [m["id"] for m in index.search("is:unread")] == ["m2"]
+    assert [m["id"] for m in index.search("in:spam")] == ["m3"]
+
+
+def test_incremental_sync_applies_adds_deletes_and_labels(index, gmail):
+    index.sync()
+    gmail.mailbox["m4"] = _message("m4", "New offer")
+    gmail.history_id = 120
+    gmail.history_records = [
+        {"messagesAdded": [{"message": {"id": "m4"}}]},
+        {"messagesDeleted": [{"message": {"id": "m1"}}]},
+        {"labelsRemoved": [{"message": {"id": "m2", "labelIds": ["INBOX"]}}]},
+    ]
+
+    assert index.incremental_sync() == 3
+    assert index.history_id == "120"
+    assert {m["id"] for m in index.search("in:inbox", max_results=10)} == {"m2", "m4"}
+    assert index.search("is:unread", max_results=10) == []
+    assert index.search("report", max_results=10) == []
+
+
+def test_incremental_sync_add_then_delete_is_a_delete(index, gmail):
+    index.sync()
+    gmail.history_records = [
+        {"messagesAdded": [{"message": {"id": "m9"}}]},
+        {"messagesDeleted": [{"message": {"id": "m9"}}]},
+    ]
+    batches = gmail.batches
+    index.incremental_sync()
+    # Nothing left to fetch
+    assert gmail.batches == batches
+    assert len(index) == 3
+
+
+def test_expired_history_id_rebuilds(index, gmail):
+    index.sync()
+    del gmail.mailbox["m1"]
+    gmail.history_expired = True
+    gmail.history_id = 500
+    index.sync(force=True)
+    assert len(index) == 2
+    assert index.history_id == "500"
+
+
+def test_partial_index_falls_back_when_results_may_be_missing(gmail, tmp_path):
+    index = GmailIndex(path=str(tmp_path / "partial.sqlite3"), service=gmail, sync_interval=0, max_messages=2)
+    index.sync()
+    assert not index.complete
+    assert len(index.search("in:inbox", max_results=1)) == 1
+    with pytest.raises(UnsupportedQuery):
+        index.search("report", max_results=10)
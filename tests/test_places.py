@@ -0,0 +1,20 @@
+# tests/test_places.py
+import pytest
+
+from service import places
+from service.places import PLACE_MODES, chat_with_places_assistant
+
+
+def test_modes():
+    assert set(PLACE_MODES) == {"fast", "guide"}
+    assert set(places.place_answer_caches) == set(PLACE_MODES)
+
+
+@pytest.mark.parametrize("mode", ["slow", "Guide", "", None])
+def test_unknown_mode_is_rejected_before_searching(mode, monkeypatch):
+    def _search(query):
+        raise AssertionError("searched with an invalid mode")
+
+    monkeypatch.setattr(places, "search_places", _search)
+    with pytest.raises(ValueError, match="'fast' or 'guide'"):
+        chat_with_places_assistant("cafes in Juhu", client=None, mode=mode)
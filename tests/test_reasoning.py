@@ -0,0 +1,140 @@
+# tests/test_reasoning.py
+import asyncio
+
+import pytest
+
+from service import reasoning
+from service.classifier import classify_locally
+from service.reasoning import GENERIC_FRAMEWORK_SIGNATURE, ReasoningAgent, framework_cache, framework_cache_key
+
+DIRECT = classify_locally("increase 50 by 10 percent")[0]
+RESEARCH = classify_locally("latest news about the vision pro")[0]
+SPECIFIC_KEY = framework_cache_key(*ReasoningAgent()._framework_signature(DIRECT))
+
+
+class SpeculativeAgent(ReasoningAgent):
+    """ReasoningAgent with every LLM and search call replaced by a recorded fake."""
+
+    def __init__(self, problem_info, framework_delay=0.0, search_delay=0.05):
+        super().__init__(speculative=True, local_classifier_threshold=float("inf"))
+        self.problem_info = problem_info
+        self.framework_delay = framework_delay
+        self.search_delay = search_delay
+        self.events = []
+
+    async def _detect_problem_type(self, query):
+        await asyncio.sleep(0.01)
+        return dict(self.problem_info)
+
+    async def _get_solving_framework(self, *signature):
+        self.events.append(("framework", signature))
+        await asyncio.sleep(self.framework_delay)
+        framework = f"framework for {signature[-1]}"
+        framework_cache.set(framework_cache_key(*signature), framework)
+        return framework
+
+    async def _search(self, query):
+        self.events.append("search started")
+        try:
+            await asyncio.sleep(self.search_delay)
+        except asyncio.CancelledError:
+            self.events.append("search cancelled")
+            raise
+        return "summary", ["https://example.com"]
+
+    async def _solve_directly(self, query, problem_info, solving_framework=None, progress=None):
+        return {"framework": solving_framework}
+
+    async def _research_and_answer(self, query, problem_info, sources_used, search_task=None, progress=None):
+        summary, sources = await search_task
+        return {"summary": summary, "sources": sources}
+
+
+@pytest.fixture(autouse=True)
+def empty_framework_cache():
+    framework_cache.clear()
+    yield
+    framework_cache.clear()
+
+
+def _run(agent):
+    async def main():
+        reasoning.perform_search, original = agent._search, reasoning.perform_search
+        try:
+            return await agent._process_speculatively("query", [])
+        finally:
+            reasoning.perform_search = original
+    return asyncio.run(main())
+
+
+def test_direct_solve_uses_the_type_specific_framework_and_cancels_the_search():
+    agent = SpeculativeAgent(DIRECT)
+    _, result, plan = _run(agent)
+    assert result == {"framework": "framework for mathematics"}
+    assert [framework_cache_key(*event[1]) for event in agent.events if event[0] == "framework"] == [SPECIFIC_KEY]
+    assert "search cancelled" in agent.events
+    assert plan.context["speculative"]
+
+
+def test_research_reuses_the_speculative_search_and_skips_the_framework():
+    agent = SpeculativeAgent(RESEARCH)
+    _, result, _ = _run(agent)
+    assert result == {"summary": "summary", "sources": ["https://example.com"]}
+    assert agent.events == ["search started"]
+
+
+def test_slow_framework_falls_back_to_the_cached_generic_one(monkeypatch):
+    monkeypatch.setattr(reasoning, "FRAMEWORK_FALLBACK_TIMEOUT", 0.02)
+    framework_cache.set(framework_cache_key(*GENERIC_FRAMEWORK_SIGNATURE), "generic framework")
+    agent = SpeculativeAgent(DIRECT, framework_delay=0.1)
+
+    async def main():
+        reasoning.perform_search, original = agent._search, reasoning.perform_search
+        try:
+            result = await agent._process_speculatively("query", [])
+            # The specific framework is still generated and cached for next time
+            await asyncio.sleep(0.15)
+            return result
+        finally:
+            reasoning.perform_search = original
+
+    _, result, _ = asyncio.run(main())
+    assert result == {"framework": "generic framework"}
+    assert framework_cache.get(SPECIFIC_KEY) == "framework for mathematics"
+
+
+def test_slow_framework_without_a_cached_generic_one_is_awaited(monkeypatch):
+    monkeypatch.setattr(reasoning, "FRAMEWORK_FALLBACK_TIMEOUT", 0.02)
+    agent = SpeculativeAgent(DIRECT, framework_delay=0.05)
+    _, result, _ = _run(agent)
+    assert result == {"framework": "framework for mathematics"}
+
+
+def test_failed_classification_cancels_the_search():
+    agent = SpeculativeAgent(DIRECT)
+
+    async def _fail(query):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("classifier down")
+
+    agent._detect_problem_type = _fail
+    with pytest.raises(RuntimeError):
+        _run(agent)
+    assert agent.events == ["search started", "search cancelled"]
+
+
+# ----- prewarm -----
+
+def test_prewarm_counts_only_stored_frameworks():
+    cached = ("verbal", "analogy", None, None, "verbal_reasoning")
+    framework_cache.set(framework_cache_key(*cached), "already here")
+
+    class FlakyAgent(ReasoningAgent):
+        async def _get_solving_framework(self, *signature):
+            if signature[-1] == "programming":
+                return "fallback framework, not cached"
+            framework_cache.set(framework_cache_key(*signature), "framework")
+            return "framework"
+
+    signatures = [GENERIC_FRAMEWORK_SIGNATURE, cached, (None, None, None, "algorithms", "programming")]
+    assert asyncio.run(FlakyAgent().prewarm_framework_cache(signatures)) == 1
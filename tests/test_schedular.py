@@ -0,0 +1,43 @@
+# tests/test_schedular.py
+import datetime
+
+import pytz
+
+from service.schedular import free_gaps, merge_busy
+
+
+def _at(hour, minute=0):
+    return datetime.datetime(2030, 1, 1, hour, minute, tzinfo=pytz.utc)
+
+
+def test_merge_busy_merges_overlaps_across_calendars():
+    busy = [
+        (_at(9), _at(10)),      # alice
+        (_at(9, 30), _at(11)),  # bob, overlaps alice
+        (_at(13), _at(14)),
+        (_at(13, 15), _at(13, 45)),  # nested
+    ]
+    assert merge_busy(busy) == [(_at(9), _at(11)), (_at(13), _at(14))]
+
+
+def test_merge_busy_joins_back_to_back_blocks_and_drops_empty_ones():
+    busy = [(_at(10), _at(11)), (_at(11), _at(12)), (_at(15), _at(15)), (_at(16), _at(15))]
+    assert merge_busy(busy) == [(_at(10), _at(12))]
+
+
+def test_merge_busy_is_order_independent():
+    busy = [(_at(14), _at(15)), (_at(8), _at(9)), (_at(8, 30), _at(14, 30))]
+    assert merge_busy(busy) == [(_at(8), _at(15))]
+    assert merge_busy([]) == []
+
+
+def test_free_gaps_inside_window():
+    busy = merge_busy([(_at(9), _at(10)), (_at(12), _at(13))])
+    assert free_gaps(busy, _at(8), _at(18)) == [(_at(8), _at(9)), (_at(10), _at(12)), (_at(13), _at(18))]
+
+
+def test_free_gaps_clips_busy_blocks_at_window_edges():
+    busy = merge_busy([(_at(7), _at(9)), (_at(17), _at(20))])
+    assert free_gaps(busy, _at(8), _at(18)) == [(_at(9), _at(17))]
+    assert free_gaps(busy, _at(7, 30), _at(8, 30)) == []
+    assert free_gaps([], _at(8), _at(9)) == [(_at(8), _at(9))]
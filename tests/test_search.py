@@ -0,0 +1,122 @@
+# tests/test_search.py
+import asyncio
+
+import pytest
+
+from service import search, services
+from service.search import format_search_response, normalize_query, search_cache, web_search
+
+RAW_ANSWER = (
+    "The Vision Pro launched in [February 2024](https://apple.com/news?utm_source=openai) at $3,499 "
+    "(see https://example.com/price) , with wider release [later](https://example.com/later)."
+)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    search_cache.clear()
+    yield
+    search_cache.clear()
+
+
+@pytest.fixture
+def fake_search(monkeypatch):
+    """Replace the search model with one streaming RAW_ANSWER a few characters at a time."""
+    calls = []
+
+    async def _stream_completion(model, messages, on_token=None, **params):
+        calls.append(messages[-1]["content"])
+        for start in range(0, len(RAW_ANSWER), 7):
+            await asyncio.sleep(0.001)
+            if on_token is not None:
+                await on_token(RAW_ANSWER[start:start + 7])
+        return RAW_ANSWER
+
+    monkeypatch.setattr(search, "stream_completion", _stream_completion)
+    return calls
+
+
+# ----- normalisation -----
+
+@pytest.mark.parametrize("query", [
+    "Vision Pro news", "  vision   pro NEWS?", "vision pro news!!", "ｖｉｓｉｏｎ pro news.",
+])
+def test_normalize_query(query):
+    assert normalize_query(query) == "vision pro news"
+
+
+def test_normalized_queries_share_a_cache_entry(fake_search):
+    asyncio.run(web_search("Vision Pro news"))
+    asyncio.run(web_search("  vision pro NEWS?"))
+    assert fake_search == ["Vision Pro news"]
+
+
+# ----- streaming -----
+
+def test_streamed_chunks_add_up_to_the_formatted_answer(fake_search):
+    chunks = []
+
+    async def _collect(chunk):
+        chunks.append(chunk)
+
+    answer = asyncio.run(services.realtime_web_search_stream("vision pro launch", _collect))
+    summary, sources = format_search_response(RAW_ANSWER)
+    assert "".join(chunks) == answer
+    assert answer.startswith(summary) and "](" not in answer and "utm_source" not in answer
+    assert answer.endswith("Sources:\n- https://apple.com/news\n- https://example.com/later")
+    assert len(chunks) > 3
+
+
+def test_cached_answer_streams_the_same_text(fake_search):
+    first, second = [], []
+
+    async def _run():
+        await services.realtime_web_search_stream("vision pro launch", lambda c: _append(first, c))
+        return await services.realtime_web_search_stream("vision pro launch", lambda c: _append(second, c))
+
+    async def _append(chunks, chunk):
+        chunks.append(chunk)
+
+    answer = asyncio.run(_run())
+    assert "".join(first) == "".join(second) == answer
+    assert len(fake_search) == 1
+
+
+# ----- in-flight sharing and cancellation -----
+
+def test_concurrent_callers_share_one_search(fake_search):
+    async def main():
+        return await asyncio.gather(web_search("vision pro"), web_search("Vision Pro?"))
+
+    first, second = asyncio.run(main())
+    assert first == second
+    assert len(fake_search) == 1
+    assert not search._pending
+
+
+def test_search_survives_one_caller_leaving(fake_search):
+    async def main():
+        leaving = asyncio.ensure_future(web_search("vision pro"))
+        staying = asyncio.ensure_future(web_search("vision pro"))
+        await asyncio.sleep(0.005)
+        leaving.cancel()
+        return await staying
+
+    summary, _ = asyncio.run(main())
+    assert summary == format_search_response(RAW_ANSWER)[0]
+    assert len(fake_search) == 1
+
+
+def test_search_is_cancelled_when_every_caller_leaves(fake_search):
+    async def main():
+        callers = [asyncio.ensure_future(web_search("vision pro")) for _ in range(2)]
+        await asyncio.sleep(0.005)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.sleep(0.05)
+        # A new caller starts a fresh search rather than joining the cancelled one
+        return await web_search("vision pro")
+
+    asyncio.run(main())
+    assert len(fake_search) == 2
+    assert not search._pending
@@ -0,0 +1,70 @@
+# tests/test_semantic_cache.py
+import time
+
+import pytest
+
+from service import semantic_cache
+from service.semantic_cache import SemanticCache
+
+
+@pytest.fixture(autouse=True)
+def enabled(monkeypatch):
+    monkeypatch.setattr(semantic_cache, "SEMANTIC_CACHE_ENABLED", True)
+
+
+def _cache(tmp_path, name="test", **kwargs):
+    return SemanticCache(name, directory=str(tmp_path), **kwargs)
+
+
+def test_disabled_cache_stores_nothing(tmp_path, monkeypatch):
+    monkeypatch.setattr(semantic_cache, "SEMANTIC_CACHE_ENABLED", False)
+    cache = _cache(tmp_path)
+    cache.set("weather in pune", "sunny")
+    assert len(cache) == 0
+    assert cache.get("weather in pune") is None
+
+
+def test_rewording_is_a_hit(tmp_path):
+    cache = _cache(tmp_path, threshold=0.82)
+    cache.set("best cafes in Juhu", "answer")
+    assert cache.get("Cafés in juhu?") == "answer"
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.parametrize("name, cached, asked", [
+    ("places_guide", "restaurants near X", "vegan restaurants near X"),
+    ("web_search", "cheap hotels", "hotels with wifi"),
+    ("general_query", "is X safe", "is X not safe"),
+    ("places_fast", "is X safe", "is X not safe"),
+    ("web_search", "celsius to fahrenheit", "fahrenheit to celsius"),
+    ("web_search", "iphone 15 price", "iphone 16 price"),
+])
+def test_different_questions_miss(tmp_path, name, cached, asked):
+    cache = _cache(tmp_path, name)
+    cache.set(cached, "answer")
+    assert cache.get(asked) is None
+    assert cache.get(cached) == "answer"
+
+
+def test_expired_entries_miss(tmp_path):
+    cache = _cache(tmp_path)
+    cache.set("weather in pune", "sunny", ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("weather in pune") is None
+
+
+def test_survives_restart(tmp_path):
+    _cache(tmp_path).set("weather in pune", "sunny")
+    assert _cache(tmp_path).get("weather in pune") == "sunny"
+
+
+def test_full_cache_overwrites_least_recently_used(tmp_path):
+    cache = _cache(tmp_path, capacity=2)
+    cache.set("weather in pune", "pune")
+    cache.set("weather in goa", "goa")
+    cache.get("weather in pune")
+    cache.set("weather in delhi", "delhi")
+    assert len(cache) == 2
+    assert cache.get("weather in goa") is None
+    assert cache.get("weather in pune") == "pune"
+    assert cache.get("weather in delhi") == "delhi"
@@ -0,0 +1,131 @@
+# tests/test_services.py
+import asyncio
+
+import pytest
+
+from service import services
+from service.services import response_cache, stream_completion
+
+
+class _Chunk:
+    def __init__(self, text):
+        delta = type("Delta", (), {"content": text})()
+        self.choices = [type("Choice", (), {"delta": delta})()]
+
+
+class FakeAsyncOpenAI:
+    """chat.completions.create(stream=True) yielding the given deltas with a pause between them."""
+
+    def __init__(self, deltas, pause=0.01):
+        self.deltas = deltas
+        self.pause = pause
+        self.calls = 0
+        self.chat = self
+        self.completions = self
+
+    async def create(self, model, messages, stream, **params):
+        self.calls += 1
+
+        async def _chunks():
+            for delta in self.deltas:
+                await asyncio.sleep(self.pause)
+                yield _Chunk(delta)
+        return _chunks()
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    response_cache.clear()
+    yield
+    response_cache.clear()
+
+
+def _messages(text="hello"):
+    return [{"role": "user", "content": text}]
+
+
+def test_concurrent_misses_share_one_stream():
+    client = FakeAsyncOpenAI(["Hel", "lo", " there"])
+    leader_tokens, follower_tokens = [], []
+
+    async def _collect(tokens, token):
+        tokens.append(token)
+
+    async def main():
+        return await asyncio.gather(
+            stream_completion("m", _messages(), lambda t: _collect(leader_tokens, t), openai_client=client),
+            stream_completion("m", _messages(), lambda t: _collect(follower_tokens, t), openai_client=client),
+        )
+
+    assert asyncio.run(main()) == ["Hello there", "Hello there"]
+    assert client.calls == 1
+    assert leader_tokens == ["Hel", "lo", " there"]
+    assert follower_tokens == ["Hello there"]
+    assert not services._streams
+
+
+def test_answer_is_cached_and_replayed():
+    client = FakeAsyncOpenAI(["cached answer"])
+    assert asyncio.run(stream_completion("m", _messages(), openai_client=client)) == "cached answer"
+    tokens = []
+
+    async def _collect(token):
+        tokens.append(token)
+
+    assert asyncio.run(stream_completion("m", _messages(), _collect, openai_client=client)) == "cached answer"
+    assert client.calls == 1
+    assert tokens == ["cached answer"]
+
+
+def test_empty_answer_is_not_cached():
+    client = FakeAsyncOpenAI(["  "])
+    assert asyncio.run(stream_completion("m", _messages(), openai_client=client)) == ""
+    assert asyncio.run(stream_completion("m", _messages(), openai_client=client)) == ""
+    assert client.calls == 2
+
+
+def test_stream_survives_the_leader_leaving():
+    client = FakeAsyncOpenAI(["a", "b", "c"], pause=0.02)
+
+    async def main():
+        leader = asyncio.ensure_future(stream_completion("m", _messages(), openai_client=client))
+        follower = asyncio.ensure_future(stream_completion("m", _messages(), openai_client=client))
+        await asyncio.sleep(0.03)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == "abc"
+    assert client.calls == 1
+
+
+def test_stream_is_cancelled_when_every_caller_leaves():
+    client = FakeAsyncOpenAI(["a", "b", "c"], pause=0.02)
+
+    async def main():
+        callers = [asyncio.ensure_future(stream_completion("m", _messages(), openai_client=client)) for _ in range(2)]
+        await asyncio.sleep(0.03)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    assert not services._streams
+    assert response_cache.get(services.response_cache_key(_messages(), "m")) is None
+
+
+def test_failing_callback_only_fails_its_caller():
+    client = FakeAsyncOpenAI(["a", "b"])
+
+    async def _fail(token):
+        raise RuntimeError("client went away")
+
+    async def main():
+        return await asyncio.gather(
+            stream_completion("m", _messages(), _fail, openai_client=client),
+            stream_completion("m", _messages(), openai_client=client),
+            return_exceptions=True,
+        )
+
+    leader, follower = asyncio.run(main())
+    assert isinstance(leader, RuntimeError)
+    assert follower == "ab"
@@ -0,0 +1,157 @@
+# tests/test_summarizer.py
+import asyncio
+
+import pytest
+
+from service import services, summarizer as summarizer_module
+from service.services import _summary_messages, response_cache, response_cache_key
+from service.summarizer import (
+    HierarchicalSummarizer, count_tokens, exceeds_tokens, iter_chunks, iter_paragraphs,
+)
+
+
+def _tokens(chunk):
+    """Tokens in a chunk's pieces, which is what the limit applies to (separators aren't counted)."""
+    return sum(count_tokens(piece) for piece in chunk.split("\n\n"))
+
+
+def _paragraph(index, sentences=3):
+    return " ".join(f"Paragraph {index} sentence {n} has a few words in it." for n in range(sentences))
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    response_cache.clear()
+    yield
+    response_cache.clear()
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """stream_completion replaced by a recorder that 'summarises' to a short tag."""
+    calls = []
+
+    async def _stream_completion(model, messages, on_token=None, **params):
+        calls.append(messages[-1]["content"])
+        summary = f"summary{len(calls)}"
+        if on_token is not None:
+            await on_token(summary)
+        return summary
+
+    monkeypatch.setattr(summarizer_module, "stream_completion", _stream_completion)
+    return calls
+
+
+# ----- chunking -----
+
+def test_paragraphs_from_a_string_and_from_lines():
+    text = "first line\nstill first\n\n\n  second  \n\nthird"
+    assert list(iter_paragraphs(text)) == ["first line\nstill first", "second", "third"]
+    assert list(iter_paragraphs(line + "\n" for line in text.split("\n"))) == list(iter_paragraphs(text))
+
+
+def test_chunks_pack_paragraphs_in_order_under_the_limit():
+    text = "\n\n".join(_paragraph(i) for i in range(20))
+    limit = count_tokens(_paragraph(0)) * 3
+    chunks = list(iter_chunks(text, limit))
+    assert len(chunks) == 7
+    assert all(_tokens(chunk) <= limit for chunk in chunks)
+    assert "\n\n".join(chunks) == text
+
+
+def test_oversized_paragraph_is_split_on_sentences_then_tokens():
+    long_paragraph = _paragraph(0, sentences=10)
+    limit = count_tokens("Paragraph 0 sentence 0 has a few words in it.") + 2
+    chunks = list(iter_chunks(long_paragraph, limit))
+    # One sentence per chunk
+    assert len(chunks) == 10
+    assert all(_tokens(chunk) <= limit for chunk in chunks)
+
+    unbroken = "x" * 400
+    pieces = list(iter_chunks(unbroken, 20))
+    assert "".join(pieces) == unbroken
+    assert all(count_tokens(piece) <= 20 for piece in pieces)
+
+
+def test_tokens_are_counted_per_paragraph(monkeypatch):
+    counted = []
+
+    def _count(text):
+        counted.append(text)
+        return count_tokens(text)
+
+    monkeypatch.setattr(summarizer_module, "count_tokens", _count)
+    paragraphs = [_paragraph(i) for i in range(50)]
+    text = "\n\n".join(paragraphs)
+    list(iter_chunks(text, 200))
+    assert counted == paragraphs
+
+    counted.clear()
+    assert exceeds_tokens(text, 100)
+    # Stops as soon as the limit is passed
+    assert len(counted) < len(paragraphs) and text not in counted
+    assert not exceeds_tokens("short", 100)
+
+
+# ----- reduce grouping -----
+
+def test_groups_are_consecutive_and_bounded():
+    summarizer = HierarchicalSummarizer(reduce_tokens=count_tokens(_paragraph(0)) * 2)
+    summaries = [_paragraph(i) for i in range(7)]
+    groups = summarizer._groups(summaries)
+    assert [summary for group in groups for summary in group] == summaries
+    assert all(len(group) == 2 for group in groups[:-1])
+    assert all(sum(count_tokens(summary) for summary in group) <= summarizer.reduce_tokens for group in groups)
+
+
+def test_groups_never_leave_a_summary_alone_when_oversized():
+    summarizer = HierarchicalSummarizer(reduce_tokens=1)
+    groups = summarizer._groups(["a b c", "d e f", "g h i"])
+    # Each merge still combines at least two summaries, so the tree always shrinks
+    assert groups == [["a b c", "d e f"], ["g h i"]]
+
+
+def test_summarize_reduces_until_one_group(fake_llm):
+    summarizer = HierarchicalSummarizer(chunk_tokens=count_tokens(_paragraph(0)), reduce_tokens=1, concurrency=3)
+    stages = []
+
+    async def _stage(name):
+        stages.append(name)
+
+    text = "\n\n".join(_paragraph(i) for i in range(8))
+    summary = asyncio.run(summarizer.summarize(text, on_stage=_stage))
+    assert stages == ["map", "reduce:1", "reduce:2", "final"]
+    # 8 chunks, 4 + 2 merges, 1 final call
+    assert len(fake_llm) == 8 + 4 + 2 + 1
+    assert summary == f"summary{len(fake_llm)}"
+
+
+# ----- document cache -----
+
+def test_repeated_document_skips_the_whole_tree(fake_llm):
+    summarizer = HierarchicalSummarizer(chunk_tokens=count_tokens(_paragraph(0)))
+    text = "\n\n".join(_paragraph(i) for i in range(4))
+    first = asyncio.run(summarizer.summarize(text))
+    calls = len(fake_llm)
+    tokens = []
+
+    async def _collect(token):
+        tokens.append(token)
+
+    assert asyncio.run(summarizer.summarize(text, on_token=_collect)) == first
+    assert len(fake_llm) == calls
+    assert tokens == [first]
+
+
+def test_sync_long_summary_checks_the_cache_first(monkeypatch):
+    text = "\n\n".join(_paragraph(i) for i in range(4))
+    key = response_cache_key(_summary_messages(text), "gpt-4o-mini", temperature=0.3, max_tokens=600)
+    response_cache.set(key, "cached summary")
+    monkeypatch.setattr(summarizer_module, "SUMMARY_SINGLE_PASS_TOKENS", 10)
+
+    def _no_loop(coroutine):
+        coroutine.close()
+        raise AssertionError("started an event loop for a cached summary")
+
+    monkeypatch.setattr(services.asyncio, "run", _no_loop)
+    assert services.generate_summary(text) == "cached summary"